@@ -4,6 +4,7 @@ Base Agent class for all specialized agents in the system
 
 import asyncio
 from typing import Dict, Any, Optional
+from database.connection import get_session
 import structlog
 
 logger = structlog.get_logger()
@@ -71,6 +72,10 @@ class BaseRealEstateAgent:
         finally:
             self._current_tasks.pop(task_id, None)
             
+    async def get_database_session(self):
+        """Get a database session for agent tasks"""
+        return await get_session()
+        
     async def log_action(self, action: str, details: Dict[str, Any]):
         """Log agent actions for monitoring"""
         logger.info(
@@ -3,12 +3,59 @@ Content Agent - Responsible for generating marketing content for listings
 """
 
 import asyncio
-from typing import Dict, Any, Optional
+import json
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator, Callable, Awaitable
+from sqlalchemy import text
 from agents.agents.base_agent import BaseRealEstateAgent
+from services.generation_cache import GenerationCache
+from services.semantic_cache import SemanticContentCache
+from services.llm_client import extract_json
+from services.llm_router import LLMRouter
+from services.rate_limiter import PRIORITY_HIGH
+from services.embedding_service import get_embedding_service
+from services.vector_index import get_vector_index
+from config import settings
 import structlog
 
 logger = structlog.get_logger()
 
+# Bump whenever the generation prompt changes so cached content is not reused
+CONTENT_PROMPT_VERSION = "content-v2"
+
+CONTENT_GUIDELINES = {
+    "social_media_post": "An engaging social media post of 2-4 short sentences with 3-6 hashtags.",
+    "flyer_text": "Punchy flyer copy: a headline line followed by 4-6 bullet-style highlights.",
+    "property_description": "A 150-200 word property description that highlights unique features.",
+    "email_campaign": "A short marketing email with a subject line and 2-3 short paragraphs."
+}
+
+RESPONSE_SHAPE = '{"text": "...", "hashtags": ["#..."], "call_to_action": "..."}'
+
+# Streamed replies are plain text so the copy can be shown as it arrives
+STREAM_FORMAT = (
+    "Write the copy first. Then add a line starting with 'HASHTAGS:' followed by the hashtags, "
+    "and a final line starting with 'CTA:' followed by the call to action."
+)
+
+# Upper bound for the completion budget of a single multi-variant call
+MAX_MULTI_VARIANT_TOKENS = 4000
+
+LISTING_SQL = """
+    SELECT id, source_id, address, price, beds, baths, sqft,
+           description, key_features, image_urls, status
+    FROM public.rltr_mktg_listings
+    WHERE id = CAST(:listing_id AS uuid)
+"""
+
+INSERT_CONTENT_PIECE_SQL = """
+    INSERT INTO public.rltr_mktg_content_pieces
+        (listing_id, agent_id, content_type, generated_text, status)
+    VALUES
+        (CAST(:listing_id AS uuid), CAST(:agent_id AS uuid), :content_type,
+         CAST(:generated_text AS jsonb), 'draft')
+    RETURNING id
+"""
+
 class ContentAgent(BaseRealEstateAgent):
     """Agent responsible for generating marketing content for property listings"""
     
@@ -24,6 +71,48 @@ class ContentAgent(BaseRealEstateAgent):
             system_message=system_message
         )
         
+        self.model_params = {
+            "model": "gpt-4",
+            "temperature": 0.7,
+            "max_tokens": 800
+        }
+        
+        self.generation_cache = GenerationCache(
+            max_entries=settings.generation_cache_max_entries,
+            ttl_seconds=settings.generation_cache_ttl_seconds,
+            redis_url=settings.redis_url
+        )
+        
+        self.llm_client = LLMRouter.from_settings(model=self.model_params["model"])
+        
+        embedding_service = get_embedding_service()
+        self.semantic_cache = SemanticContentCache(
+            prompt_version=CONTENT_PROMPT_VERSION,
+            similarity_threshold=settings.semantic_cache_threshold,
+            embed=embedding_service.embed,
+            embedding_model=embedding_service.model_name,
+            index=get_vector_index() if settings.vector_index_enabled else None,
+            enabled=settings.semantic_cache_enabled
+        )
+        
+    async def shutdown(self):
+        """Shutdown the agent and release cache connections"""
+        await super().shutdown()
+        await self.generation_cache.close()
+        await self.llm_client.close()
+        
+    async def get_status(self) -> Dict[str, Any]:
+        """Get agent status including generation cache metrics"""
+        status = await super().get_status()
+        status["generation_cache"] = self.generation_cache.stats()
+        status["semantic_cache"] = self.semantic_cache.stats()
+        if self.semantic_cache.index is not None:
+            status["vector_index"] = self.semantic_cache.index.stats()
+        status["llm_routes"] = self.llm_client.stats()
+        if self.llm_client.rate_limiter is not None:
+            status["llm_rate_limits"] = self.llm_client.rate_limiter.stats()
+        return status
+        
     async def generate_content(
         self, 
         listing_id: str, 
@@ -43,6 +132,98 @@ class ContentAgent(BaseRealEstateAgent):
             additional_context
         )
         
+    async def generate_content_variants(
+        self,
+        listing_id: str,
+        content_types: List[str],
+        agent_id: str,
+        platforms: Optional[List[str]] = None,
+        additional_context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Generate several content types / platform posts for a listing in one LLM call"""
+        task_id = f"generate_variants_{listing_id}"
+        
+        return await self.execute_task(
+            task_id,
+            self._generate_content_variants_task,
+            listing_id,
+            content_types,
+            agent_id,
+            platforms,
+            additional_context
+        )
+        
+    async def stream_content(
+        self,
+        listing_id: str,
+        content_type: str,
+        agent_id: str,
+        additional_context: Optional[Dict[str, Any]] = None,
+        on_complete: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Generate content for a listing, yielding token events as they arrive.
+        
+        Generation runs in a tracked background task, so the content piece is
+        still persisted (and `on_complete` called) if the consumer goes away
+        mid-stream. The last event is either "complete" or "error".
+        """
+        if not self._is_active:
+            raise RuntimeError(f"Agent {self.name} is not active")
+            
+        queue: asyncio.Queue = asyncio.Queue()
+        task_id = f"stream_content_{listing_id}_{content_type}_{id(queue)}"
+        
+        task = asyncio.create_task(self._stream_content_task(
+            queue, listing_id, content_type, agent_id, additional_context, on_complete
+        ))
+        self._current_tasks[task_id] = task
+        task.add_done_callback(lambda _: self._current_tasks.pop(task_id, None))
+        
+        while True:
+            event = await queue.get()
+            yield event
+            if event["event"] in ("complete", "error"):
+                break
+                
+    async def load_listing(self, listing_id: str) -> Dict[str, Any]:
+        """Fetch the listing fields generation (and its cache keys) depend on"""
+        session = await self.get_database_session()
+        async with session:
+            result = await session.execute(text(LISTING_SQL), {"listing_id": listing_id})
+            row = result.first()
+            
+        if row is None:
+            raise ValueError(f"Listing {listing_id} not found")
+            
+        listing = dict(row._mapping)
+        listing["id"] = str(listing["id"])
+        if listing.get("price") is not None:
+            listing["price"] = float(listing["price"])
+        return listing
+        
+    async def refresh_listing(self, listing: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop cached generations for a re-scraped listing only if its content changed"""
+        removed = await self.generation_cache.refresh_listing(listing)
+        
+        if removed:
+            await self.log_action("generation_cache_invalidated", {
+                "listing_id": listing.get("id"),
+                "entries_removed": removed
+            })
+            
+        return {"listing_id": listing.get("id"), "entries_removed": removed}
+        
+    async def invalidate_listing(self, listing_id: str) -> Dict[str, Any]:
+        """Drop cached generations after a listing has changed"""
+        removed = await self.generation_cache.invalidate_listing(listing_id)
+        
+        await self.log_action("generation_cache_invalidated", {
+            "listing_id": listing_id,
+            "entries_removed": removed
+        })
+        
+        return {"listing_id": listing_id, "entries_removed": removed}
+        
     async def _generate_content_task(
         self,
         listing_id: str,
@@ -58,20 +239,34 @@ class ContentAgent(BaseRealEstateAgent):
                 "agent_id": agent_id
             })
             
-            # Mock content generation for now
-            # TODO: Implement actual AI content generation
-            generated_content = {
-                "text": f"Beautiful property at listing {listing_id}! Perfect for your next home.",
-                "hashtags": ["#RealEstate", "#DreamHome", "#ForSale"],
-                "call_to_action": "Contact us today for a showing!"
-            }
+            context = dict(additional_context or {})
+            listing = context.pop("listing", None) or await self.load_listing(listing_id)
+            
+            cache_key = self.generation_cache.make_key(
+                GenerationCache.listing_fingerprint(listing),
+                content_type,
+                CONTENT_PROMPT_VERSION,
+                self.model_params,
+                context
+            )
+            
+            generated_content, cache_hit = await self.generation_cache.get_or_generate(
+                cache_key,
+                lambda: self._generate_uncached(listing_id, listing, content_type, context),
+                listing_id=listing_id
+            )
+            
+            content_piece_id = await self._persist_content_piece(
+                listing_id, agent_id, content_type, generated_content
+            )
             
             result = {
-                "content_piece_id": f"content_{listing_id}_{content_type}",
+                "content_piece_id": content_piece_id,
                 "content_type": content_type,
                 "generated_content": generated_content,
                 "status": "draft",
-                "listing_id": listing_id
+                "listing_id": listing_id,
+                "cache_hit": cache_hit
             }
             
             await self.log_action("content_generation_completed", result)
@@ -80,4 +275,433 @@ class ContentAgent(BaseRealEstateAgent):
             
         except Exception as e:
             logger.error(f"Failed to generate content", error=str(e))
-            raise
\ No newline at end of file
+            raise
+            
+    async def _stream_content_task(
+        self,
+        queue: asyncio.Queue,
+        listing_id: str,
+        content_type: str,
+        agent_id: str,
+        additional_context: Optional[Dict[str, Any]],
+        on_complete: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]]
+    ):
+        """Internal task producing the events for stream_content"""
+        try:
+            await self.log_action("content_stream_started", {
+                "listing_id": listing_id,
+                "content_type": content_type,
+                "agent_id": agent_id
+            })
+            
+            context = dict(additional_context or {})
+            listing = context.pop("listing", None) or await self.load_listing(listing_id)
+            
+            cache_key = self.generation_cache.make_key(
+                GenerationCache.listing_fingerprint(listing),
+                content_type,
+                CONTENT_PROMPT_VERSION,
+                self.model_params,
+                context
+            )
+            
+            generated_content = await self.generation_cache.get(cache_key)
+            if generated_content is None:
+                generated_content = await self.semantic_cache.lookup(listing, content_type, context)
+                if generated_content is not None:
+                    await self.generation_cache.set(cache_key, generated_content, listing_id=listing_id)
+                    
+            cache_hit = generated_content is not None
+            
+            if cache_hit:
+                queue.put_nowait({"event": "token", "data": {"text": generated_content["text"]}})
+            else:
+                chunks = []
+                async for delta in self._stream_llm(listing_id, listing, content_type, context):
+                    chunks.append(delta)
+                    queue.put_nowait({"event": "token", "data": {"text": delta}})
+                    
+                generated_content = self._parse_streamed_content("".join(chunks))
+                await self.generation_cache.set(cache_key, generated_content, listing_id=listing_id)
+                await self._store_semantic(listing_id, listing, content_type, context, generated_content)
+                
+            content_piece_id = await self._persist_content_piece(
+                listing_id, agent_id, content_type, generated_content
+            )
+            
+            result = {
+                "content_piece_id": content_piece_id,
+                "content_type": content_type,
+                "generated_content": generated_content,
+                "status": "draft",
+                "listing_id": listing_id,
+                "cache_hit": cache_hit
+            }
+            
+            if on_complete:
+                await on_complete(result)
+                
+            await self.log_action("content_stream_completed", result)
+            queue.put_nowait({"event": "complete", "data": result})
+            
+        except Exception as e:
+            logger.error(f"Failed to stream content", error=str(e))
+            queue.put_nowait({"event": "error", "data": {"detail": str(e)}})
+            
+    async def _stream_llm(
+        self,
+        listing_id: str,
+        listing: Dict[str, Any],
+        content_type: str,
+        context: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """Stream the raw generation text"""
+        if not self.llm_client.is_configured:
+            placeholder = self._placeholder_content(listing_id)
+            reply = (
+                f"{placeholder['text']}\nHASHTAGS: {' '.join(placeholder['hashtags'])}"
+                f"\nCTA: {placeholder['call_to_action']}"
+            )
+            for word in reply.split(" "):
+                yield word + " "
+            return
+            
+        prompt = (
+            f"Listing:\n{self._listing_context(listing)}\n\n"
+            f"Write {content_type.replace('_', ' ')}: {self._variant_instructions(content_type, context)}\n\n"
+            f"{STREAM_FORMAT}"
+        )
+        
+        async for delta in self.llm_client.stream(
+            messages=[
+                {"role": "system", "content": self.system_message},
+                {"role": "user", "content": prompt}
+            ],
+            priority=PRIORITY_HIGH,
+            **self.model_params
+        ):
+            yield delta
+            
+    def _parse_streamed_content(self, reply: str) -> Dict[str, Any]:
+        """Split a streamed plain-text reply into the generated_text shape"""
+        text_lines = []
+        hashtags = []
+        call_to_action = ""
+        
+        for line in reply.splitlines():
+            stripped = line.strip()
+            if stripped.upper().startswith("HASHTAGS:"):
+                hashtags = stripped[len("HASHTAGS:"):].replace(",", " ").split()
+            elif stripped.upper().startswith("CTA:"):
+                call_to_action = stripped[len("CTA:"):].strip()
+            else:
+                text_lines.append(line)
+                
+        return self._normalize_content({
+            "text": "\n".join(text_lines),
+            "hashtags": hashtags,
+            "call_to_action": call_to_action
+        })
+        
+    async def _persist_content_piece(
+        self,
+        listing_id: str,
+        agent_id: str,
+        content_type: str,
+        generated_content: Dict[str, Any]
+    ) -> str:
+        """Save a generated draft and return its id"""
+        session = await self.get_database_session()
+        async with session:
+            result = await session.execute(
+                text(INSERT_CONTENT_PIECE_SQL),
+                {
+                    "listing_id": listing_id,
+                    "agent_id": agent_id,
+                    "content_type": content_type,
+                    "generated_text": json.dumps(generated_content)
+                }
+            )
+            content_piece_id = result.scalar_one()
+            await session.commit()
+            
+            return str(content_piece_id)
+            
+    async def _generate_content_variants_task(
+        self,
+        listing_id: str,
+        content_types: List[str],
+        agent_id: str,
+        platforms: Optional[List[str]] = None,
+        additional_context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Internal task for multi-variant content generation"""
+        try:
+            await self.log_action("variant_generation_started", {
+                "listing_id": listing_id,
+                "content_types": content_types,
+                "platforms": platforms or [],
+                "agent_id": agent_id
+            })
+            
+            context = dict(additional_context or {})
+            listing = context.pop("listing", None) or await self.load_listing(listing_id)
+            fingerprint = GenerationCache.listing_fingerprint(listing)
+            
+            pieces = {}
+            missing = []
+            
+            for variant_id, content_type, variant_context in self._expand_variants(content_types, platforms, context):
+                cache_key = self.generation_cache.make_key(
+                    fingerprint,
+                    content_type,
+                    CONTENT_PROMPT_VERSION,
+                    self.model_params,
+                    variant_context
+                )
+                
+                cached = await self.generation_cache.get(cache_key)
+                if cached is None:
+                    cached = await self.semantic_cache.lookup(listing, content_type, variant_context)
+                    if cached is not None:
+                        await self.generation_cache.set(cache_key, cached, listing_id=listing_id)
+                        
+                if cached is not None:
+                    pieces[variant_id] = (content_type, variant_context, cached, True)
+                else:
+                    missing.append((variant_id, content_type, variant_context, cache_key))
+                    
+            llm_calls = 0
+            if missing:
+                generated, llm_calls = await self._call_llm_multi(listing_id, listing, missing)
+                for variant_id, content_type, variant_context, cache_key in missing:
+                    content = generated[variant_id]
+                    await self.generation_cache.set(cache_key, content, listing_id=listing_id)
+                    await self._store_semantic(listing_id, listing, content_type, variant_context, content)
+                    pieces[variant_id] = (content_type, variant_context, content, False)
+                    
+            # Persist every variant so approvals reference real content pieces
+            persisted = []
+            for variant_id, (content_type, variant_context, content, cache_hit) in pieces.items():
+                persisted.append({
+                    "content_piece_id": await self._persist_content_piece(
+                        listing_id, agent_id, content_type, content
+                    ),
+                    "content_type": content_type,
+                    "platform": variant_context.get("platform"),
+                    "generated_content": content,
+                    "status": "draft",
+                    "listing_id": listing_id,
+                    "cache_hit": cache_hit
+                })
+                
+            result = {
+                "listing_id": listing_id,
+                "llm_calls": llm_calls,
+                "pieces": persisted
+            }
+            
+            await self.log_action("variant_generation_completed", {
+                "listing_id": listing_id,
+                "pieces": len(result["pieces"]),
+                "llm_calls": llm_calls
+            })
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Failed to generate content variants", error=str(e))
+            raise
+            
+    def _expand_variants(
+        self,
+        content_types: List[str],
+        platforms: Optional[List[str]],
+        context: Dict[str, Any]
+    ) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Expand content types and platforms into (variant_id, content_type, context) triples.
+        
+        With platforms given, social media posts are produced once per platform.
+        """
+        variants = []
+        for content_type in dict.fromkeys(content_types):
+            if content_type == "social_media_post" and platforms:
+                continue
+            variants.append((content_type, content_type, dict(context)))
+            
+        for platform in dict.fromkeys(platforms or []):
+            variants.append((
+                f"social_media_post:{platform}",
+                "social_media_post",
+                {**context, "platform": platform}
+            ))
+            
+        return variants
+        
+    async def _generate_uncached(
+        self,
+        listing_id: str,
+        listing: Dict[str, Any],
+        content_type: str,
+        context: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Reuse a near-identical prior generation, or call the LLM and record it"""
+        reused = await self.semantic_cache.lookup(listing, content_type, context)
+        if reused is not None:
+            return reused
+            
+        generated = await self._call_llm(listing_id, listing, content_type, context)
+        await self._store_semantic(listing_id, listing, content_type, context, generated)
+        return generated
+        
+    async def _store_semantic(
+        self,
+        listing_id: str,
+        listing: Dict[str, Any],
+        content_type: str,
+        context: Dict[str, Any],
+        generated: Dict[str, Any]
+    ):
+        """Offer a fresh generation for reuse; placeholder copy is never shared"""
+        if self.llm_client.is_configured:
+            await self.semantic_cache.store(listing_id, listing, content_type, context, generated)
+            
+    async def _call_llm(
+        self,
+        listing_id: str,
+        listing: Dict[str, Any],
+        content_type: str,
+        context: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Run the actual generation (only reached when both caches miss)"""
+        if not self.llm_client.is_configured:
+            return self._placeholder_content(listing_id)
+            
+        prompt = (
+            f"Listing:\n{self._listing_context(listing)}\n\n"
+            f"Write {content_type.replace('_', ' ')}: {self._variant_instructions(content_type, context)}\n\n"
+            f"Respond with only a JSON object shaped like {RESPONSE_SHAPE}"
+        )
+        
+        reply = await self.llm_client.complete(
+            messages=[
+                {"role": "system", "content": self.system_message},
+                {"role": "user", "content": prompt}
+            ],
+            **self.model_params
+        )
+        
+        return self._normalize_content(extract_json(reply))
+        
+    async def _call_llm_multi(
+        self,
+        listing_id: str,
+        listing: Dict[str, Any],
+        variants: List[Tuple[str, str, Dict[str, Any], str]]
+    ) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """Generate every variant in one structured call, split back per variant.
+        
+        Variants the model leaves out (or garbles) are generated individually.
+        Returns the content per variant id and the number of LLM calls made.
+        """
+        if not self.llm_client.is_configured:
+            return {variant[0]: self._placeholder_content(listing_id) for variant in variants}, 0
+            
+        if len(variants) == 1:
+            variant_id, content_type, variant_context, _ = variants[0]
+            return {variant_id: await self._call_llm(listing_id, listing, content_type, variant_context)}, 1
+            
+        instructions = "\n".join(
+            f'- "{variant_id}": {content_type.replace("_", " ")}. '
+            f"{self._variant_instructions(content_type, variant_context)}"
+            for variant_id, content_type, variant_context, _ in variants
+        )
+        prompt = (
+            f"Listing:\n{self._listing_context(listing)}\n\n"
+            f"Write each of the following pieces for this listing:\n{instructions}\n\n"
+            f"Respond with only a JSON object keyed by the ids above, "
+            f"where each value is shaped like {RESPONSE_SHAPE}"
+        )
+        
+        params = dict(self.model_params)
+        params["max_tokens"] = min(params["max_tokens"] * len(variants), MAX_MULTI_VARIANT_TOKENS)
+        
+        try:
+            reply = await self.llm_client.complete(
+                messages=[
+                    {"role": "system", "content": self.system_message},
+                    {"role": "user", "content": prompt}
+                ],
+                **params
+            )
+            parsed = extract_json(reply)
+        except ValueError as e:
+            logger.warning("Multi-variant reply could not be parsed", listing_id=listing_id, error=str(e))
+            parsed = {}
+            
+        if not isinstance(parsed, dict):
+            logger.warning("Multi-variant reply was not a JSON object", listing_id=listing_id)
+            parsed = {}
+            
+        llm_calls = 1
+        generated = {}
+        for variant_id, content_type, variant_context, _ in variants:
+            data = parsed.get(variant_id)
+            if isinstance(data, dict) and data.get("text"):
+                generated[variant_id] = self._normalize_content(data)
+            else:
+                generated[variant_id] = await self._call_llm(listing_id, listing, content_type, variant_context)
+                llm_calls += 1
+                
+        return generated, llm_calls
+        
+    def _listing_context(self, listing: Dict[str, Any]) -> str:
+        """Shared listing block included once per prompt"""
+        address = listing.get("address")
+        if isinstance(address, dict):
+            address = address.get("full_address")
+            
+        lines = [f"Address: {address or 'N/A'}"]
+        if listing.get("price"):
+            lines.append(f"Price: ${float(listing['price']):,.0f}")
+        for label, field in (("Beds", "beds"), ("Baths", "baths"), ("Square feet", "sqft")):
+            if listing.get(field) is not None:
+                lines.append(f"{label}: {listing[field]}")
+        if listing.get("key_features"):
+            lines.append(f"Key features: {', '.join(listing['key_features'])}")
+        if listing.get("description"):
+            lines.append(f"Description: {listing['description']}")
+            
+        return "\n".join(lines)
+        
+    def _variant_instructions(self, content_type: str, context: Dict[str, Any]) -> str:
+        """Per-variant guidance, including platform and any extra request context"""
+        instructions = CONTENT_GUIDELINES.get(content_type, "Marketing copy for this listing.")
+        extra = {key: value for key, value in context.items() if key != "platform"}
+        
+        if context.get("platform"):
+            instructions += f" Tailor it for {context['platform']}."
+        if extra:
+            instructions += f" Additional context: {json.dumps(extra, sort_keys=True, default=str)}"
+            
+        return instructions
+        
+    def _normalize_content(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Coerce a parsed reply into the generated_text shape"""
+        hashtags = data.get("hashtags") or []
+        if isinstance(hashtags, str):
+            hashtags = hashtags.split()
+            
+        return {
+            "text": str(data.get("text", "")).strip(),
+            "hashtags": [tag if tag.startswith("#") else f"#{tag}" for tag in hashtags],
+            "call_to_action": str(data.get("call_to_action", "")).strip()
+        }
+        
+    def _placeholder_content(self, listing_id: str) -> Dict[str, Any]:
+        """Content used when no LLM is configured (local development)"""
+        return {
+            "text": f"Beautiful property at listing {listing_id}! Perfect for your next home.",
+            "hashtags": ["#RealEstate", "#DreamHome", "#ForSale"],
+            "call_to_action": "Contact us today for a showing!"
+        }
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+Lead Manager Agent - Scores social media engagement and surfaces promising leads
+"""
+
+import asyncio
+from typing import Dict, Any, List, Optional
+import numpy as np
+from sqlalchemy import text
+from agents.agents.base_agent import BaseRealEstateAgent
+from services.engagement_scorer import EngagementScorer
+from services.status_counters import get_status_counters
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+INSERT_LEAD_NOTIFICATION_SQL = """
+    INSERT INTO public.rltr_mktg_notifications (agent_id, notification_type, message_text, related_entity_id)
+    VALUES (CAST(:agent_id AS uuid), 'new_lead', :message_text, CAST(:listing_id AS uuid))
+    RETURNING id
+"""
+
+class LeadManagerAgent(BaseRealEstateAgent):
+    """Agent that turns batches of social engagement into lead notifications"""
+    
+    def __init__(self):
+        system_message = """
+        You are a Lead Manager Agent specialized in real estate lead qualification.
+        
+        Your responsibilities:
+        1. Score social media engagement for buying intent
+        2. Identify promising leads for each listing
+        3. Notify agents about leads worth following up
+        
+        You help agents spend their time on the prospects most likely to convert.
+        """
+        
+        super().__init__(
+            name="LeadManagerAgent",
+            description="Scores social media engagement and surfaces promising leads",
+            system_message=system_message
+        )
+        self.scorer = EngagementScorer()
+        
+    async def process_engagements(
+        self,
+        agent_id: str,
+        listing_id: Optional[str],
+        events: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Score a batch of engagement events for one agent and listing"""
+        task_id = f"process_engagements_{agent_id}_{listing_id}_{asyncio.get_event_loop().time()}"
+        
+        return await self.execute_task(
+            task_id,
+            self._process_engagements_task,
+            agent_id,
+            listing_id,
+            events
+        )
+        
+    async def _process_engagements_task(
+        self,
+        agent_id: str,
+        listing_id: Optional[str],
+        events: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Internal task for scoring engagement and notifying about leads"""
+        try:
+            scores = self.scorer.score(events)
+            strong = np.flatnonzero(scores >= settings.lead_notification_score)
+            strong = strong[np.argsort(-scores[strong])]
+            
+            leads = [
+                {
+                    "event_id": events[i].get("event_id"),
+                    "platform": events[i].get("platform"),
+                    "type": events[i].get("type"),
+                    "user_id": events[i].get("user_id"),
+                    "score": round(float(scores[i]), 3)
+                }
+                for i in strong
+            ]
+            
+            result = {
+                "agent_id": agent_id,
+                "listing_id": listing_id,
+                "events": len(events),
+                "leads": leads,
+                "notification_id": None
+            }
+            
+            # One notification per batch rather than one per lead
+            if leads:
+                session = await self.get_database_session()
+                async with session:
+                    inserted = await session.execute(
+                        text(INSERT_LEAD_NOTIFICATION_SQL),
+                        {
+                            "agent_id": agent_id,
+                            "message_text": f"{len(leads)} promising lead(s) from {len(events)} new engagements",
+                            "listing_id": listing_id
+                        }
+                    )
+                    notification_id = inserted.scalar_one()
+                    await session.commit()
+                    
+                await get_status_counters().add(agent_id, unread_notifications=1)
+                result["notification_id"] = str(notification_id)
+                
+            await self.log_action("engagements_processed", {
+                "agent_id": agent_id,
+                "listing_id": listing_id,
+                "events": len(events),
+                "leads": len(leads)
+            })
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Failed to process engagements", error=str(e))
+            raise
\ No newline at end of file
@@ -3,15 +3,138 @@ Notification Agent - Handles sending notifications through various channels
 """
 
 import asyncio
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
-from sqlalchemy import select
+import json
+import time
+from email.message import EmailMessage
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+import redis.asyncio as redis
+from sqlalchemy import text
 from database.models import Notification, Agent
 from agents.agents.base_agent import BaseRealEstateAgent
+from services.status_counters import get_status_counters
+from services.notification_fanout import NotificationFanout, Channel
+from services.email_transport import SMTPTransport
+from config import settings
 import structlog
 
 logger = structlog.get_logger()
 
+# Claims the oldest undelivered notifications for this worker. The lease
+# keeps other workers off the rows; if this one dies before recording the
+# outcome the lease runs out and the rows are claimed again. Failed rows
+# wait in the same column until their retry is due. Non-urgent types are
+# held until the oldest claimable one for the same agent and type has waited
+# the whole digest window, then claimed together with the rest of the group;
+# rows that are leased or backing off do not count, or an old retry would
+# release every newer notification of its group at once.
+CLAIM_NOTIFICATIONS_SQL = """
+    WITH claimable AS (
+        SELECT n.id, n.created_at
+        FROM public.rltr_mktg_notifications AS n
+        WHERE n.delivery_status = 'pending'
+          AND n.created_at >= now() - make_interval(hours => :max_age_hours)
+          AND (n.delivery_claimed_until IS NULL OR n.delivery_claimed_until < now())
+          AND (n.notification_type = ANY(CAST(:urgent_types AS text[]))
+               OR EXISTS (
+                   SELECT 1
+                   FROM public.rltr_mktg_notifications AS o
+                   WHERE o.agent_id = n.agent_id
+                     AND o.notification_type = n.notification_type
+                     AND o.delivery_status = 'pending'
+                     AND o.created_at >= now() - make_interval(hours => :max_age_hours)
+                     AND o.created_at <= now() - make_interval(secs => :digest_window_seconds)
+                     AND (o.delivery_claimed_until IS NULL OR o.delivery_claimed_until < now())
+               ))
+        ORDER BY n.created_at
+        LIMIT :batch_size
+        FOR UPDATE OF n SKIP LOCKED
+    )
+    UPDATE public.rltr_mktg_notifications AS n
+    SET delivery_claimed_until = now() + make_interval(secs => :lease_seconds),
+        delivery_attempts = n.delivery_attempts + 1
+    FROM claimable AS c
+    WHERE n.id = c.id AND n.created_at = c.created_at
+    RETURNING n.id, n.agent_id, n.notification_type, n.message_text, n.related_entity_id,
+              n.created_at, n.delivery_channels, n.delivery_attempts
+"""
+
+# Merges per-channel outcomes for a claimed batch. Notifications with a failed
+# channel go back to pending with exponential backoff until max_attempts.
+RECORD_DELIVERIES_SQL = """
+    UPDATE public.rltr_mktg_notifications AS n
+    SET delivery_channels = n.delivery_channels || d.channels,
+        delivery_status = CASE WHEN NOT d.failed THEN 'sent'
+                               WHEN n.delivery_attempts >= :max_attempts THEN 'failed'
+                               ELSE 'pending' END,
+        delivery_claimed_until = CASE WHEN d.failed AND n.delivery_attempts < :max_attempts
+                                      THEN now() + make_interval(secs => :retry_seconds * power(2, n.delivery_attempts - 1))
+                                 END
+    FROM jsonb_to_recordset(CAST(:outcomes AS jsonb))
+        AS d(id uuid, created_at timestamptz, channels jsonb, failed boolean)
+    WHERE n.id = d.id AND n.created_at = d.created_at
+"""
+
+# Extends the lease on notifications whose channels are still being sent and
+# stores the channels already sent, so a later claim does not repeat them.
+RENEW_CLAIMS_SQL = """
+    UPDATE public.rltr_mktg_notifications AS n
+    SET delivery_channels = n.delivery_channels || d.channels,
+        delivery_claimed_until = now() + make_interval(secs => :lease_seconds)
+    FROM jsonb_to_recordset(CAST(:outcomes AS jsonb))
+        AS d(id uuid, created_at timestamptz, channels jsonb)
+    WHERE n.id = d.id AND n.created_at = d.created_at AND n.delivery_status = 'pending'
+"""
+
+AGENT_CONTACTS_SQL = """
+    SELECT id, name, email, phone, notification_preferences
+    FROM public.rltr_mktg_agents
+    WHERE id = ANY(CAST(:ids AS uuid[]))
+"""
+
+# Only the call that actually flips the flag gets a row back, so concurrent
+# reads of the same notification decrement the unread counter once
+MARK_READ_SQL = """
+    UPDATE public.rltr_mktg_notifications
+    SET is_read = true
+    WHERE id = CAST(:id AS uuid) AND is_read = false
+    RETURNING agent_id
+"""
+
+class NotificationDigest:
+    """Several claimed notifications of one type for one agent, delivered as one.
+    
+    A channel counts as already sent only if it was sent for every member.
+    """
+    
+    def __init__(self, notifications: List[Any], message_text: str):
+        first = notifications[0]
+        self.members = notifications
+        self.count = len(notifications)
+        self.id = first.id
+        self.agent_id = first.agent_id
+        self.notification_type = first.notification_type
+        self.related_entity_id = None
+        self.created_at = max(notification.created_at for notification in notifications)
+        self.message_text = message_text
+        self.delivery_channels = {
+            channel: "sent"
+            for channel in ("email", "push", "sms")
+            if all((notification.delivery_channels or {}).get(channel) == "sent" for notification in notifications)
+        }
+
+class DeliveryProgress:
+    """Channel outcomes of a claimed batch as they arrive, one entry per group"""
+    
+    def __init__(self, groups: List[List[Any]], jobs: List[Tuple[Any, Any, List[str]]]):
+        self.groups = groups
+        self.channels: List[Dict[str, str]] = [{} for _ in jobs]
+        self.remaining = [len(names) for _, _, names in jobs]
+        self.recorded = [False for _ in jobs]
+        
+    def update(self, index: int, channel: str, status: str):
+        self.channels[index][channel] = status
+        self.remaining[index] -= 1
+
 class NotificationAgent(BaseRealEstateAgent):
     """Agent responsible for managing and sending notifications to users"""
     
@@ -32,6 +155,7 @@ class NotificationAgent(BaseRealEstateAgent):
         - posting_success: Content posted successfully
         - posting_failed: Content posting failed
         - new_listing: New property listing available
+        - new_lead: Promising leads from social media engagement
         - system_alert: System-level notifications
         
         You ensure agents stay informed about important events and system status.
@@ -43,6 +167,49 @@ class NotificationAgent(BaseRealEstateAgent):
             system_message=system_message
         )
         
+        # Agent contact details and preferences by agent id, with expiry
+        self._agent_cache: Dict[str, Tuple[float, Any]] = {}
+        
+        # Each channel has its own bounded pool so providers are sent to independently
+        self.fanout = NotificationFanout({
+            channel: Channel(
+                channel,
+                send,
+                concurrency=concurrency,
+                retries=settings.notification_channel_retries,
+                retry_backoff=settings.notification_channel_retry_backoff,
+                timeout=settings.notification_channel_timeout_seconds
+            )
+            for channel, send, concurrency in (
+                ("email", self._send_email_notification, settings.notification_email_concurrency),
+                ("push", self._send_push_notification, settings.notification_push_concurrency),
+                ("sms", self._send_sms_notification, settings.notification_sms_concurrency)
+            )
+        })
+        
+        # Push notifications are published for the API gateway's push hub
+        self._push_redis = redis.from_url(settings.redis_url, decode_responses=True)
+        
+        # Pooled SMTP connections; without SMTP_HOST emails are only logged
+        self.email_transport = (
+            SMTPTransport.from_settings(on_bounce=self._handle_bounce) if settings.smtp_host else None
+        )
+        
+    async def shutdown(self):
+        """Shutdown the agent and release the push and SMTP connections"""
+        await super().shutdown()
+        await self._push_redis.aclose()
+        if self.email_transport:
+            await self.email_transport.close()
+        
+    async def get_status(self) -> Dict[str, Any]:
+        """Get agent status including per-channel delivery metrics"""
+        status = await super().get_status()
+        status["delivery_channels"] = self.fanout.stats()
+        if self.email_transport:
+            status["email_transport"] = self.email_transport.stats()
+        return status
+        
     async def process_pending_notifications(self) -> Dict[str, Any]:
         """Process all pending notifications"""
         task_id = f"process_notifications_{asyncio.get_event_loop().time()}"
@@ -57,104 +224,280 @@ class NotificationAgent(BaseRealEstateAgent):
         try:
             session = await self.get_database_session()
             
-            # Get unread notifications from the last 24 hours
-            cutoff_time = datetime.utcnow() - timedelta(hours=24)
-            
-            result = await session.execute(
-                select(Notification)
-                .where(Notification.is_read == False)
-                .where(Notification.created_at >= cutoff_time)
-                .order_by(Notification.created_at.desc())
-                .limit(50)
-            )
-            
-            notifications = result.scalars().all()
-            
             results = {
                 "processed": 0,
                 "email_sent": 0,
                 "push_sent": 0,
                 "sms_sent": 0,
-                "failed": 0
+                "failed": 0,
+                "digests": 0,
+                "batches": 0
             }
             
-            for notification in notifications:
-                try:
-                    # Get agent details for notification preferences
-                    agent_result = await session.execute(
-                        select(Agent).where(Agent.id == notification.agent_id)
-                    )
-                    agent = agent_result.scalar_one_or_none()
+            # Claim and deliver batches until the backlog is drained
+            while True:
+                claimed = await session.execute(
+                    text(CLAIM_NOTIFICATIONS_SQL),
+                    {
+                        "batch_size": settings.notification_delivery_batch_size,
+                        "lease_seconds": settings.notification_delivery_lease_seconds,
+                        "max_age_hours": settings.notification_delivery_max_age_hours,
+                        "urgent_types": settings.notification_urgent_types,
+                        "digest_window_seconds": settings.notification_digest_window_seconds
+                    }
+                )
+                notifications = claimed.all()
+                await session.commit()
+                
+                if not notifications:
+                    break
                     
-                    if not agent:
-                        continue
-                        
-                    # Process notification based on preferences
-                    await self._send_notification(notification, agent, results)
-                    results["processed"] += 1
+                # Agent details for the whole batch in at most one query
+                agents = await self._load_agents(session, [notification.agent_id for notification in notifications])
+                
+                groups = self._coalesce(notifications)
+                
+                jobs = []
+                for group in groups:
+                    notification = group[0] if len(group) == 1 else NotificationDigest(
+                        group, self._render_digest(group)
+                    )
+                    agent = agents.get(str(notification.agent_id))
+                    jobs.append((notification, agent, self._pending_channels(notification, agent) if agent else []))
                     
-                except Exception as e:
-                    logger.error(f"Failed to process notification", 
-                               error=str(e), 
-                               notification_id=str(notification.id))
-                    results["failed"] += 1
+                # All channels of all notifications in the batch are sent concurrently.
+                # Finished notifications are recorded while the rest are in flight,
+                # and their lease is renewed, so a slow provider neither delays what
+                # is already sent nor lets another worker claim and resend it.
+                progress = DeliveryProgress(groups, jobs)
+                delivery = asyncio.create_task(self.fanout.deliver(jobs, on_outcome=progress.update))
+                try:
+                    while True:
+                        done, _ = await asyncio.wait({delivery}, timeout=settings.notification_delivery_progress_seconds)
+                        await self._record_progress(session, progress, results)
+                        if done:
+                            delivery.result()
+                            break
+                finally:
+                    delivery.cancel()
+                results["batches"] += 1
+                
+                if len(notifications) < settings.notification_delivery_batch_size:
+                    break
                     
-            await self.log_action("notifications_processed", results)
-            
+            if results["processed"]:
+                await self.log_action("notifications_processed", results)
+                
             return results
             
         except Exception as e:
             logger.error(f"Failed to process pending notifications", error=str(e))
             raise
             
-    async def _send_notification(
-        self, 
-        notification: Notification, 
-        agent: Agent, 
-        results: Dict[str, Any]
-    ):
-        """Send notification through appropriate channels"""
-        try:
-            preferences = agent.notification_preferences or {}
+    async def _record_progress(self, session, progress: DeliveryProgress, results: Dict[str, int]):
+        """Record finished notifications and renew the claim on the others"""
+        finished = []
+        in_flight = []
+        for index, group in enumerate(progress.groups):
+            if progress.recorded[index]:
+                continue
+            channels = progress.channels[index]
             
-            # Send email notification
-            if preferences.get("email", True):
-                await self._send_email_notification(notification, agent)
-                results["email_sent"] += 1
+            # A digest's outcome applies to every notification it covers
+            if progress.remaining[index]:
+                sent = {channel: status for channel, status in channels.items() if status == "sent"}
+                in_flight.extend(
+                    {"id": str(notification.id), "created_at": notification.created_at.isoformat(), "channels": sent}
+                    for notification in group
+                )
+                continue
                 
-            # Send push notification (always enabled for web interface)
-            if preferences.get("push", True):
-                await self._send_push_notification(notification, agent)
-                results["push_sent"] += 1
+            progress.recorded[index] = True
+            failed = "failed" in channels.values()
+            for channel, status in channels.items():
+                if status == "sent":
+                    results[f"{channel}_sent"] += 1
+            finished.extend(
+                {
+                    "id": str(notification.id),
+                    "created_at": notification.created_at.isoformat(),
+                    "channels": channels,
+                    "failed": failed
+                }
+                for notification in group
+            )
+            results["processed"] += len(group)
+            results["failed"] += len(group) if failed else 0
+            results["digests"] += int(len(group) > 1)
+            
+        if finished:
+            await session.execute(
+                text(RECORD_DELIVERIES_SQL),
+                {
+                    "outcomes": json.dumps(finished),
+                    "max_attempts": settings.notification_delivery_max_attempts,
+                    "retry_seconds": settings.notification_delivery_retry_seconds
+                }
+            )
+        if in_flight:
+            await session.execute(
+                text(RENEW_CLAIMS_SQL),
+                {"outcomes": json.dumps(in_flight), "lease_seconds": settings.notification_delivery_lease_seconds}
+            )
+        if finished or in_flight:
+            await session.commit()
+            
+    async def _load_agents(self, session, agent_ids: Iterable[Any]) -> Dict[str, Any]:
+        """Contact details and preferences for agents, from the cache or one query"""
+        now = time.monotonic()
+        agents = {}
+        missing = []
+        for agent_id in {str(agent_id) for agent_id in agent_ids}:
+            cached = self._agent_cache.get(agent_id)
+            if cached and cached[0] > now:
+                agents[agent_id] = cached[1]
+            else:
+                missing.append(agent_id)
                 
-            # Send SMS notification
-            if preferences.get("sms", False) and agent.phone:
-                await self._send_sms_notification(notification, agent)
-                results["sms_sent"] += 1
+        if missing:
+            result = await session.execute(text(AGENT_CONTACTS_SQL), {"ids": missing})
+            expires = now + settings.notification_agent_cache_ttl_seconds
+            for agent in result.all():
+                agents[str(agent.id)] = agent
+                self._agent_cache[str(agent.id)] = (expires, agent)
                 
+        return agents
+        
+    def invalidate_agent(self, agent_id: Optional[str] = None):
+        """Drop cached preferences for one agent, or for all agents"""
+        if agent_id is None:
+            self._agent_cache.clear()
+        else:
+            self._agent_cache.pop(str(agent_id), None)
+            
+    async def update_notification_preferences(
+        self,
+        agent_id: str,
+        preferences: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Merge new channel preferences into an agent's settings"""
+        try:
+            session = await self.get_database_session()
+            
+            result = await session.execute(
+                text("""
+                    UPDATE public.rltr_mktg_agents
+                    SET notification_preferences = COALESCE(notification_preferences, '{}'::jsonb) || CAST(:preferences AS jsonb)
+                    WHERE id = CAST(:agent_id AS uuid)
+                    RETURNING notification_preferences
+                """),
+                {"agent_id": agent_id, "preferences": json.dumps(preferences)}
+            )
+            updated = result.scalar_one_or_none()
+            
+            if updated is None:
+                raise ValueError(f"Agent not found: {agent_id}")
+                
+            await session.commit()
+            self.invalidate_agent(agent_id)
+            
+            return {
+                "agent_id": agent_id,
+                "notification_preferences": updated
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to update notification preferences", error=str(e))
+            raise
+            
+    async def _handle_bounce(self, recipient: str, code: int, reason: str):
+        """Turn off email for agents whose address permanently bounces"""
+        try:
+            session = await self.get_database_session()
+            
+            result = await session.execute(
+                text("""
+                    UPDATE public.rltr_mktg_agents
+                    SET notification_preferences = COALESCE(notification_preferences, '{}'::jsonb) || '{"email": false}'::jsonb
+                    WHERE lower(email) = lower(:email)
+                    RETURNING id
+                """),
+                {"email": recipient}
+            )
+            agent_ids = result.scalars().all()
+            await session.commit()
+            
+            for agent_id in agent_ids:
+                self.invalidate_agent(agent_id)
+                
+            logger.warning("Disabled email notifications after bounce",
+                           recipient=recipient,
+                           code=code,
+                           reason=reason,
+                           agents=len(agent_ids))
+                           
         except Exception as e:
-            logger.error(f"Failed to send notification", error=str(e))
+            logger.error(f"Failed to handle email bounce", error=str(e))
             raise
             
+    def _coalesce(self, notifications: List[Any]) -> List[List[Any]]:
+        """Group claimed notifications by agent and type; urgent types stay single"""
+        groups: Dict[Tuple[str, str], List[Any]] = {}
+        singles = []
+        for notification in notifications:
+            if notification.notification_type in settings.notification_urgent_types:
+                singles.append([notification])
+            else:
+                groups.setdefault((str(notification.agent_id), notification.notification_type), []).append(notification)
+        return singles + list(groups.values())
+        
+    def _render_digest(self, notifications: List[Any]) -> str:
+        """One message summarizing a group of notifications"""
+        title = self._get_notification_title(notifications[0].notification_type)
+        shown = notifications[:settings.notification_digest_max_items]
+        lines = [f"{title} ({len(notifications)} updates)"]
+        lines += [f"- {notification.message_text}" for notification in shown]
+        if len(notifications) > len(shown):
+            lines.append(f"...and {len(notifications) - len(shown)} more")
+        return "\n".join(lines)
+        
+    def _pending_channels(self, notification: Notification, agent: Agent) -> List[str]:
+        """Channels the agent wants this notification on that are not yet sent"""
+        preferences = agent.notification_preferences or {}
+        delivered = notification.delivery_channels or {}
+        
+        channels = {
+            # Push is on by default for the web interface
+            "email": preferences.get("email", True),
+            "push": preferences.get("push", True),
+            "sms": preferences.get("sms", False) and bool(agent.phone)
+        }
+        
+        return [
+            channel for channel, enabled in channels.items()
+            if enabled and delivered.get(channel) != "sent"
+        ]
+        
     async def _send_email_notification(self, notification: Notification, agent: Agent):
         """Send email notification"""
         try:
-            # This would integrate with an email service like SendGrid
-            # For now, we'll just log the action
-            
             email_content = self._format_email_content(notification, agent)
             
-            # TODO: Implement actual email sending
-            # await email_service.send_email(
-            #     to=agent.email,
-            #     subject=email_content["subject"],
-            #     body=email_content["body"]
-            # )
+            outcome = "logged"
+            if self.email_transport:
+                message = EmailMessage()
+                message["To"] = agent.email
+                message["Subject"] = email_content["subject"]
+                message.set_content(email_content["body"])
+                
+                # A bounce is handled by _handle_bounce and not retried
+                outcome = await self.email_transport.send(message)
             
             logger.info(f"Email notification sent", 
                        agent_email=agent.email,
                        notification_type=notification.notification_type,
-                       notification_id=str(notification.id))
+                       notification_id=str(notification.id),
+                       outcome=outcome)
                        
         except Exception as e:
             logger.error(f"Failed to send email notification", error=str(e))
@@ -163,24 +506,27 @@ class NotificationAgent(BaseRealEstateAgent):
     async def _send_push_notification(self, notification: Notification, agent: Agent):
         """Send push notification through web interface"""
         try:
-            # This would typically use WebSocket or Server-Sent Events
-            # to push notifications to the web interface
-            
             push_content = {
                 "id": str(notification.id),
                 "type": notification.notification_type,
                 "title": self._get_notification_title(notification.notification_type),
                 "message": notification.message_text,
                 "timestamp": notification.created_at.isoformat(),
-                "agent_id": str(agent.id)
+                "agent_id": str(agent.id),
+                "count": getattr(notification, "count", 1)
             }
             
-            # TODO: Implement actual push notification
-            # await websocket_service.send_to_agent(agent.id, push_content)
+            # Every gateway instance receives this and forwards it to the
+            # agent's open SSE / WebSocket connections, if any
+            gateways = await self._push_redis.publish(
+                settings.push_channel,
+                json.dumps({"agent_id": str(agent.id), "event": push_content}, default=str)
+            )
             
             logger.info(f"Push notification sent", 
                        agent_id=str(agent.id),
-                       notification_type=notification.notification_type)
+                       notification_type=notification.notification_type,
+                       gateways=gateways)
                        
         except Exception as e:
             logger.error(f"Failed to send push notification", error=str(e))
@@ -270,11 +616,17 @@ class NotificationAgent(BaseRealEstateAgent):
     def _format_sms_content(self, notification: Notification, agent: Agent) -> str:
         """Format SMS content (keep it short)"""
         
+        count = getattr(notification, "count", 1)
+        if count > 1:
+            title = self._get_notification_title(notification.notification_type)
+            return f"Hi {agent.name}, {count} updates: {title}. Check your dashboard."
+            
         sms_templates = {
             "content_approval_request": f"Hi {agent.name}, new content needs approval. Check your dashboard.",
             "posting_success": f"Hi {agent.name}, content posted successfully!",
             "posting_failed": f"Hi {agent.name}, content posting failed. Check dashboard.",
-            "new_listing": f"Hi {agent.name}, new listing available for marketing."
+            "new_listing": f"Hi {agent.name}, new listing available for marketing.",
+            "new_lead": f"Hi {agent.name}, you have new leads to follow up. Check dashboard."
         }
         
         return sms_templates.get(
@@ -291,6 +643,7 @@ class NotificationAgent(BaseRealEstateAgent):
             "posting_success": "Content Posted Successfully",
             "posting_failed": "Content Posting Failed",
             "new_listing": "New Listing Available",
+            "new_lead": "New Leads",
             "system_alert": "System Alert"
         }
         
@@ -300,18 +653,23 @@ class NotificationAgent(BaseRealEstateAgent):
         """Mark a notification as read"""
         try:
             session = await self.get_database_session()
-            
-            result = await session.execute(
-                select(Notification).where(Notification.id == notification_id)
-            )
-            notification = result.scalar_one_or_none()
-            
-            if not notification:
-                raise ValueError(f"Notification not found: {notification_id}")
+            async with session:
+                result = await session.execute(text(MARK_READ_SQL), {"id": notification_id})
+                marked = result.first()
+                
+                if not marked:
+                    result = await session.execute(
+                        text("SELECT 1 FROM public.rltr_mktg_notifications WHERE id = CAST(:id AS uuid)"),
+                        {"id": notification_id}
+                    )
+                    if result.first() is None:
+                        raise ValueError(f"Notification not found: {notification_id}")
+                        
+                await session.commit()
+                
+            if marked:
+                await get_status_counters().add(str(marked.agent_id), unread_notifications=-1)
                 
-            notification.is_read = True
-            await session.commit()
-            
             return {
                 "notification_id": notification_id,
                 "status": "marked_read"
@@ -5,13 +5,57 @@ Social Media Agent - Responsible for managing social media posting
 import asyncio
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
-from sqlalchemy import select
-from database.models import PostSchedule, ContentPiece
+from sqlalchemy import text
 from agents.agents.base_agent import BaseRealEstateAgent
+from services.status_counters import get_status_counters
+from services.content_state import transition, POSTED, POSTING_FAILED
 import structlog
 
 logger = structlog.get_logger()
 
+SCHEDULE_POST_SQL = """
+    INSERT INTO public.rltr_mktg_post_schedule (content_piece_id, social_media_account_id, scheduled_at, status)
+    SELECT id, CAST(:social_media_account_id AS uuid), :scheduled_at, 'pending'
+    FROM public.rltr_mktg_content_pieces
+    WHERE id = CAST(:content_piece_id AS uuid) AND status = 'approved_for_posting'
+    RETURNING id
+"""
+
+# Due posts are handed to one worker each; SKIP LOCKED lets several
+# replicas drain the schedule without waiting on each other
+CLAIM_DUE_POSTS_SQL = """
+    UPDATE public.rltr_mktg_post_schedule AS ps
+    SET status = 'sent'
+    WHERE ps.id IN (
+        SELECT id
+        FROM public.rltr_mktg_post_schedule
+        WHERE status = 'pending' AND scheduled_at <= now()
+        ORDER BY scheduled_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING ps.id, ps.content_piece_id, ps.social_media_account_id
+"""
+
+# Returns the status the post had before this update (self-join snapshot)
+# so the failed-post counter delta matches what was actually changed
+RECORD_POST_RESULT_SQL = """
+    UPDATE public.rltr_mktg_post_schedule AS ps
+    SET status = :status,
+        posted_at = CASE WHEN :success THEN now() ELSE ps.posted_at END,
+        platform_post_id = COALESCE(:platform_post_id, ps.platform_post_id),
+        error_message = :error_message
+    FROM public.rltr_mktg_post_schedule AS previous
+    WHERE ps.id = CAST(:id AS uuid) AND previous.id = ps.id
+    RETURNING ps.content_piece_id, previous.status AS previous_status
+"""
+
+INSERT_NOTIFICATION_SQL = """
+    INSERT INTO public.rltr_mktg_notifications (agent_id, notification_type, message_text, related_entity_id)
+    VALUES (CAST(:agent_id AS uuid), :notification_type, :message_text, CAST(:related_entity_id AS uuid))
+    RETURNING id
+"""
+
 class SocialMediaAgent(BaseRealEstateAgent):
     """Agent responsible for posting content to social media platforms"""
     
@@ -52,38 +96,170 @@ class SocialMediaAgent(BaseRealEstateAgent):
     ) -> Dict[str, Any]:
         """Internal task for scheduling posts"""
         try:
-            session = await self.get_database_session()
-            
-            # Get content piece and validate
-            result = await session.execute(
-                select(ContentPiece).where(ContentPiece.id == content_piece_id)
-            )
-            content_piece = result.scalar_one_or_none()
-            
-            if not content_piece or content_piece.status != "approved_for_posting":
-                raise ValueError(f"Content not approved: {content_piece_id}")
-                
             # Set default scheduled time
             if not scheduled_time:
                 scheduled_time = datetime.utcnow() + timedelta(minutes=5)
                 
-            # Create post schedule entry
-            post_schedule = PostSchedule(
-                content_piece_id=content_piece_id,
-                social_media_account_id=social_media_account_id,
-                scheduled_at=scheduled_time,
-                status="pending"
-            )
-            
-            session.add(post_schedule)
-            await session.commit()
-            
+            session = await self.get_database_session()
+            async with session:
+                # Only approved content can be scheduled
+                result = await session.execute(
+                    text(SCHEDULE_POST_SQL),
+                    {
+                        "content_piece_id": content_piece_id,
+                        "social_media_account_id": social_media_account_id,
+                        "scheduled_at": scheduled_time
+                    }
+                )
+                post_schedule_id = result.scalar_one_or_none()
+                
+                if post_schedule_id is None:
+                    raise ValueError(f"Content not approved: {content_piece_id}")
+                    
+                await session.commit()
+                
             return {
-                "post_schedule_id": str(post_schedule.id),
+                "post_schedule_id": str(post_schedule_id),
                 "scheduled_at": scheduled_time.isoformat(),
                 "status": "pending"
             }
             
         except Exception as e:
             logger.error(f"Failed to schedule post", error=str(e))
+            raise
+            
+    async def process_scheduled_posts(self, limit: int = 50) -> Dict[str, Any]:
+        """Publish the posts that are due and record each outcome"""
+        task_id = f"process_scheduled_posts_{asyncio.get_event_loop().time()}"
+        
+        return await self.execute_task(
+            task_id,
+            self._process_scheduled_posts_task,
+            limit
+        )
+        
+    async def _process_scheduled_posts_task(self, limit: int) -> Dict[str, Any]:
+        """Internal task for publishing due posts"""
+        try:
+            session = await self.get_database_session()
+            async with session:
+                result = await session.execute(text(CLAIM_DUE_POSTS_SQL), {"limit": limit})
+                posts = result.all()
+                await session.commit()
+                
+            posted = failed = 0
+            for post in posts:
+                try:
+                    platform_post_id = await self._publish_post(post)
+                except Exception as e:
+                    logger.warning("Publishing scheduled post failed", post_schedule_id=str(post.id), error=str(e))
+                    await self._record_post_result_task(str(post.id), False, error_message=str(e))
+                    failed += 1
+                else:
+                    await self._record_post_result_task(str(post.id), True, platform_post_id=platform_post_id)
+                    posted += 1
+                    
+            result = {"claimed": len(posts), "posted": posted, "failed": failed}
+            if posts:
+                await self.log_action("scheduled_posts_processed", result)
+                
+            return result
+            
+        except Exception as e:
+            logger.error(f"Failed to process scheduled posts", error=str(e))
+            raise
+            
+    async def _publish_post(self, post: Any) -> str:
+        """Publish one post to its platform and return the platform's post id"""
+        # Mock publishing for now
+        # TODO: Call the platform APIs with the account's access token
+        return f"mock_{post.id}"
+        
+    async def record_post_result(
+        self,
+        post_schedule_id: str,
+        success: bool,
+        platform_post_id: Optional[str] = None,
+        error_message: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Record the outcome of publishing a scheduled post"""
+        task_id = f"record_post_result_{post_schedule_id}"
+        
+        return await self.execute_task(
+            task_id,
+            self._record_post_result_task,
+            post_schedule_id,
+            success,
+            platform_post_id,
+            error_message
+        )
+        
+    async def _record_post_result_task(
+        self,
+        post_schedule_id: str,
+        success: bool,
+        platform_post_id: Optional[str] = None,
+        error_message: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Internal task for recording post outcomes"""
+        try:
+            if success:
+                status = "success"
+                error_message = None
+                target = POSTED
+                notification_type = "posting_success"
+                notification_message = "Content posted successfully"
+            else:
+                status = "failed"
+                target = POSTING_FAILED
+                notification_type = "posting_failed"
+                notification_message = f"Content posting failed: {error_message or 'unknown error'}"
+                
+            session = await self.get_database_session()
+            async with session:
+                result = await session.execute(
+                    text(RECORD_POST_RESULT_SQL),
+                    {
+                        "id": post_schedule_id,
+                        "status": status,
+                        "success": success,
+                        "platform_post_id": platform_post_id,
+                        "error_message": error_message
+                    }
+                )
+                post_schedule = result.first()
+                
+                if not post_schedule:
+                    raise ValueError(f"Scheduled post not found: {post_schedule_id}")
+                    
+                content_piece_id = str(post_schedule.content_piece_id)
+                change = await transition(session, content_piece_id, target)
+                
+                await session.execute(
+                    text(INSERT_NOTIFICATION_SQL),
+                    {
+                        "agent_id": str(change.agent_id),
+                        "notification_type": notification_type,
+                        "message_text": notification_message,
+                        "related_entity_id": content_piece_id
+                    }
+                )
+                await session.commit()
+                
+            was_failed = post_schedule.previous_status == "failed"
+            await get_status_counters().add(
+                str(change.agent_id),
+                failed_posts=int(not success) - int(was_failed),
+                unread_notifications=1
+            )
+            
+            return {
+                "post_schedule_id": post_schedule_id,
+                "status": status,
+                "platform_post_id": platform_post_id,
+                "error_message": error_message
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to record post result", error=str(e))
             raise
\ No newline at end of file
@@ -3,15 +3,104 @@ User Proxy Agent - Handles human-in-the-loop interactions and approvals
 """
 
 import asyncio
-from typing import Dict, Any, Optional
+import base64
+import uuid
+from typing import Dict, Any, List, Optional
 from datetime import datetime
-from sqlalchemy import select
-from database.models import ContentPiece, ApprovalLog, Notification, Agent
+from sqlalchemy import text
 from agents.agents.base_agent import BaseRealEstateAgent
+from services.status_counters import get_status_counters
+from services.content_state import (
+    transition, APPROVED, REJECTED, PENDING_APPROVAL, AWAITING_APPROVAL
+)
 import structlog
 
 logger = structlog.get_logger()
 
+# Applies a batch of approval decisions in one statement: updates the content
+# pieces owned by the agent that are awaiting a decision, then logs and
+# notifies for exactly those rows. The status condition is re-checked if a
+# concurrent writer changed the row first, so no explicit locks are needed.
+BATCH_APPROVAL_SQL = """
+    WITH decisions AS (
+        SELECT *
+        FROM unnest(CAST(:ids AS uuid[]), CAST(:approved AS boolean[]), CAST(:feedback AS text[]))
+            AS d(content_piece_id, approved, feedback)
+    ),
+    updated AS (
+        UPDATE public.rltr_mktg_content_pieces AS c
+        SET status = CASE WHEN d.approved THEN 'approved_for_posting' ELSE 'rejected' END,
+            last_approved_at = CASE WHEN d.approved THEN now() ELSE c.last_approved_at END,
+            feedback = COALESCE(d.feedback, c.feedback),
+            version = c.version + 1,
+            updated_at = now()
+        FROM decisions AS d, public.rltr_mktg_content_pieces AS previous
+        WHERE c.id = d.content_piece_id AND previous.id = c.id AND c.agent_id = CAST(:agent_id AS uuid)
+          AND c.status = ANY(CAST(:awaiting AS text[]))
+        RETURNING c.id, c.status, previous.status AS previous_status, d.approved, d.feedback
+    ),
+    logs AS (
+        INSERT INTO public.rltr_mktg_approval_logs (content_piece_id, agent_id, action_type, feedback)
+        SELECT id, CAST(:agent_id AS uuid), CASE WHEN approved THEN 'approved' ELSE 'rejected' END, feedback
+        FROM updated
+        RETURNING id, content_piece_id
+    ),
+    notifications AS (
+        INSERT INTO public.rltr_mktg_notifications (agent_id, notification_type, message_text, related_entity_id)
+        SELECT CAST(:agent_id AS uuid), 'approval_processed',
+               CASE WHEN approved THEN 'Content approved and ready for posting'
+                    ELSE 'Content rejected and needs revision' END,
+               id
+        FROM updated
+    )
+    SELECT u.id, u.status, u.previous_status, u.feedback, l.id AS approval_log_id
+    FROM updated AS u
+    JOIN logs AS l ON l.content_piece_id = u.id
+"""
+
+# Newest first, served from idx_content_pieces_agent_pending without
+# touching the table unless the generated text is requested; the row
+# comparison resumes after the cursor
+PENDING_APPROVALS_SQL = """
+    SELECT id, content_type, listing_id, created_at{columns}
+    FROM public.rltr_mktg_content_pieces
+    WHERE agent_id = CAST(:agent_id AS uuid)
+      AND status = 'pending_approval_agent'
+      {after}
+    ORDER BY created_at DESC, id DESC
+    LIMIT :limit
+"""
+
+APPROVAL_DETAIL_SQL = """
+    SELECT id, content_type, status, generated_text, feedback, created_at, listing_id
+    FROM public.rltr_mktg_content_pieces
+    WHERE id = CAST(:content_piece_id AS uuid)
+      AND agent_id = CAST(:agent_id AS uuid)
+"""
+
+INSERT_APPROVAL_LOG_SQL = """
+    INSERT INTO public.rltr_mktg_approval_logs (content_piece_id, agent_id, action_type, feedback)
+    VALUES (CAST(:content_piece_id AS uuid), CAST(:agent_id AS uuid), :action_type, :feedback)
+    RETURNING id
+"""
+
+INSERT_NOTIFICATION_SQL = """
+    INSERT INTO public.rltr_mktg_notifications (agent_id, notification_type, message_text, related_entity_id)
+    VALUES (CAST(:agent_id AS uuid), :notification_type, :message_text, CAST(:related_entity_id AS uuid))
+    RETURNING id
+"""
+
+def encode_cursor(created_at: datetime, content_piece_id: str) -> str:
+    """Opaque keyset cursor for the row a page ended on"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{content_piece_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, content_piece_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), str(uuid.UUID(content_piece_id))
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
 class UserProxyAgent(BaseRealEstateAgent):
     """Agent that handles human-in-the-loop interactions and approval workflows"""
     
@@ -58,45 +147,45 @@ class UserProxyAgent(BaseRealEstateAgent):
         """Internal task for requesting content approval"""
         try:
             session = await self.get_database_session()
-            
-            # Get content piece
-            result = await session.execute(
-                select(ContentPiece).where(ContentPiece.id == content_piece_id)
-            )
-            content_piece = result.scalar_one_or_none()
-            
-            if not content_piece:
-                raise ValueError(f"Content piece not found: {content_piece_id}")
+            async with session:
+                # Update content status to pending approval
+                change = await transition(session, content_piece_id, PENDING_APPROVAL)
                 
-            # Update content status to pending approval
-            content_piece.status = "pending_approval_agent"
-            
-            # Create notification for the agent
-            notification = Notification(
-                agent_id=agent_id,
-                notification_type="content_approval_request",
-                message_text=f"New {content_piece.content_type} content ready for approval",
-                related_entity_id=content_piece_id
-            )
-            
-            session.add(notification)
-            
-            # Log the approval request
-            approval_log = ApprovalLog(
-                content_piece_id=content_piece_id,
-                agent_id=agent_id,
-                action_type="requested_revisions",
-                feedback="Approval requested from agent"
+                # Create notification for the agent
+                notification = await session.execute(
+                    text(INSERT_NOTIFICATION_SQL),
+                    {
+                        "agent_id": agent_id,
+                        "notification_type": "content_approval_request",
+                        "message_text": f"New {change.content_type} content ready for approval",
+                        "related_entity_id": content_piece_id
+                    }
+                )
+                notification_id = notification.scalar_one()
+                
+                # Log the approval request
+                await session.execute(
+                    text(INSERT_APPROVAL_LOG_SQL),
+                    {
+                        "content_piece_id": content_piece_id,
+                        "agent_id": agent_id,
+                        "action_type": "requested_revisions",
+                        "feedback": "Approval requested from agent"
+                    }
+                )
+                await session.commit()
+                
+            await get_status_counters().add(
+                agent_id,
+                pending_approvals=1 if change.changed else 0,
+                unread_notifications=1
             )
             
-            session.add(approval_log)
-            await session.commit()
-            
             result = {
                 "content_piece_id": content_piece_id,
                 "agent_id": agent_id,
                 "status": "pending_approval_agent",
-                "notification_id": str(notification.id)
+                "notification_id": str(notification_id)
             }
             
             await self.log_action("approval_requested", result)
@@ -137,57 +226,63 @@ class UserProxyAgent(BaseRealEstateAgent):
         try:
             session = await self.get_database_session()
             
-            # Get content piece
-            result = await session.execute(
-                select(ContentPiece).where(ContentPiece.id == content_piece_id)
-            )
-            content_piece = result.scalar_one_or_none()
-            
-            if not content_piece:
-                raise ValueError(f"Content piece not found: {content_piece_id}")
-                
             # Update content status based on approval
             if approved:
-                content_piece.status = "approved_for_posting"
-                content_piece.last_approved_at = datetime.utcnow()
+                target = APPROVED
+                updates = {"last_approved_at": datetime.utcnow()}
                 action_type = "approved"
                 notification_message = f"Content approved and ready for posting"
             else:
-                content_piece.status = "rejected"
+                target = REJECTED
+                updates = {}
                 action_type = "rejected"
                 notification_message = f"Content rejected and needs revision"
                 
             # Add feedback if provided
             if feedback:
-                content_piece.feedback = feedback
+                updates["feedback"] = feedback
                 
-            # Log the approval decision
-            approval_log = ApprovalLog(
-                content_piece_id=content_piece_id,
-                agent_id=agent_id,
-                action_type=action_type,
-                feedback=feedback
-            )
-            
-            session.add(approval_log)
-            
-            # Create notification about the decision
-            notification = Notification(
-                agent_id=agent_id,
-                notification_type="approval_processed",
-                message_text=notification_message,
-                related_entity_id=content_piece_id
+            async with session:
+                change = await transition(
+                    session, content_piece_id, target, updates, allowed_from=AWAITING_APPROVAL
+                )
+                
+                # Log the approval decision
+                approval_log = await session.execute(
+                    text(INSERT_APPROVAL_LOG_SQL),
+                    {
+                        "content_piece_id": content_piece_id,
+                        "agent_id": agent_id,
+                        "action_type": action_type,
+                        "feedback": feedback
+                    }
+                )
+                approval_log_id = approval_log.scalar_one()
+                
+                # Create notification about the decision
+                await session.execute(
+                    text(INSERT_NOTIFICATION_SQL),
+                    {
+                        "agent_id": agent_id,
+                        "notification_type": "approval_processed",
+                        "message_text": notification_message,
+                        "related_entity_id": content_piece_id
+                    }
+                )
+                await session.commit()
+                
+            await get_status_counters().add(
+                agent_id,
+                pending_approvals=-1 if change.previous_status == PENDING_APPROVAL else 0,
+                unread_notifications=1
             )
             
-            session.add(notification)
-            await session.commit()
-            
             result = {
                 "content_piece_id": content_piece_id,
                 "approved": approved,
-                "status": content_piece.status,
+                "status": change.status,
                 "feedback": feedback,
-                "approval_log_id": str(approval_log.id)
+                "approval_log_id": str(approval_log_id)
             }
             
             await self.log_action("approval_processed", result)
@@ -198,6 +293,130 @@ class UserProxyAgent(BaseRealEstateAgent):
             logger.error(f"Failed to process approval response", error=str(e))
             raise
             
+    async def process_approval_batch(
+        self,
+        agent_id: str,
+        decisions: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Apply many approval decisions from an agent in one transaction"""
+        task_id = f"process_approval_batch_{agent_id}_{asyncio.get_event_loop().time()}"
+        
+        return await self.execute_task(
+            task_id,
+            self._process_approval_batch_task,
+            agent_id,
+            decisions
+        )
+        
+    async def _process_approval_batch_task(
+        self,
+        agent_id: str,
+        decisions: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Internal task for processing a batch of approval decisions
+        
+        Each decision is {"content_piece_id", "approved", "feedback"}; if a piece
+        appears more than once the last decision wins. Results are returned per
+        decision, in order, with status "not_found" for pieces that do not exist
+        or belong to another agent, "invalid_transition" for pieces that are not
+        awaiting approval and "invalid_id" for malformed ids.
+        """
+        try:
+            def normalized_id(decision: Dict[str, Any]) -> Optional[str]:
+                try:
+                    return str(uuid.UUID(str(decision.get("content_piece_id"))))
+                except ValueError:
+                    return None
+                    
+            latest: Dict[str, Dict[str, Any]] = {}
+            for decision in decisions:
+                content_piece_id = normalized_id(decision)
+                if content_piece_id:
+                    latest[content_piece_id] = decision
+                
+            applied = {}
+            current_status = {}
+            if latest:
+                session = await self.get_database_session()
+                
+                result = await session.execute(
+                    text(BATCH_APPROVAL_SQL),
+                    {
+                        "agent_id": agent_id,
+                        "awaiting": list(AWAITING_APPROVAL),
+                        "ids": list(latest),
+                        "approved": [bool(decision.get("approved")) for decision in latest.values()],
+                        "feedback": [decision.get("feedback") for decision in latest.values()]
+                    }
+                )
+                applied = {str(row.id): row for row in result.all()}
+                
+                # Tell pieces that exist but were not awaiting approval apart
+                skipped = [content_piece_id for content_piece_id in latest if content_piece_id not in applied]
+                if skipped:
+                    result = await session.execute(
+                        text("""
+                            SELECT id, status FROM public.rltr_mktg_content_pieces
+                            WHERE id = ANY(CAST(:ids AS uuid[])) AND agent_id = CAST(:agent_id AS uuid)
+                        """),
+                        {"ids": skipped, "agent_id": agent_id}
+                    )
+                    current_status = {str(row.id): row.status for row in result.all()}
+                    
+                await session.commit()
+                
+                await get_status_counters().add(
+                    agent_id,
+                    pending_approvals=-sum(1 for row in applied.values() if row.previous_status == "pending_approval_agent"),
+                    unread_notifications=len(applied)
+                )
+                
+            items = []
+            for decision in decisions:
+                content_piece_id = normalized_id(decision)
+                row = applied.get(content_piece_id)
+                if row is None:
+                    if not content_piece_id:
+                        status = "invalid_id"
+                    elif content_piece_id in current_status:
+                        status = "invalid_transition"
+                    else:
+                        status = "not_found"
+                    item = {
+                        "content_piece_id": content_piece_id or str(decision.get("content_piece_id")),
+                        "status": status
+                    }
+                    if status == "invalid_transition":
+                        item["current_status"] = current_status[content_piece_id]
+                    items.append(item)
+                    continue
+                items.append({
+                    "content_piece_id": content_piece_id,
+                    "approved": row.status == "approved_for_posting",
+                    "status": row.status,
+                    "feedback": row.feedback,
+                    "approval_log_id": str(row.approval_log_id)
+                })
+                
+            result = {
+                "agent_id": agent_id,
+                "requested": len(decisions),
+                "approved": sum(1 for row in applied.values() if row.status == "approved_for_posting"),
+                "rejected": sum(1 for row in applied.values() if row.status == "rejected"),
+                "failed": sum(1 for item in items if "approval_log_id" not in item),
+                "results": items
+            }
+            
+            await self.log_action("approval_batch_processed", {
+                key: value for key, value in result.items() if key != "results"
+            })
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Failed to process approval batch", error=str(e))
+            raise
+            
     async def create_notification(
         self,
         agent_id: str,
@@ -227,29 +446,33 @@ class UserProxyAgent(BaseRealEstateAgent):
         """Internal task for creating notifications"""
         try:
             session = await self.get_database_session()
-            
-            # Verify agent exists
-            result = await session.execute(
-                select(Agent).where(Agent.id == agent_id)
-            )
-            agent = result.scalar_one_or_none()
-            
-            if not agent:
-                raise ValueError(f"Agent not found: {agent_id}")
+            async with session:
+                # Verify agent exists
+                result = await session.execute(
+                    text("SELECT 1 FROM public.rltr_mktg_agents WHERE id = CAST(:agent_id AS uuid)"),
+                    {"agent_id": agent_id}
+                )
                 
-            # Create notification
-            notification = Notification(
-                agent_id=agent_id,
-                notification_type=notification_type,
-                message_text=message,
-                related_entity_id=related_entity_id
-            )
-            
-            session.add(notification)
-            await session.commit()
+                if result.first() is None:
+                    raise ValueError(f"Agent not found: {agent_id}")
+                    
+                # Create notification
+                notification = await session.execute(
+                    text(INSERT_NOTIFICATION_SQL),
+                    {
+                        "agent_id": agent_id,
+                        "notification_type": notification_type,
+                        "message_text": message,
+                        "related_entity_id": related_entity_id
+                    }
+                )
+                notification_id = notification.scalar_one()
+                await session.commit()
+                
+            await get_status_counters().add(agent_id, unread_notifications=1)
             
             result = {
-                "notification_id": str(notification.id),
+                "notification_id": str(notification_id),
                 "agent_id": agent_id,
                 "type": notification_type,
                 "message": message
@@ -263,37 +486,84 @@ class UserProxyAgent(BaseRealEstateAgent):
             logger.error(f"Failed to create notification", error=str(e))
             raise
             
-    async def get_pending_approvals(self, agent_id: str) -> Dict[str, Any]:
-        """Get pending content approvals for an agent"""
+    async def get_pending_approvals(
+        self,
+        agent_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        include_content: bool = False
+    ) -> Dict[str, Any]:
+        """Get a page of content pending approval for an agent, newest first
+        
+        Items are summaries; pass the returned next_cursor to get the next
+        page and use get_approval_detail (or include_content) for the text.
+        """
         try:
             session = await self.get_database_session()
             
-            # Get content pieces pending approval for this agent
+            limit = max(1, min(limit, 200))
+            params = {"agent_id": agent_id, "limit": limit + 1}
+            after = ""
+            if cursor:
+                params["after_created_at"], params["after_id"] = decode_cursor(cursor)
+                after = "AND (created_at, id) < (:after_created_at, CAST(:after_id AS uuid))"
+                
+            columns = ", generated_text" if include_content else ""
             result = await session.execute(
-                select(ContentPiece)
-                .where(ContentPiece.agent_id == agent_id)
-                .where(ContentPiece.status == "pending_approval_agent")
-                .order_by(ContentPiece.created_at.desc())
+                text(PENDING_APPROVALS_SQL.format(columns=columns, after=after)),
+                params
             )
-            
-            pending_content = result.scalars().all()
+            rows = result.all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
             
             approvals = []
-            for content in pending_content:
-                approvals.append({
+            for content in rows:
+                approval = {
                     "content_piece_id": str(content.id),
                     "content_type": content.content_type,
-                    "generated_text": content.generated_text,
                     "created_at": content.created_at.isoformat(),
                     "listing_id": str(content.listing_id) if content.listing_id else None
-                })
+                }
+                if include_content:
+                    approval["generated_text"] = content.generated_text
+                approvals.append(approval)
                 
             return {
                 "agent_id": agent_id,
-                "pending_count": len(approvals),
-                "pending_approvals": approvals
+                "pending_approvals": approvals,
+                "has_more": has_more,
+                "next_cursor": encode_cursor(rows[-1].created_at, str(rows[-1].id)) if has_more else None
             }
             
         except Exception as e:
             logger.error(f"Failed to get pending approvals", error=str(e))
+            raise
+            
+    async def get_approval_detail(self, agent_id: str, content_piece_id: str) -> Dict[str, Any]:
+        """Get one content piece with its generated text"""
+        try:
+            session = await self.get_database_session()
+            
+            result = await session.execute(
+                text(APPROVAL_DETAIL_SQL),
+                {"content_piece_id": content_piece_id, "agent_id": agent_id}
+            )
+            content = result.first()
+            
+            if not content:
+                raise ValueError(f"Content piece not found: {content_piece_id}")
+                
+            return {
+                "content_piece_id": str(content.id),
+                "content_type": content.content_type,
+                "status": content.status,
+                "generated_text": content.generated_text,
+                "feedback": content.feedback,
+                "created_at": content.created_at.isoformat(),
+                "listing_id": str(content.listing_id) if content.listing_id else None
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to get approval detail", error=str(e))
             raise
\ No newline at end of file
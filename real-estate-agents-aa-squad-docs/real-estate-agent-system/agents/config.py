@@ -13,6 +13,117 @@ class Settings:
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     portkey_api_key: str = os.getenv("PORTKEY_API_KEY", "")
     portkey_virtual_key: str = os.getenv("PORTKEY_VIRTUAL_KEY", "")
+    portkey_gateway_url: str = os.getenv("PORTKEY_GATEWAY_URL", "https://api.portkey.ai/v1")
+    anthropic_api_key: str = os.getenv("ANTHROPIC_API_KEY", "")
+    anthropic_model: str = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20241022")
+    
+    # LLM routing: "live" uses the configured providers, "record" also saves
+    # their responses to the cassette, "replay" serves the cassette offline
+    # and "stub" uses canned offline stubs
+    llm_provider_mode: str = os.getenv("LLM_PROVIDER_MODE", "live")
+    llm_cassette_path: str = os.getenv("LLM_CASSETTE_PATH", "data/llm_cassette.jsonl")
+    llm_replay_latency: str = os.getenv("LLM_REPLAY_LATENCY", "recorded")
+    llm_replay_latency_scale: float = float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1.0"))
+    llm_hedge_default_delay: float = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "8.0"))
+    llm_max_error_rate: float = float(os.getenv("LLM_MAX_ERROR_RATE", "0.5"))
+    
+    # LLM rate limits: JSON of {"route or model": {"rpm": n, "tpm": n}}; 0 = unlimited
+    llm_rate_limits: str = os.getenv("LLM_RATE_LIMITS", "")
+    llm_default_rpm: int = int(os.getenv("LLM_DEFAULT_RPM", "0"))
+    llm_default_tpm: int = int(os.getenv("LLM_DEFAULT_TPM", "0"))
+    llm_rate_limit_headroom: float = float(os.getenv("LLM_RATE_LIMIT_HEADROOM", "0.95"))
+    llm_rate_limit_redis: bool = os.getenv("LLM_RATE_LIMIT_REDIS", "false").lower() == "true"
+    
+    # Generation cache
+    generation_cache_max_entries: int = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "2048"))
+    generation_cache_ttl_seconds: int = int(os.getenv("GENERATION_CACHE_TTL_SECONDS", "86400"))
+    semantic_cache_enabled: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    semantic_cache_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+    
+    # Embeddings (384-dim local model; "hashing-v1" for the dependency-free embedder)
+    embedding_model: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    embedding_batch_size: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    embedding_max_wait_ms: float = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "10"))
+    
+    # In-process mirror of meta.embeddings
+    vector_index_enabled: bool = os.getenv("VECTOR_INDEX_ENABLED", "true").lower() == "true"
+    vector_index_snapshot_dir: str = os.getenv("VECTOR_INDEX_SNAPSHOT_DIR", "data/vector_index")
+    vector_index_sync_seconds: float = float(os.getenv("VECTOR_INDEX_SYNC_SECONDS", "30"))
+    vector_index_snapshot_seconds: float = float(os.getenv("VECTOR_INDEX_SNAPSHOT_SECONDS", "900"))
+    # How far back each sync re-reads changes, to catch late-committing writes
+    vector_index_sync_window_seconds: float = float(os.getenv("VECTOR_INDEX_SYNC_WINDOW_SECONDS", "300"))
+    vector_index_tombstone_days: int = int(os.getenv("VECTOR_INDEX_TOMBSTONE_DAYS", "7"))
+    
+    # Dashboard badge counters (Redis-backed when enabled, else per process)
+    status_counters_redis: bool = os.getenv("STATUS_COUNTERS_REDIS", "true").lower() == "true"
+    status_counters_reconcile_seconds: float = float(os.getenv("STATUS_COUNTERS_RECONCILE_SECONDS", "300"))
+    
+    # Monthly partitions of the notification and approval log tables;
+    # retention is in whole months before the current one (0 = keep all)
+    partition_months_ahead: int = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+    partition_maintenance_seconds: float = float(os.getenv("PARTITION_MAINTENANCE_SECONDS", "86400"))
+    partition_drop_detached: bool = os.getenv("PARTITION_DROP_DETACHED", "true").lower() == "true"
+    notifications_retention_months: int = int(os.getenv("NOTIFICATIONS_RETENTION_MONTHS", "6"))
+    approval_logs_retention_months: int = int(os.getenv("APPROVAL_LOGS_RETENTION_MONTHS", "24"))
+    
+    # Notification delivery: batches are claimed with a lease and drained each
+    # cycle; failed channels are retried with exponential backoff
+    notification_agent_cache_ttl_seconds: float = float(os.getenv("NOTIFICATION_AGENT_CACHE_TTL_SECONDS", "300"))
+    notification_delivery_batch_size: int = int(os.getenv("NOTIFICATION_DELIVERY_BATCH_SIZE", "200"))
+    notification_delivery_lease_seconds: float = float(os.getenv("NOTIFICATION_DELIVERY_LEASE_SECONDS", "300"))
+    notification_delivery_max_attempts: int = int(os.getenv("NOTIFICATION_DELIVERY_MAX_ATTEMPTS", "5"))
+    notification_delivery_retry_seconds: float = float(os.getenv("NOTIFICATION_DELIVERY_RETRY_SECONDS", "60"))
+    notification_delivery_max_age_hours: int = int(os.getenv("NOTIFICATION_DELIVERY_MAX_AGE_HOURS", "24"))
+    # How often a batch in flight records finished channels and renews its lease
+    notification_delivery_progress_seconds: float = float(os.getenv("NOTIFICATION_DELIVERY_PROGRESS_SECONDS", "5"))
+    
+    # Digests: notifications of the same agent and type are held for the
+    # window and sent as one message (0 disables); urgent types skip it
+    notification_digest_window_seconds: float = float(os.getenv("NOTIFICATION_DIGEST_WINDOW_SECONDS", "300"))
+    notification_digest_max_items: int = int(os.getenv("NOTIFICATION_DIGEST_MAX_ITEMS", "10"))
+    notification_urgent_types: list = [
+        notification_type.strip()
+        for notification_type in os.getenv("NOTIFICATION_URGENT_TYPES", "posting_failed,system_alert").split(",")
+        if notification_type.strip()
+    ]
+    
+    # Per-channel fan-out: concurrent sends allowed per provider, and the
+    # in-cycle retries before a channel is left for the next claim
+    notification_email_concurrency: int = int(os.getenv("NOTIFICATION_EMAIL_CONCURRENCY", "20"))
+    notification_push_concurrency: int = int(os.getenv("NOTIFICATION_PUSH_CONCURRENCY", "100"))
+    notification_sms_concurrency: int = int(os.getenv("NOTIFICATION_SMS_CONCURRENCY", "5"))
+    notification_channel_timeout_seconds: float = float(os.getenv("NOTIFICATION_CHANNEL_TIMEOUT_SECONDS", "10"))
+    notification_channel_retries: int = int(os.getenv("NOTIFICATION_CHANNEL_RETRIES", "2"))
+    notification_channel_retry_backoff: float = float(os.getenv("NOTIFICATION_CHANNEL_RETRY_BACKOFF", "0.5"))
+    
+    # Email over pooled SMTP connections (empty host = log only). Locally the
+    # docker-compose mailpit service accepts everything on port 1025.
+    smtp_host: str = os.getenv("SMTP_HOST", "")
+    smtp_port: int = int(os.getenv("SMTP_PORT", "587"))
+    smtp_username: str = os.getenv("SMTP_USERNAME", "")
+    smtp_password: str = os.getenv("SMTP_PASSWORD", "")
+    smtp_use_tls: bool = os.getenv("SMTP_USE_TLS", "false").lower() == "true"
+    smtp_start_tls: str = os.getenv("SMTP_START_TLS", "auto").lower()  # auto, true or false
+    smtp_sender: str = os.getenv("SMTP_SENDER", "Real Estate Marketing System <notifications@localhost>")
+    smtp_pool_size: int = int(os.getenv("SMTP_POOL_SIZE", "10"))
+    smtp_max_messages_per_connection: int = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+    smtp_max_idle_seconds: float = float(os.getenv("SMTP_MAX_IDLE_SECONDS", "60"))
+    smtp_rate_per_second: float = float(os.getenv("SMTP_RATE_PER_SECOND", "0"))
+    smtp_timeout_seconds: float = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+    
+    # Redis channel the API gateway's push hub subscribes to
+    push_channel: str = os.getenv("PUSH_CHANNEL", "notifications:push")
+    
+    # Engagement ingestion: the gateway appends events to a Redis stream that
+    # is consumed here in micro-batches and handed to the lead manager
+    engagement_ingest_enabled: bool = os.getenv("ENGAGEMENT_INGEST_ENABLED", "true").lower() == "true"
+    engagement_stream: str = os.getenv("ENGAGEMENT_STREAM", "engagements:ingest")
+    engagement_consumer_group: str = os.getenv("ENGAGEMENT_CONSUMER_GROUP", "lead-manager")
+    engagement_batch_size: int = int(os.getenv("ENGAGEMENT_BATCH_SIZE", "500"))
+    engagement_batch_wait_ms: int = int(os.getenv("ENGAGEMENT_BATCH_WAIT_MS", "1000"))
+    engagement_dedupe_ttl_seconds: int = int(os.getenv("ENGAGEMENT_DEDUPE_TTL_SECONDS", "86400"))
+    engagement_max_deliveries: int = int(os.getenv("ENGAGEMENT_MAX_DELIVERIES", "5"))
+    lead_notification_score: float = float(os.getenv("LEAD_NOTIFICATION_SCORE", "0.8"))
     
     # Application Settings
     environment: str = os.getenv("ENVIRONMENT", "development")
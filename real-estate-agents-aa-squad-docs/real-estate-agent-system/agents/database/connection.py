@@ -3,28 +3,58 @@ Database connection and session management for agents
 """
 
 import asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import text
 import structlog
 from config import settings
 
 logger = structlog.get_logger()
 
+# Database engine and session
+engine = None
+async_session_maker = None
+
 async def init_database():
     """Initialize database connection and tables"""
+    global engine, async_session_maker
+    
     try:
-        # Mock database initialization for now
-        # TODO: Implement actual database connection
+        # Create async engine
+        engine = create_async_engine(
+            settings.database_url.replace("postgresql://", "postgresql+asyncpg://"),
+            echo=True if settings.log_level == "DEBUG" else False,
+            pool_size=10,
+            max_overflow=20,
+            pool_pre_ping=True,
+            pool_recycle=300
+        )
+        
+        # Create session maker
+        async_session_maker = async_sessionmaker(
+            engine,
+            class_=AsyncSession,
+            expire_on_commit=False
+        )
+        
+        # Test connection
+        async with engine.begin() as conn:
+            await conn.execute(text("SELECT 1"))
+            
         logger.info("Database connection established successfully")
         
     except Exception as e:
         logger.error("Failed to initialize database", error=str(e))
         raise
 
-async def get_session():
+async def get_session() -> AsyncSession:
     """Get database session"""
-    # Mock session for now
-    # TODO: Implement actual database session
-    return None
+    if not async_session_maker:
+        raise RuntimeError("Database not initialized")
+        
+    return async_session_maker()
 
 async def close_database():
     """Close database connections"""
+    if engine:
+        await engine.dispose()
     logger.info("Database connections closed")
\ No newline at end of file
@@ -28,6 +28,7 @@ class ContentPiece:
         self.agent_id = agent_id
         self.content_type = content_type
         self.status = "draft"
+        self.version = 0
         self.generated_text = {}
 
 class SocialMediaAccount:
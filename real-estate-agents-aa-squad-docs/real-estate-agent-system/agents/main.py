@@ -4,13 +4,18 @@ Main entry point for the AG2 agent system
 """
 
 import asyncio
+import json
 import uvicorn
+from typing import Optional
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 import structlog
 from orchestrator import AgentOrchestrator
 from config import settings
-from database.connection import init_database
+from database.connection import init_database, close_database
+from services.rate_limiter import close_rate_limiter
+from services.content_state import InvalidTransition, TransitionConflict
 
 logger = structlog.get_logger()
 
@@ -41,6 +46,8 @@ async def lifespan(app: FastAPI):
         # Cleanup
         if orchestrator:
             await orchestrator.shutdown()
+        await close_rate_limiter()
+        await close_database()
         logger.info("Application shutdown complete")
 
 # Create FastAPI app
@@ -74,10 +81,52 @@ async def generate_content(request: dict):
             agent_id=request.get("agent_id")
         )
         return {"status": "success", "result": result}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error("Failed to generate content", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/agents/generate-content/stream")
+async def stream_content(request: dict):
+    """Stream content generation for a listing as server-sent events"""
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    async def event_stream():
+        async for event in orchestrator.stream_content(
+            listing_id=request.get("listing_id"),
+            content_type=request.get("content_type"),
+            agent_id=request.get("agent_id")
+        ):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+            
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/agents/generate-content-variants")
+async def generate_content_variants(request: dict):
+    """Generate multiple content types / platform posts for a listing in one LLM call"""
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    try:
+        result = await orchestrator.generate_content_variants(
+            listing_id=request.get("listing_id"),
+            content_types=request.get("content_types", []),
+            agent_id=request.get("agent_id"),
+            platforms=request.get("platforms")
+        )
+        return {"status": "success", "result": result}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Failed to generate content variants", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/agents/approve-content")
 async def approve_content(request: dict):
     """Process content approval from an agent"""
@@ -92,10 +141,107 @@ async def approve_content(request: dict):
             feedback=request.get("feedback")
         )
         return {"status": "success", "result": result}
+    except (InvalidTransition, TransitionConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error("Failed to process content approval", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/agents/approve-content/batch")
+async def approve_content_batch(request: dict):
+    """Process many content approvals from an agent in one transaction"""
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    try:
+        result = await orchestrator.process_content_approvals(
+            agent_id=request.get("agent_id"),
+            decisions=request.get("decisions", [])
+        )
+        return {"status": "success", "result": result}
+    except Exception as e:
+        logger.error("Failed to process content approval batch", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/agents/status-counters")
+async def get_status_counters(agent_id: str):
+    """Get dashboard badge counts for an agent"""
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    try:
+        result = await orchestrator.get_status_counters(agent_id)
+        return {"status": "success", "result": result}
+    except Exception as e:
+        logger.error("Failed to get status counters", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/agents/pending-approvals")
+async def get_pending_approvals(
+    agent_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_content: bool = False
+):
+    """Get a page of content pending approval for an agent"""
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    try:
+        result = await orchestrator.get_pending_approvals(agent_id, limit, cursor, include_content)
+        return {"status": "success", "result": result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Failed to get pending approvals", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/agents/pending-approvals/{content_piece_id}")
+async def get_approval_detail(content_piece_id: str, agent_id: str):
+    """Get one content piece pending approval, including its generated text"""
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    try:
+        result = await orchestrator.get_approval_detail(agent_id, content_piece_id)
+        return {"status": "success", "result": result}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Failed to get approval detail", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/agents/notification-preferences")
+async def update_notification_preferences(request: dict):
+    """Update an agent's notification channel preferences"""
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    try:
+        result = await orchestrator.update_notification_preferences(
+            agent_id=request.get("agent_id"),
+            preferences=request.get("preferences", {})
+        )
+        return {"status": "success", "result": result}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Failed to update notification preferences", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/agents/embeddings/backfill")
+async def backfill_embeddings():
+    """Embed all listings that do not have an embedding yet"""
+    if not orchestrator:
+        raise HTTPException(status_code=503, detail="Agent system not initialized")
+    
+    try:
+        result = await orchestrator.backfill_listing_embeddings()
+        return {"status": "success", "result": result}
+    except Exception as e:
+        logger.error("Failed to backfill embeddings", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/agents/status")
 async def get_agent_status():
     """Get status of all agents"""
@@ -3,12 +3,19 @@ Agent Orchestrator - Coordinates all agents in the system
 """
 
 import asyncio
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 from agents.agents.listing_agent import ListingAgent
 from agents.agents.content_agent import ContentAgent
 from agents.agents.social_media_agent import SocialMediaAgent
 from agents.agents.user_proxy_agent import UserProxyAgent
 from agents.agents.notification_agent import NotificationAgent
+from agents.agents.lead_manager_agent import LeadManagerAgent
+from services.embedding_service import get_embedding_service
+from services.vector_index import get_vector_index
+from services.engagement_stream import EngagementStreamConsumer
+from services.status_counters import get_status_counters, close_status_counters
+from services.partition_maintenance import PartitionMaintainer
+from config import settings
 import structlog
 
 logger = structlog.get_logger()
@@ -20,17 +27,26 @@ class AgentOrchestrator:
         self.agents = {}
         self._is_active = False
         self._background_tasks = []
+        self.engagement_consumer = None
         
     async def initialize(self):
         """Initialize all agents"""
         try:
+            # Mirror meta.embeddings in memory before agents start searching it
+            if settings.vector_index_enabled:
+                try:
+                    await get_vector_index().load()
+                except Exception as e:
+                    logger.warning("Vector index unavailable, falling back to Postgres search", error=str(e))
+                    
             # Initialize all agents
             self.agents = {
                 "listing": ListingAgent(),
                 "content": ContentAgent(),
                 "social_media": SocialMediaAgent(),
                 "user_proxy": UserProxyAgent(),
-                "notification": NotificationAgent()
+                "notification": NotificationAgent(),
+                "lead_manager": LeadManagerAgent()
             }
             
             # Initialize each agent
@@ -64,11 +80,19 @@ class AgentOrchestrator:
                     
             self._background_tasks.clear()
             
+            if self.engagement_consumer:
+                await self.engagement_consumer.close()
+                
+            if settings.vector_index_enabled and get_vector_index().ready:
+                await get_vector_index().snapshot()
+                
             # Shutdown all agents
             for agent_name, agent in self.agents.items():
                 await agent.shutdown()
                 logger.info(f"Agent shutdown", agent=agent_name)
                 
+            await close_status_counters()
+            
             logger.info("Agent orchestrator shutdown complete")
             
         except Exception as e:
@@ -96,6 +120,29 @@ class AgentOrchestrator:
                 asyncio.create_task(self._periodic_listing_scraping())
             )
             
+            # Task to keep the in-process vector index current
+            if settings.vector_index_enabled:
+                self._background_tasks.append(
+                    asyncio.create_task(self._periodic_vector_index_sync())
+                )
+            
+            # Task to correct drift in the dashboard badge counters
+            self._background_tasks.append(
+                asyncio.create_task(self._periodic_counter_reconciliation())
+            )
+            
+            # Task to create upcoming log partitions and retire old ones
+            self._background_tasks.append(
+                asyncio.create_task(self._periodic_partition_maintenance())
+            )
+            
+            # Task to consume engagement events buffered by the gateway
+            if settings.engagement_ingest_enabled:
+                self.engagement_consumer = EngagementStreamConsumer.from_settings(self.handle_engagement_batch)
+                self._background_tasks.append(
+                    asyncio.create_task(self.engagement_consumer.run())
+                )
+            
             logger.info("Background tasks started")
             
         except Exception as e:
@@ -140,11 +187,67 @@ class AgentOrchestrator:
                 logger.error("Error in periodic listing scraping", error=str(e))
                 await asyncio.sleep(60)  # Wait a minute before retrying
                 
+    async def _periodic_vector_index_sync(self):
+        """Periodically pull meta.embeddings changes and snapshot the index"""
+        index = get_vector_index()
+        last_snapshot = asyncio.get_running_loop().time()
+        while self._is_active:
+            try:
+                await asyncio.sleep(settings.vector_index_sync_seconds)
+                if not self._is_active:
+                    continue
+                if not index.ready:
+                    await index.load()
+                else:
+                    await index.sync()
+                if asyncio.get_running_loop().time() - last_snapshot >= settings.vector_index_snapshot_seconds:
+                    await index.snapshot()
+                    last_snapshot = asyncio.get_running_loop().time()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Error in periodic vector index sync", error=str(e))
+                await asyncio.sleep(5)
+                
+    async def _periodic_counter_reconciliation(self):
+        """Periodically recount badge counters from the database"""
+        while self._is_active:
+            try:
+                # Runs once at startup too, so counters start from the database
+                result = await get_status_counters().reconcile()
+                if result["corrected"]:
+                    logger.info("Status counters reconciled", **result)
+                await asyncio.sleep(settings.status_counters_reconcile_seconds)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Error in status counter reconciliation", error=str(e))
+                await asyncio.sleep(60)
+                
+    async def _periodic_partition_maintenance(self):
+        """Periodically maintain the monthly notification / approval log partitions"""
+        maintainer = PartitionMaintainer.from_settings()
+        while self._is_active:
+            try:
+                # Runs once at startup too, so the coming months always exist
+                await maintainer.run()
+                await asyncio.sleep(settings.partition_maintenance_seconds)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Error in partition maintenance", error=str(e))
+                await asyncio.sleep(300)
+                
     async def process_new_listing(self, listing_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process a new listing through the agent system"""
         try:
             logger.info("Processing new listing", listing_id=listing_data.get("id"))
             
+            # Cached content is keyed by listing fingerprint; entries are
+            # only dropped when a re-scrape actually changed the listing
+            if listing_data.get("id"):
+                await self.agents["content"].refresh_listing(listing_data)
+                
             # This would trigger content generation for the new listing
             result = {
                 "status": "processed",
@@ -158,6 +261,31 @@ class AgentOrchestrator:
             logger.error("Failed to process new listing", error=str(e))
             raise
             
+    async def handle_engagement_batch(
+        self,
+        agent_id: str,
+        listing_id: Optional[str],
+        events: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Hand a deduplicated batch of engagement events to the lead manager"""
+        try:
+            return await self.agents["lead_manager"].process_engagements(agent_id, listing_id, events)
+            
+        except Exception as e:
+            logger.error("Failed to handle engagement batch", error=str(e))
+            raise
+            
+    async def backfill_listing_embeddings(self) -> Dict[str, Any]:
+        """Embed every listing that is missing from meta.embeddings"""
+        try:
+            result = await get_embedding_service().backfill_listings()
+            logger.info("Listing embedding backfill complete", **result)
+            return result
+            
+        except Exception as e:
+            logger.error("Failed to backfill listing embeddings", error=str(e))
+            raise
+            
     async def process_content_approval(
         self,
         content_id: str,
@@ -187,6 +315,28 @@ class AgentOrchestrator:
             logger.error("Failed to process content approval", error=str(e))
             raise
             
+    async def process_content_approvals(
+        self,
+        agent_id: str,
+        decisions: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Process many content approvals from an agent in one transaction"""
+        try:
+            logger.info("Processing content approval batch", 
+                       agent_id=agent_id, 
+                       decisions=len(decisions))
+            
+            result = await self.agents["user_proxy"].process_approval_batch(agent_id, decisions)
+            
+            if result["approved"]:
+                logger.info("Content approved, ready for scheduling", approved=result["approved"])
+                
+            return result
+            
+        except Exception as e:
+            logger.error("Failed to process content approval batch", error=str(e))
+            raise
+            
     async def generate_content(
         self,
         listing_id: str,
@@ -199,9 +349,12 @@ class AgentOrchestrator:
                        listing_id=listing_id, 
                        content_type=content_type)
             
+            # Cache keys are derived from the listing's content, so load it first
+            listing = await self.agents["content"].load_listing(listing_id)
+            
             # Use content agent to generate content
             result = await self.agents["content"].generate_content(
-                listing_id, content_type, agent_id
+                listing_id, content_type, agent_id, additional_context={"listing": listing}
             )
             
             # Request approval from user proxy
@@ -216,6 +369,69 @@ class AgentOrchestrator:
             logger.error("Failed to generate content", error=str(e))
             raise
             
+    async def stream_content(
+        self,
+        listing_id: str,
+        content_type: str,
+        agent_id: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream content generation events for a listing"""
+        logger.info("Streaming content", 
+                   listing_id=listing_id, 
+                   content_type=content_type)
+        
+        try:
+            listing = await self.agents["content"].load_listing(listing_id)
+        except Exception as e:
+            logger.error("Failed to load listing for streaming", listing_id=listing_id, error=str(e))
+            yield {"event": "error", "data": {"detail": str(e)}}
+            return
+            
+        async def request_approval(result: Dict[str, Any]):
+            await self.agents["user_proxy"].request_content_approval(
+                result["content_piece_id"], agent_id
+            )
+            
+        async for event in self.agents["content"].stream_content(
+            listing_id, content_type, agent_id,
+            additional_context={"listing": listing},
+            on_complete=request_approval
+        ):
+            yield event
+            
+    async def generate_content_variants(
+        self,
+        listing_id: str,
+        content_types: List[str],
+        agent_id: str,
+        platforms: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Generate several content types / platform posts for a listing in one pass"""
+        try:
+            logger.info("Generating content variants", 
+                       listing_id=listing_id, 
+                       content_types=content_types,
+                       platforms=platforms)
+            
+            listing = await self.agents["content"].load_listing(listing_id)
+            
+            result = await self.agents["content"].generate_content_variants(
+                listing_id, content_types, agent_id, platforms,
+                additional_context={"listing": listing}
+            )
+            
+            # Request approval for each generated piece
+            for piece in result["pieces"]:
+                await self.agents["user_proxy"].request_content_approval(
+                    piece["content_piece_id"], agent_id
+                )
+                
+            return result
+            
+        except Exception as e:
+            logger.error("Failed to generate content variants", error=str(e))
+            raise
+            
     async def get_agent_status(self) -> Dict[str, Any]:
         """Get status of all agents"""
         try:
@@ -228,6 +444,10 @@ class AgentOrchestrator:
             for agent_name, agent in self.agents.items():
                 status["agents"][agent_name] = await agent.get_status()
                 
+            if self.engagement_consumer:
+                status["engagement_stream"] = self.engagement_consumer.stats()
+            status["status_counters"] = get_status_counters().stats()
+                
             return status
             
         except Exception as e:
@@ -260,16 +480,58 @@ class AgentOrchestrator:
             logger.error("Failed to schedule content posting", error=str(e))
             raise
             
-    async def get_pending_approvals(self, agent_id: str) -> Dict[str, Any]:
-        """Get pending content approvals for an agent"""
+    async def get_pending_approvals(
+        self,
+        agent_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        include_content: bool = False
+    ) -> Dict[str, Any]:
+        """Get a page of pending content approvals for an agent"""
         try:
-            result = await self.agents["user_proxy"].get_pending_approvals(agent_id)
+            result = await self.agents["user_proxy"].get_pending_approvals(
+                agent_id, limit, cursor, include_content
+            )
             return result
             
         except Exception as e:
             logger.error("Failed to get pending approvals", error=str(e))
             raise
             
+    async def get_status_counters(self, agent_id: str) -> Dict[str, Any]:
+        """Get dashboard badge counts for an agent"""
+        try:
+            counts = await get_status_counters().get(agent_id)
+            return {"agent_id": agent_id, **counts}
+            
+        except Exception as e:
+            logger.error("Failed to get status counters", error=str(e))
+            raise
+            
+    async def get_approval_detail(self, agent_id: str, content_piece_id: str) -> Dict[str, Any]:
+        """Get one pending content piece with its generated text"""
+        try:
+            result = await self.agents["user_proxy"].get_approval_detail(agent_id, content_piece_id)
+            return result
+            
+        except Exception as e:
+            logger.error("Failed to get approval detail", error=str(e))
+            raise
+            
+    async def update_notification_preferences(
+        self,
+        agent_id: str,
+        preferences: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Update an agent's notification channel preferences"""
+        try:
+            result = await self.agents["notification"].update_notification_preferences(agent_id, preferences)
+            return result
+            
+        except Exception as e:
+            logger.error("Failed to update notification preferences", error=str(e))
+            raise
+            
     async def create_notification(
         self,
         agent_id: str,
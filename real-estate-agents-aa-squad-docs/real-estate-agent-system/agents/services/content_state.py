@@ -0,0 +1,128 @@
+"""
+Content State - Central transition engine for content piece status with
+optimistic concurrency (version column) instead of row locks
+"""
+
+import asyncio
+import random
+from typing import Dict, Any, Optional, Iterable
+from sqlalchemy import text
+import structlog
+
+logger = structlog.get_logger()
+
+DRAFT = "draft"
+PENDING_APPROVAL = "pending_approval_agent"
+PENDING_MARKETING_APPROVAL = "pending_external_marketing_approval"
+APPROVED = "approved_for_posting"
+REJECTED = "rejected"
+PENDING_REVISION = "pending_ai_revision"
+POSTED = "posted_successfully"
+POSTING_FAILED = "posting_failed"
+
+# Allowed moves from each status. A piece posted to several accounts can
+# succeed on one and fail on another, so posted/failed may alternate.
+TRANSITIONS = {
+    DRAFT: {PENDING_APPROVAL, PENDING_REVISION},
+    PENDING_APPROVAL: {APPROVED, REJECTED, PENDING_MARKETING_APPROVAL, PENDING_REVISION},
+    PENDING_MARKETING_APPROVAL: {APPROVED, REJECTED},
+    REJECTED: {PENDING_REVISION, PENDING_APPROVAL, DRAFT},
+    PENDING_REVISION: {DRAFT, PENDING_APPROVAL},
+    APPROVED: {POSTED, POSTING_FAILED, PENDING_APPROVAL},
+    POSTING_FAILED: {APPROVED, POSTED, PENDING_APPROVAL},
+    POSTED: {POSTING_FAILED}
+}
+
+# Statuses in which an approve/reject decision can be made
+AWAITING_APPROVAL = (PENDING_APPROVAL, PENDING_MARKETING_APPROVAL)
+
+# Columns a transition may set along with the status
+UPDATABLE_COLUMNS = ("feedback", "last_approved_at")
+
+class InvalidTransition(ValueError):
+    """The requested status change is not allowed from the current status"""
+
+class TransitionConflict(RuntimeError):
+    """The row kept changing underneath us and retries were exhausted"""
+
+class Transition:
+    """Outcome of a status change"""
+    
+    def __init__(self, content_piece_id: str, previous_status: str, status: str, version: int, row: Any):
+        self.content_piece_id = content_piece_id
+        self.previous_status = previous_status
+        self.status = status
+        self.version = version
+        self.agent_id = row.agent_id
+        self.content_type = row.content_type
+        
+    @property
+    def changed(self) -> bool:
+        return self.previous_status != self.status
+
+def sources_for(status: str) -> set:
+    """Statuses from which `status` can be reached"""
+    return {source for source, targets in TRANSITIONS.items() if status in targets}
+
+def check_transition(current: str, target: str):
+    if target not in TRANSITIONS.get(current, set()):
+        raise InvalidTransition(f"Cannot move content from {current} to {target}")
+
+async def transition(
+    session,
+    content_piece_id: str,
+    target: str,
+    updates: Optional[Dict[str, Any]] = None,
+    allowed_from: Optional[Iterable[str]] = None,
+    max_attempts: int = 5
+) -> Transition:
+    """Move a content piece to `target` with a compare-and-set on (status, version).
+    
+    Runs in the caller's session so the change commits together with its
+    approval log and notification rows. `allowed_from` narrows the statuses
+    the move may start from. Moving to the current status is a no-op. On a
+    concurrent change the row is re-read and the transition is re-validated
+    against the new status, so a stale writer can never overwrite a newer
+    state.
+    """
+    updates = {column: value for column, value in (updates or {}).items() if column in UPDATABLE_COLUMNS}
+    assignments = "".join(f", {column} = :{column}" for column in updates)
+    
+    for attempt in range(max_attempts):
+        result = await session.execute(
+            text("""
+                SELECT status, version, agent_id, content_type
+                FROM public.rltr_mktg_content_pieces
+                WHERE id = CAST(:id AS uuid)
+            """),
+            {"id": content_piece_id}
+        )
+        row = result.one_or_none()
+        
+        if not row:
+            raise ValueError(f"Content piece not found: {content_piece_id}")
+        if allowed_from is not None and row.status not in allowed_from:
+            raise InvalidTransition(f"Cannot move content from {row.status} to {target}")
+        if row.status == target and not updates:
+            return Transition(content_piece_id, row.status, row.status, row.version, row)
+        if row.status != target:
+            check_transition(row.status, target)
+            
+        result = await session.execute(
+            text(f"""
+                UPDATE public.rltr_mktg_content_pieces
+                SET status = :target, version = version + 1, updated_at = now(){assignments}
+                WHERE id = CAST(:id AS uuid) AND status = :status AND version = :version
+                RETURNING version
+            """),
+            {"id": content_piece_id, "target": target, "status": row.status, "version": row.version, **updates}
+        )
+        version = result.scalar_one_or_none()
+        if version is not None:
+            return Transition(content_piece_id, row.status, target, version, row)
+            
+        logger.info("Content status conflict, retrying",
+                   content_piece_id=content_piece_id, target=target, attempt=attempt + 1)
+        await asyncio.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+        
+    raise TransitionConflict(f"Content {content_piece_id} changed concurrently {max_attempts} times")
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+Email Transport - Pool of persistent, authenticated SMTP connections with
+rate limiting and bounce handling
+"""
+
+import asyncio
+import time
+from email.message import EmailMessage
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+import aiosmtplib
+from services.rate_limiter import TokenBucket
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+# (recipient, SMTP code, server message)
+BounceHook = Callable[[str, int, str], Awaitable[None]]
+
+# Replies that mean "slow down / try later" rather than "never"
+THROTTLE_CODES = (421, 450, 451, 452)
+
+class _PooledConnection:
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+class SMTPTransport:
+    """Sends email over a bounded pool of reusable SMTP connections.
+    
+    Connections are opened and authenticated once, reused for up to
+    `max_messages_per_connection` messages, and closed after
+    `max_idle_seconds` unused. Sends are paced by a token bucket, and
+    throttling replies (421/45x) pause all sending, whether or not a rate
+    is configured, before the error is raised for the caller to retry.
+    Permanent (5xx) refusals of individual recipients are reported to
+    `on_bounce` instead of raising, since retrying cannot help; any other
+    server error is raised.
+    """
+    
+    def __init__(
+        self,
+        hostname: str,
+        port: int = 587,
+        sender: str = "",
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        start_tls: Optional[bool] = None,
+        pool_size: int = 10,
+        max_messages_per_connection: int = 100,
+        max_idle_seconds: float = 60.0,
+        rate_per_second: float = 0.0,
+        throttle_seconds: float = 30.0,
+        timeout: float = 30.0,
+        on_bounce: Optional[BounceHook] = None
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.pool_size = pool_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.max_idle_seconds = max_idle_seconds
+        self.throttle_seconds = throttle_seconds
+        self.timeout = timeout
+        self.on_bounce = on_bounce
+        self._bucket = TokenBucket(rate_per_second, max(rate_per_second, 1.0))
+        self._paused_until = 0.0
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle: List[_PooledConnection] = []
+        self._closed = False
+        self._stats = {
+            "sent": 0, "bounced": 0, "throttled": 0, "reconnects": 0,
+            "connections_opened": 0, "connections_closed": 0
+        }
+        
+    @classmethod
+    def from_settings(cls, on_bounce: Optional[BounceHook] = None) -> "SMTPTransport":
+        return cls(
+            settings.smtp_host,
+            port=settings.smtp_port,
+            sender=settings.smtp_sender,
+            username=settings.smtp_username or None,
+            password=settings.smtp_password or None,
+            use_tls=settings.smtp_use_tls,
+            start_tls=None if settings.smtp_start_tls == "auto" else settings.smtp_start_tls == "true",
+            pool_size=settings.smtp_pool_size,
+            max_messages_per_connection=settings.smtp_max_messages_per_connection,
+            max_idle_seconds=settings.smtp_max_idle_seconds,
+            rate_per_second=settings.smtp_rate_per_second,
+            timeout=settings.smtp_timeout_seconds,
+            on_bounce=on_bounce
+        )
+        
+    async def send(self, message: EmailMessage) -> str:
+        """Send one message; returns "sent" or "bounced", raises on transient failure"""
+        if message["From"] is None:
+            message["From"] = self.sender
+            
+        await self._wait_for_rate()
+        async with self._slots:
+            for attempt in range(2):
+                pooled = await self._checkout()
+                try:
+                    errors, _ = await pooled.client.send_message(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # The server may have dropped an idle connection; retry once on a new one
+                    await self._discard(pooled)
+                    if attempt:
+                        raise
+                    self._stats["reconnects"] += 1
+                    continue
+                except aiosmtplib.SMTPRecipientsRefused as e:
+                    await self._recover(pooled)
+                    # Only give up on the message if every refusal is permanent
+                    if all(refusal.code >= 500 for refusal in e.recipients):
+                        return await self._bounced([(r.recipient, r.code, r.message) for r in e.recipients])
+                    if any(refusal.code in THROTTLE_CODES for refusal in e.recipients):
+                        self.throttle()
+                    raise
+                except aiosmtplib.SMTPResponseException as e:
+                    # Sender refusals, 552/554 and the like say nothing about
+                    # the recipients, so they are never treated as bounces
+                    await self._recover(pooled)
+                    if e.code in THROTTLE_CODES:
+                        self.throttle()
+                    raise
+                except Exception:
+                    await self._discard(pooled)
+                    raise
+                    
+                pooled.sent += 1
+                await self._checkin(pooled)
+                
+                # Some recipients accepted, some refused
+                permanent = [(recipient, response.code, response.message)
+                             for recipient, response in errors.items() if response.code >= 500]
+                if permanent:
+                    await self._bounced(permanent)
+                self._stats["sent"] += 1
+                return "sent"
+                
+    def throttle(self, seconds: Optional[float] = None):
+        """Pause sending, e.g. after the provider signals a rate limit"""
+        self._stats["throttled"] += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + (seconds or self.throttle_seconds))
+        
+    async def _wait_for_rate(self):
+        while True:
+            now = time.monotonic()
+            # The pause applies even when the bucket is unlimited (rate 0)
+            wait = max(self._paused_until - now, self._bucket.wait_time(1, now))
+            if wait <= 0:
+                self._bucket.take(1, now)
+                return
+            await asyncio.sleep(wait)
+            
+    async def _bounced(self, refusals: List[Tuple[str, int, str]]) -> str:
+        """Report permanently refused recipients to the bounce hook"""
+        for recipient, code, reason in refusals:
+            self._stats["bounced"] += 1
+            logger.warning("Email bounced", recipient=recipient, code=code, reason=reason)
+            if self.on_bounce is not None:
+                try:
+                    await self.on_bounce(recipient, code, reason)
+                except Exception as e:
+                    logger.error("Bounce handler failed", error=str(e), recipient=recipient)
+        return "bounced"
+        
+    async def _checkout(self) -> _PooledConnection:
+        # Most recently used first, so surplus connections go idle and expire
+        while self._idle:
+            pooled = self._idle.pop()
+            if pooled.client.is_connected and time.monotonic() - pooled.last_used < self.max_idle_seconds:
+                return pooled
+            await self._discard(pooled)
+            
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+        await client.connect()
+        self._stats["connections_opened"] += 1
+        return _PooledConnection(client)
+        
+    async def _checkin(self, pooled: _PooledConnection):
+        if self._closed or pooled.sent >= self.max_messages_per_connection:
+            await self._discard(pooled)
+        else:
+            pooled.last_used = time.monotonic()
+            self._idle.append(pooled)
+            
+    async def _recover(self, pooled: _PooledConnection):
+        """Reset a connection after a refused transaction, keeping it if the server agrees"""
+        try:
+            await pooled.client.rset()
+            await self._checkin(pooled)
+        except Exception:
+            await self._discard(pooled)
+            
+    async def _discard(self, pooled: _PooledConnection):
+        self._stats["connections_closed"] += 1
+        try:
+            if pooled.client.is_connected:
+                await pooled.client.quit()
+        except Exception:
+            pooled.client.close()
+            
+    def stats(self) -> Dict[str, Any]:
+        return {"pool_size": self.pool_size, "idle_connections": len(self._idle), **self._stats}
+        
+    async def close(self):
+        self._closed = True
+        while self._idle:
+            await self._discard(self._idle.pop())
\ No newline at end of file
@@ -0,0 +1,337 @@
+"""
+Embedding Service - Micro-batched local embeddings for listings and content,
+cached by content hash and bulk-inserted into meta.embeddings
+"""
+
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from database.connection import get_session
+from services.semantic_cache import EMBEDDING_DIM, hashing_features
+from config import settings
+import structlog
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional: falls back to the hashing embedder
+    SentenceTransformer = None
+
+logger = structlog.get_logger()
+
+LISTING_KIND = "listing"
+
+class HashingEmbedder:
+    """Deterministic signed feature-hashing embedder (unigrams + bigrams).
+    
+    Vectorized batch form of semantic_cache.hashing_embedding, sharing its
+    features. Used when no local model is installed and in tests.
+    """
+    
+    model_name = "hashing-v1"
+    
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        
+    def encode(self, texts: List[str]) -> np.ndarray:
+        rows, buckets, signs = [], [], []
+        for row, text_value in enumerate(texts):
+            for bucket, sign in hashing_features(text_value, self.dim):
+                rows.append(row)
+                buckets.append(bucket)
+                signs.append(sign)
+                
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(buckets, dtype=np.intp)),
+                  np.asarray(signs, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+class SentenceTransformerEmbedder:
+    """Local CPU sentence-transformers model (384-dim MiniLM by default)"""
+    
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+        if self.dim != EMBEDDING_DIM:
+            raise ValueError(f"{model_name} produces {self.dim}-dim vectors; meta.embeddings expects {EMBEDDING_DIM}")
+            
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ).astype(np.float32)
+
+def content_hash(text_value: str) -> str:
+    """Cache key for a piece of text"""
+    return hashlib.sha256(text_value.encode()).hexdigest()
+
+def to_pgvector(vector) -> str:
+    return "[" + ",".join(f"{v:.6f}" for v in vector) + "]"
+
+def listing_embedding_text(listing: Dict[str, Any]) -> str:
+    """Descriptive text embedded for a listing"""
+    address = listing.get("address")
+    if isinstance(address, dict):
+        address = address.get("full_address") or address.get("street")
+    return "\n".join([
+        f"address: {address or ''}",
+        f"beds: {listing.get('beds')}",
+        f"baths: {listing.get('baths')}",
+        f"sqft: {listing.get('sqft')}",
+        f"features: {', '.join(listing.get('key_features') or [])}",
+        f"description: {listing.get('description') or ''}"
+    ])
+
+class EmbeddingService:
+    """Coalesces concurrent embed() calls into batched model inference.
+    
+    Requests queue until `max_batch_size` texts are waiting or `max_wait_ms`
+    has passed, then the batch is encoded in one vectorized call on a worker
+    thread. Identical texts share one computation and results are kept in an
+    LRU keyed by content hash.
+    """
+    
+    def __init__(
+        self,
+        embedder=None,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 10.0,
+        cache_size: int = 50000,
+        max_concurrent_batches: int = 2
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._pending: List[Tuple[str, str]] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._batches: set = set()
+        self._semaphore = asyncio.Semaphore(max_concurrent_batches)
+        self._stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "batches": 0, "embedded": 0}
+        
+    @classmethod
+    def from_settings(cls) -> "EmbeddingService":
+        """Use the configured local model, or the hashing embedder if it is unavailable"""
+        embedder = None
+        if settings.embedding_model and settings.embedding_model != HashingEmbedder.model_name:
+            if SentenceTransformer is None:
+                logger.warning("sentence-transformers not installed, using hashing embedder",
+                               model=settings.embedding_model)
+            else:
+                embedder = SentenceTransformerEmbedder(settings.embedding_model)
+        return cls(
+            embedder=embedder,
+            max_batch_size=settings.embedding_batch_size,
+            max_wait_ms=settings.embedding_max_wait_ms
+        )
+        
+    @property
+    def model_name(self) -> str:
+        return self.embedder.model_name
+        
+    async def embed(self, text_value: str) -> List[float]:
+        """Embed one text (batched with other concurrent callers)"""
+        return (await self.embed_vector(text_value)).tolist()
+        
+    async def embed_vector(self, text_value: str) -> np.ndarray:
+        """Embed one text, returning the NumPy vector"""
+        self._stats["requests"] += 1
+        key = content_hash(text_value)
+        
+        cached = self._cache_get(key)
+        if cached is not None:
+            self._stats["cache_hits"] += 1
+            return cached
+            
+        future = self._inflight.get(key)
+        if future is not None:
+            self._stats["coalesced"] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._pending.append((key, text_value))
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_timer is None:
+                self._flush_timer = asyncio.get_running_loop().call_later(self.max_wait_ms / 1000, self._flush)
+                
+        # Shielded: one caller giving up must not cancel the shared result
+        return await asyncio.shield(future)
+        
+    async def embed_many(self, texts: List[str], batch_size: int = 512) -> np.ndarray:
+        """Embed a large list directly in big batches (for backfills); rows follow `texts`"""
+        keys = [content_hash(text_value) for text_value in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        
+        for key, text_value in zip(keys, texts):
+            cached = self._cache_get(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                missing[key] = text_value
+                
+        missing_items = list(missing.items())
+        for start in range(0, len(missing_items), batch_size):
+            chunk = missing_items[start:start + batch_size]
+            async with self._semaphore:
+                matrix = await asyncio.to_thread(self.embedder.encode, [text_value for _, text_value in chunk])
+            for (key, _), vector in zip(chunk, matrix):
+                vectors[key] = vector
+                self._cache_put(key, vector)
+            self._stats["batches"] += 1
+            self._stats["embedded"] += len(chunk)
+            
+        if not keys:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+        
+    def _flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return
+            
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        task = asyncio.create_task(self._run_batch(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+        
+        if self._pending:
+            self._flush_timer = asyncio.get_running_loop().call_later(self.max_wait_ms / 1000, self._flush)
+            
+    async def _run_batch(self, batch: List[Tuple[str, str]]):
+        try:
+            async with self._semaphore:
+                matrix = await asyncio.to_thread(self.embedder.encode, [text_value for _, text_value in batch])
+        except Exception as e:
+            logger.error("Embedding batch failed", size=len(batch), error=str(e))
+            for key, _ in batch:
+                future = self._inflight.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+            
+        self._stats["batches"] += 1
+        self._stats["embedded"] += len(batch)
+        for (key, _), vector in zip(batch, matrix):
+            self._cache_put(key, vector)
+            future = self._inflight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(vector)
+                
+    def _cache_get(self, key: str) -> Optional[np.ndarray]:
+        vector = self._cache.get(key)
+        if vector is not None:
+            self._cache.move_to_end(key)
+        return vector
+        
+    def _cache_put(self, key: str, vector: np.ndarray):
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            
+    async def store(
+        self,
+        kind: str,
+        items: List[Tuple[Optional[str], str, Dict[str, Any]]],
+        vectors: Optional[np.ndarray] = None
+    ) -> int:
+        """Bulk-insert (ref_id, content, metadata) rows into meta.embeddings in one statement"""
+        if not items:
+            return 0
+        if vectors is None:
+            vectors = await self.embed_many([content for _, content, _ in items])
+            
+        session = await get_session()
+        async with session:
+            await session.execute(
+                text("""
+                    INSERT INTO meta.embeddings (content, embedding, kind, ref_id, metadata)
+                    SELECT batch.content, CAST(batch.embedding AS vector), :kind, batch.ref_id, CAST(batch.metadata AS jsonb)
+                    FROM unnest(
+                        CAST(:contents AS text[]),
+                        CAST(:embeddings AS text[]),
+                        CAST(:ref_ids AS text[]),
+                        CAST(:metadata AS text[])
+                    ) AS batch(content, embedding, ref_id, metadata)
+                """),
+                {
+                    "kind": kind,
+                    "contents": [content for _, content, _ in items],
+                    "embeddings": [to_pgvector(vector) for vector in vectors],
+                    "ref_ids": [ref_id for ref_id, _, _ in items],
+                    "metadata": [
+                        json.dumps({**metadata, "embedding_model": self.model_name}, default=str)
+                        for _, _, metadata in items
+                    ]
+                }
+            )
+            await session.commit()
+            
+        return len(items)
+        
+    async def backfill_listings(self, page_size: int = 1000) -> Dict[str, Any]:
+        """Embed every listing that has no listing embedding yet"""
+        after = "00000000-0000-0000-0000-000000000000"
+        total = 0
+        
+        while True:
+            session = await get_session()
+            async with session:
+                result = await session.execute(
+                    text("""
+                        SELECT l.id, l.address, l.beds, l.baths, l.sqft, l.description, l.key_features
+                        FROM public.rltr_mktg_listings l
+                        WHERE l.id > CAST(:after AS uuid)
+                          AND NOT EXISTS (
+                              SELECT 1 FROM meta.embeddings e
+                              WHERE e.kind = :kind AND e.ref_id = l.id::text
+                          )
+                        ORDER BY l.id
+                        LIMIT :limit
+                    """),
+                    {"after": after, "kind": LISTING_KIND, "limit": page_size}
+                )
+                rows = [dict(row._mapping) for row in result]
+                
+            if not rows:
+                break
+                
+            items = [(str(row["id"]), listing_embedding_text(row), {"listing_id": str(row["id"])}) for row in rows]
+            total += await self.store(LISTING_KIND, items)
+            after = str(rows[-1]["id"])
+            logger.info("Embedded listing page", embedded=total)
+            
+        return {"embedded": total, "model": self.model_name}
+        
+    def stats(self) -> Dict[str, Any]:
+        """Batching and cache counters"""
+        embedded = self._stats["embedded"]
+        return {
+            **self._stats,
+            "model": self.model_name,
+            "cached_vectors": len(self._cache),
+            "avg_batch_size": round(embedded / self._stats["batches"], 2) if self._stats["batches"] else 0.0
+        }
+
+_shared_service: Optional[EmbeddingService] = None
+
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide embedding service, so every caller shares batches and cache"""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = EmbeddingService.from_settings()
+    return _shared_service
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Engagement Scorer - Cheap feature-based lead scoring for batches of social
+engagement events
+"""
+
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+class EngagementScorer:
+    """Cheap feature-based lead scoring for batches of engagement events.
+    
+    Features are extracted per event, then weighted and squashed for the
+    whole batch in one NumPy pass; only the best-scoring events are worth
+    an agent's (or an LLM's) attention.
+    """
+    
+    TYPE_WEIGHTS = {"like": 0.2, "view": 0.1, "click": 0.6, "save": 1.0, "share": 1.2, "comment": 1.5, "message": 2.5}
+    INTENT_KEYWORDS = ("price", "available", "tour", "showing", "visit", "schedule", "interested", "dm", "contact", "offer")
+    FEATURES = ("type", "history_events", "recency", "intent", "has_location", "reach")
+    
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        bias: float = -2.0,
+        recency_half_life_hours: float = 24.0
+    ):
+        weights = {"type": 1.0, "history_events": 0.6, "recency": 1.0, "intent": 1.5,
+                   "has_location": 0.3, "reach": -0.1, **(weights or {})}
+        self.weights = np.array([weights[name] for name in self.FEATURES], dtype=np.float32)
+        self.bias = bias
+        self.recency_half_life_hours = recency_half_life_hours
+        
+    @staticmethod
+    def _history_events(history: Any) -> float:
+        """Number of past interactions; "liked 3 posts" counts as 3"""
+        total = 0
+        for entry in history or []:
+            numbers = [int(token) for token in str(entry).split() if token.isdigit()]
+            total += sum(numbers) if numbers else 1
+        return float(total)
+        
+    @staticmethod
+    def _timestamp(value: Any) -> float:
+        if isinstance(value, datetime):
+            return value.timestamp()
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                pass
+        return np.nan
+        
+    def features(self, events: List[Dict[str, Any]]) -> np.ndarray:
+        """Raw feature matrix, one row per event"""
+        raw = np.zeros((len(events), len(self.FEATURES)), dtype=np.float32)
+        timestamps = np.full(len(events), np.nan)
+        for row, event in enumerate(events):
+            profile = event.get("user_profile") or {}
+            text = str(event.get("text") or event.get("comment") or "").lower()
+            raw[row, 0] = self.TYPE_WEIGHTS.get(str(event.get("type", "")).lower(), 0.3)
+            raw[row, 1] = self._history_events(event.get("history"))
+            raw[row, 3] = 1.0 if "?" in text or any(keyword in text for keyword in self.INTENT_KEYWORDS) else 0.0
+            raw[row, 4] = 1.0 if profile.get("location") else 0.0
+            raw[row, 5] = float(profile.get("followers") or 0)
+            timestamps[row] = self._timestamp(event.get("timestamp"))
+            
+        # Log-scale counts; recency decays with the half-life, unknown = now
+        raw[:, 1] = np.log1p(raw[:, 1])
+        raw[:, 5] = np.log1p(raw[:, 5])
+        age_hours = np.nan_to_num((datetime.now().timestamp() - timestamps) / 3600.0, nan=0.0).clip(min=0.0)
+        raw[:, 2] = np.exp2(-age_hours / self.recency_half_life_hours)
+        return raw
+        
+    def score(self, events: List[Dict[str, Any]]) -> np.ndarray:
+        """Lead probability in [0, 1] for every event"""
+        if not events:
+            return np.zeros(0, dtype=np.float32)
+        return 1.0 / (1.0 + np.exp(-(self.features(events) @ self.weights + self.bias)))
+        
+    def select(
+        self,
+        scores: np.ndarray,
+        fraction: float = 0.05,
+        min_score: float = 0.5,
+        max_count: Optional[int] = None
+    ) -> np.ndarray:
+        """Indices of the top `fraction` of events scoring at least `min_score`, best first"""
+        eligible = np.flatnonzero(scores >= min_score)
+        count = min(len(eligible), max(1, int(np.ceil(len(scores) * fraction))))
+        if max_count is not None:
+            count = min(count, max_count)
+        if count == 0:
+            return eligible[:0]
+        top = eligible[np.argpartition(-scores[eligible], count - 1)[:count]] if count < len(eligible) else eligible
+        return top[np.argsort(-scores[top])]
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""
+Engagement Stream - Consumes social engagement events buffered in a Redis
+stream by the gateway, in deduplicated micro-batches per agent and listing
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+# handler(agent_id, listing_id, events)
+BatchHandler = Callable[[str, Optional[str], List[Dict[str, Any]]], Awaitable[Any]]
+
+class EngagementStreamConsumer:
+    """Reads the engagement stream through a consumer group.
+    
+    A read returns as soon as `batch_size` events are available, or after at
+    most `max_wait_ms` once the first event arrives. Events already handled
+    (same event id within `dedupe_ttl_seconds`) are dropped, and the rest are
+    handed to the handler once per (agent, listing) group. Entries are only
+    acknowledged and deleted after their group's handler succeeds; failed
+    entries stay pending, are retried once idle for `reclaim_idle_ms` and go
+    to the "<stream>:dead" stream after `max_deliveries` attempts.
+    """
+    
+    def __init__(
+        self,
+        handler: BatchHandler,
+        redis_url: str,
+        stream: str,
+        group: str,
+        consumer: Optional[str] = None,
+        batch_size: int = 500,
+        max_wait_ms: int = 1000,
+        dedupe_ttl_seconds: int = 86400,
+        max_deliveries: int = 5,
+        reclaim_idle_ms: int = 60000,
+        max_concurrent_groups: int = 8
+    ):
+        self.handler = handler
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self.dedupe_ttl_seconds = dedupe_ttl_seconds
+        self.max_deliveries = max_deliveries
+        self.reclaim_idle_ms = reclaim_idle_ms
+        self._redis = redis.from_url(redis_url, decode_responses=True)
+        self._semaphore = asyncio.Semaphore(max_concurrent_groups)
+        self._stats = {
+            "batches": 0, "events": 0, "duplicates": 0, "groups": 0,
+            "failed_groups": 0, "reclaimed": 0, "dead_lettered": 0
+        }
+        
+    @classmethod
+    def from_settings(cls, handler: BatchHandler) -> "EngagementStreamConsumer":
+        return cls(
+            handler,
+            redis_url=settings.redis_url,
+            stream=settings.engagement_stream,
+            group=settings.engagement_consumer_group,
+            batch_size=settings.engagement_batch_size,
+            max_wait_ms=settings.engagement_batch_wait_ms,
+            dedupe_ttl_seconds=settings.engagement_dedupe_ttl_seconds,
+            max_deliveries=settings.engagement_max_deliveries
+        )
+        
+    def _seen_key(self, event_id: str) -> str:
+        return f"{self.stream}:seen:{event_id}"
+        
+    async def run(self):
+        """Consume the stream until cancelled"""
+        last_reclaim = 0.0
+        while True:
+            try:
+                if not last_reclaim:
+                    await self._ensure_group()
+                if time.monotonic() - last_reclaim >= self.reclaim_idle_ms / 1000:
+                    await self._reclaim()
+                    last_reclaim = time.monotonic()
+                    
+                entries = await self._read_batch()
+                if entries:
+                    await self.process(entries)
+                    
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Error consuming engagement stream", error=str(e))
+                await asyncio.sleep(5)
+                
+    async def _ensure_group(self):
+        try:
+            await self._redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+                
+    async def _read_batch(self) -> List[Tuple[str, Dict[str, str]]]:
+        """Block for the first events, then keep filling the batch until it
+        is full or the wait budget is spent"""
+        response = await self._redis.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=self.batch_size, block=self.max_wait_ms
+        )
+        entries = list(response[0][1]) if response else []
+        
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while entries and len(entries) < self.batch_size:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms < 1:
+                break
+            response = await self._redis.xreadgroup(
+                self.group, self.consumer, {self.stream: ">"},
+                count=self.batch_size - len(entries), block=remaining_ms
+            )
+            if not response:
+                break
+            entries.extend(response[0][1])
+        return entries
+        
+    async def process(self, entries: List[Tuple[str, Dict[str, str]]]):
+        """Deduplicate, group and hand off one micro-batch of stream entries"""
+        self._stats["batches"] += 1
+        self._stats["events"] += len(entries)
+        
+        # Repeats within the batch, e.g. a webhook delivered twice
+        unique: Dict[str, Tuple[str, Dict[str, str]]] = {}
+        skipped = []
+        for entry_id, fields in entries:
+            if not fields:
+                # Entry was deleted while pending
+                skipped.append(entry_id)
+                continue
+            event_id = fields.get("event_id") or entry_id
+            if event_id in unique:
+                skipped.append(entry_id)
+            else:
+                unique[event_id] = (entry_id, fields)
+                
+        # Repeats of events handled in an earlier batch
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for event_id in unique:
+                pipe.exists(self._seen_key(event_id))
+            seen = await pipe.execute()
+            
+        groups: Dict[Tuple[str, Optional[str]], List[Tuple[str, str, Dict[str, Any]]]] = {}
+        for (event_id, (entry_id, fields)), already_seen in zip(unique.items(), seen):
+            if already_seen:
+                skipped.append(entry_id)
+                continue
+            try:
+                event = json.loads(fields["event"])
+            except (KeyError, ValueError):
+                logger.warning("Dropping malformed engagement event", entry_id=entry_id)
+                skipped.append(entry_id)
+                continue
+            event["event_id"] = event_id
+            key = (fields.get("agent_id", ""), fields.get("listing_id") or None)
+            groups.setdefault(key, []).append((entry_id, event_id, event))
+            
+        self._stats["duplicates"] += len(skipped)
+        await self._acknowledge(skipped)
+        await asyncio.gather(*(
+            self._handle_group(agent_id, listing_id, items)
+            for (agent_id, listing_id), items in groups.items()
+        ))
+        
+    async def _handle_group(
+        self,
+        agent_id: str,
+        listing_id: Optional[str],
+        items: List[Tuple[str, str, Dict[str, Any]]]
+    ):
+        async with self._semaphore:
+            try:
+                await self.handler(agent_id, listing_id, [event for _, _, event in items])
+            except Exception as e:
+                # Left pending, so the entries are retried after reclaim_idle_ms
+                self._stats["failed_groups"] += 1
+                logger.error("Failed to handle engagement batch",
+                           agent_id=agent_id, listing_id=listing_id, events=len(items), error=str(e))
+                return
+                
+        self._stats["groups"] += 1
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for _, event_id, _ in items:
+                pipe.set(self._seen_key(event_id), 1, ex=self.dedupe_ttl_seconds)
+            await pipe.execute()
+        await self._acknowledge([entry_id for entry_id, _, _ in items])
+        
+    async def _acknowledge(self, entry_ids: List[str]):
+        """Ack and delete processed entries so the stream only holds the backlog"""
+        if not entry_ids:
+            return
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.xack(self.stream, self.group, *entry_ids)
+            pipe.xdel(self.stream, *entry_ids)
+            await pipe.execute()
+            
+    async def _reclaim(self):
+        """Retry entries left pending by failed handlers or crashed consumers"""
+        pending = await self._redis.xpending_range(
+            self.stream, self.group, min="-", max="+", count=self.batch_size, idle=self.reclaim_idle_ms
+        )
+        if not pending:
+            return
+            
+        exhausted = [entry["message_id"] for entry in pending if entry["times_delivered"] >= self.max_deliveries]
+        retry = [entry["message_id"] for entry in pending if entry["times_delivered"] < self.max_deliveries]
+        
+        if exhausted:
+            claimed = await self._redis.xclaim(self.stream, self.group, self.consumer, self.reclaim_idle_ms, exhausted)
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for entry_id, fields in claimed:
+                    if fields:
+                        pipe.xadd(f"{self.stream}:dead", fields)
+                await pipe.execute()
+            await self._acknowledge([entry_id for entry_id, _ in claimed])
+            self._stats["dead_lettered"] += len(claimed)
+            logger.warning("Moved engagement events to dead-letter stream", count=len(claimed))
+            
+        if retry:
+            claimed = await self._redis.xclaim(self.stream, self.group, self.consumer, self.reclaim_idle_ms, retry)
+            self._stats["reclaimed"] += len(claimed)
+            if claimed:
+                await self.process(claimed)
+                
+    def stats(self) -> Dict[str, Any]:
+        """Consumption counters"""
+        return {"stream": self.stream, "consumer": self.consumer, **self._stats}
+        
+    async def close(self):
+        await self._redis.aclose()
\ No newline at end of file
@@ -0,0 +1,282 @@
+"""
+Generation Cache - Tiered (in-process LRU + Redis) cache for LLM generations
+"""
+
+import asyncio
+import hashlib
+import json
+import numbers
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+import redis.asyncio as redis
+import structlog
+
+logger = structlog.get_logger()
+
+# Listing fields that influence generated content. Bookkeeping fields such as
+# scraped_at/updated_at are left out so a re-scrape of an unchanged listing
+# keeps hitting the cache.
+FINGERPRINT_FIELDS = (
+    "source_id", "address", "price", "beds", "baths", "sqft",
+    "description", "key_features", "image_urls", "status"
+)
+
+class GenerationCache:
+    """Caches generated content keyed by listing fingerprint, content type,
+    prompt template version and model parameters"""
+    
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: int = 86400,
+        redis_url: Optional[str] = None,
+        namespace: str = "gencache"
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._listing_keys: Dict[str, set] = {}
+        self._key_listing: Dict[str, str] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._redis = redis.from_url(redis_url, decode_responses=True) if redis_url else None
+        self._stats = {
+            "memory_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "redis_errors": 0
+        }
+        
+    @staticmethod
+    def listing_fingerprint(listing: Dict[str, Any]) -> str:
+        """Stable hash of the listing fields that affect generated content.
+        
+        Numbers are compared as floats so a scraped 500000 and a database
+        Decimal('500000') fingerprint the same.
+        """
+        relevant = {}
+        for field in FINGERPRINT_FIELDS:
+            if field in listing:
+                value = listing[field]
+                if isinstance(value, numbers.Number) and not isinstance(value, bool):
+                    value = float(value)
+                relevant[field] = value
+                
+        if not relevant:
+            relevant = {"id": listing.get("id")}
+        payload = json.dumps(relevant, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+        
+    def make_key(
+        self,
+        listing_fingerprint: str,
+        content_type: str,
+        template_version: str,
+        model_params: Dict[str, Any],
+        context: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Build a cache key for a single generation request"""
+        payload = json.dumps(
+            {
+                "listing": listing_fingerprint,
+                "content_type": content_type,
+                "template_version": template_version,
+                "model_params": model_params,
+                "context": context or {}
+            },
+            sort_keys=True,
+            default=str
+        )
+        return f"{self.namespace}:{hashlib.sha256(payload.encode()).hexdigest()}"
+        
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a generation, checking the in-process tier before Redis"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            self._forget_listing_key(key)
+            
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(key)
+            except Exception as e:
+                self._stats["redis_errors"] += 1
+                logger.warning("Generation cache Redis lookup failed", error=str(e))
+                raw = None
+                
+            if raw is not None:
+                value = json.loads(raw)
+                self._store_memory(key, value, self.ttl_seconds)
+                self._stats["redis_hits"] += 1
+                return value
+                
+        self._stats["misses"] += 1
+        return None
+        
+    async def set(
+        self,
+        key: str,
+        value: Dict[str, Any],
+        listing_id: Optional[str] = None,
+        ttl_seconds: Optional[int] = None
+    ):
+        """Store a generation in both tiers"""
+        ttl = ttl_seconds or self.ttl_seconds
+        self._store_memory(key, value, ttl)
+        
+        if listing_id:
+            self._listing_keys.setdefault(str(listing_id), set()).add(key)
+            self._key_listing[key] = str(listing_id)
+            
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.set(key, json.dumps(value, default=str), ex=ttl)
+                if listing_id:
+                    listing_set = self._listing_set_key(listing_id)
+                    pipe.sadd(listing_set, key)
+                    pipe.expire(listing_set, ttl)
+                await pipe.execute()
+            except Exception as e:
+                self._stats["redis_errors"] += 1
+                logger.warning("Generation cache Redis write failed", error=str(e))
+                
+    async def get_or_generate(
+        self,
+        key: str,
+        generate: Callable[[], Awaitable[Dict[str, Any]]],
+        listing_id: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Return a cached generation or run `generate` once and cache it.
+        
+        Concurrent callers for the same key (e.g. retries racing the original
+        request) share a single in-flight generation.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            return cached, True
+            
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(inflight), True
+            
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await generate()
+            await self.set(key, value, listing_id=listing_id)
+            future.set_result(value)
+            return value, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited is not logged
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            
+    async def refresh_listing(self, listing: Dict[str, Any]) -> int:
+        """Record a (re)scraped listing's fingerprint; drops its entries only if it changed.
+        
+        Entries are keyed by fingerprint, so a changed listing is never served
+        stale content; this only frees the superseded entries early. The last
+        seen fingerprint is kept in Redis next to the entries so a restarted
+        process or another replica still notices the change.
+        """
+        listing_id = str(listing.get("id"))
+        fingerprint = self.listing_fingerprint(listing)
+        previous = None
+        
+        if self._redis is not None:
+            try:
+                previous = await self._redis.set(
+                    self._fingerprint_key(listing_id), fingerprint, ex=self.ttl_seconds, get=True
+                )
+            except Exception as e:
+                self._stats["redis_errors"] += 1
+                logger.warning("Generation cache Redis fingerprint update failed",
+                               listing_id=listing_id, error=str(e))
+                               
+        local_previous = self._fingerprints.get(listing_id)
+        self._fingerprints[listing_id] = fingerprint
+        previous = previous or local_previous
+        
+        if previous is None or previous == fingerprint:
+            return 0
+        return await self.invalidate_listing(listing_id)
+        
+    async def invalidate_listing(self, listing_id: str) -> int:
+        """Drop every cached generation for a listing, returns entries removed"""
+        listing_id = str(listing_id)
+        keys = self._listing_keys.pop(listing_id, set())
+        for key in keys:
+            self._memory.pop(key, None)
+            self._key_listing.pop(key, None)
+            
+        if self._redis is not None:
+            try:
+                listing_set = self._listing_set_key(listing_id)
+                redis_keys = await self._redis.smembers(listing_set)
+                if redis_keys:
+                    await self._redis.delete(*redis_keys)
+                await self._redis.delete(listing_set)
+                keys |= set(redis_keys)
+            except Exception as e:
+                self._stats["redis_errors"] += 1
+                logger.warning("Generation cache Redis invalidation failed",
+                               listing_id=listing_id, error=str(e))
+                               
+        self._stats["invalidations"] += len(keys)
+        return len(keys)
+        
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        lookups = self._stats["memory_hits"] + self._stats["redis_hits"] + self._stats["misses"]
+        hits = self._stats["memory_hits"] + self._stats["redis_hits"]
+        return {
+            **self._stats,
+            "memory_entries": len(self._memory),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+        
+    async def close(self):
+        """Close the Redis connection pool"""
+        if self._redis is not None:
+            await self._redis.aclose()
+            
+    def _store_memory(self, key: str, value: Dict[str, Any], ttl_seconds: int):
+        self._memory[key] = (time.monotonic() + ttl_seconds, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            evicted, _ = self._memory.popitem(last=False)
+            self._forget_listing_key(evicted)
+            self._stats["evictions"] += 1
+            
+    def _forget_listing_key(self, key: str):
+        listing_id = self._key_listing.pop(key, None)
+        if listing_id is not None:
+            keys = self._listing_keys.get(listing_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._listing_keys[listing_id]
+                    
+    def _listing_set_key(self, listing_id: str) -> str:
+        return f"{self.namespace}:listing:{listing_id}"
+        
+    def _fingerprint_key(self, listing_id: str) -> str:
+        return f"{self.namespace}:fingerprint:{listing_id}"
\ No newline at end of file
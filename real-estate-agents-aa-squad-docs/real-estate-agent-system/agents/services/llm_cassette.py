@@ -0,0 +1,190 @@
+"""
+LLM Cassette - Record real LLM responses and replay them offline with
+synthetic latency, for benchmarking and regression tests
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from typing import Dict, Any, List, Optional, AsyncIterator
+from services.llm_router import LLMProvider
+import structlog
+
+logger = structlog.get_logger()
+
+def request_key(messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+    """Identity of a request, independent of which route served it"""
+    payload = json.dumps(
+        {"messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class CassetteMiss(LookupError):
+    """Replay was asked for a request that was never recorded"""
+
+class Cassette:
+    """Append-only JSONL file of recorded interactions"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions: Dict[str, List[Dict[str, Any]]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self.interactions.setdefault(interaction["key"], []).append(interaction)
+                        
+    def __len__(self) -> int:
+        return sum(len(recorded) for recorded in self.interactions.values())
+        
+    def record(self, key: str, messages: List[Dict[str, str]], response: str, latency: float, route_id: str):
+        interaction = {
+            "key": key,
+            "route_id": route_id,
+            "latency": round(latency, 4),
+            "messages": messages,
+            "response": response,
+            "recorded_at": time.time()
+        }
+        self.interactions.setdefault(key, []).append(interaction)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(interaction) + "\n")
+            
+    def latencies(self) -> List[float]:
+        return [interaction["latency"] for recorded in self.interactions.values() for interaction in recorded]
+        
+    def route_ids(self) -> List[str]:
+        """Routes that served recorded interactions, in order of first appearance"""
+        seen: Dict[str, None] = {}
+        for recorded in self.interactions.values():
+            for interaction in recorded:
+                seen.setdefault(interaction["route_id"], None)
+        return list(seen)
+
+class LatencyModel:
+    """Synthetic response latency.
+    
+    Specs: "fixed:<seconds>", "normal:<mean>,<stddev>",
+    "lognormal:<median>,<sigma>" or "recorded" (each interaction's own
+    latency). Always seeded, so a benchmark run is reproducible.
+    """
+    
+    def __init__(self, kind: str = "fixed", params: Optional[List[float]] = None, scale: float = 1.0, seed: int = 0):
+        if kind not in ("fixed", "normal", "lognormal", "recorded"):
+            raise ValueError(f"Unknown latency model: {kind}")
+        self.kind = kind
+        self.params = params or [0.0]
+        self.scale = scale
+        self._random = random.Random(seed)
+        
+    @classmethod
+    def parse(cls, spec: str, scale: float = 1.0, seed: int = 0) -> "LatencyModel":
+        kind, _, raw = spec.partition(":")
+        params = [float(value) for value in raw.split(",") if value.strip()]
+        return cls(kind.strip() or "fixed", params, scale=scale, seed=seed)
+        
+    def sample(self, recorded: Optional[float] = None) -> float:
+        if self.kind == "recorded":
+            seconds = recorded or 0.0
+        elif self.kind == "normal":
+            seconds = self._random.gauss(self.params[0], self.params[1] if len(self.params) > 1 else 0.0)
+        elif self.kind == "lognormal":
+            seconds = self._random.lognormvariate(math.log(max(self.params[0], 1e-6)),
+                                                  self.params[1] if len(self.params) > 1 else 0.0)
+        else:
+            seconds = self.params[0]
+        return max(0.0, seconds * self.scale)
+
+class RecordingProvider(LLMProvider):
+    """Passes requests to a live provider and records every response"""
+    
+    def __init__(self, inner: LLMProvider, cassette: Cassette):
+        super().__init__(inner.name, inner.model)
+        self.inner = inner
+        self.cassette = cassette
+        
+    async def complete(self, messages, temperature, max_tokens) -> str:
+        started = time.monotonic()
+        reply = await self.inner.complete(messages, temperature, max_tokens)
+        self.cassette.record(request_key(messages, temperature, max_tokens), messages, reply,
+                             time.monotonic() - started, self.route_id)
+        return reply
+        
+    async def stream(self, messages, temperature, max_tokens) -> AsyncIterator[str]:
+        started = time.monotonic()
+        chunks = []
+        async for delta in self.inner.stream(messages, temperature, max_tokens):
+            chunks.append(delta)
+            yield delta
+        self.cassette.record(request_key(messages, temperature, max_tokens), messages, "".join(chunks),
+                             time.monotonic() - started, self.route_id)
+                             
+    async def close(self):
+        await self.inner.close()
+
+class ReplayProvider(LLMProvider):
+    """Serves recorded responses with synthetic latency; no network access.
+    
+    Named after a recorded route, it prefers that route's recordings (and so
+    its latency profile) and falls back to any route's recording of the
+    same request. Repeated identical requests cycle through the recordings
+    in order. Unrecorded requests raise CassetteMiss, or return
+    `fallback_reply` when one is given.
+    """
+    
+    def __init__(
+        self,
+        cassette: Cassette,
+        latency: Optional[LatencyModel] = None,
+        name: str = "replay",
+        model: str = "replay",
+        fallback_reply: Optional[str] = None,
+        first_token_fraction: float = 0.3
+    ):
+        super().__init__(name, model)
+        self.cassette = cassette
+        self.latency = latency or LatencyModel("recorded")
+        self.fallback_reply = fallback_reply
+        self.first_token_fraction = first_token_fraction
+        self._positions: Dict[str, int] = {}
+        self.counters = {"hits": 0, "misses": 0}
+        
+    def _lookup(self, messages, temperature, max_tokens) -> Dict[str, Any]:
+        key = request_key(messages, temperature, max_tokens)
+        recorded = self.cassette.interactions.get(key)
+        if not recorded:
+            self.counters["misses"] += 1
+            if self.fallback_reply is None:
+                raise CassetteMiss(f"No recording for request {key[:12]}")
+            return {"response": self.fallback_reply, "latency": None}
+            
+        self.counters["hits"] += 1
+        recorded = [interaction for interaction in recorded if interaction["route_id"] == self.route_id] or recorded
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        return recorded[position % len(recorded)]
+        
+    async def complete(self, messages, temperature, max_tokens) -> str:
+        interaction = self._lookup(messages, temperature, max_tokens)
+        await asyncio.sleep(self.latency.sample(interaction["latency"]))
+        return interaction["response"]
+        
+    async def stream(self, messages, temperature, max_tokens) -> AsyncIterator[str]:
+        interaction = self._lookup(messages, temperature, max_tokens)
+        total = self.latency.sample(interaction["latency"])
+        words = interaction["response"].split(" ")
+        
+        # Time to first token, then the remainder spread evenly over the words
+        await asyncio.sleep(total * self.first_token_fraction)
+        gap = total * (1 - self.first_token_fraction) / max(len(words) - 1, 1)
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(gap)
+            yield word if index == len(words) - 1 else word + " "
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+LLM Client - Thin async wrapper around the OpenAI-compatible chat API
+(direct OpenAI or through the Portkey gateway)
+"""
+
+import json
+from typing import Dict, Any, List, Optional, AsyncIterator
+from openai import AsyncOpenAI
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+class LLMClient:
+    """Chat completion client shared by the agents"""
+    
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4",
+        base_url: Optional[str] = None,
+        default_headers: Optional[Dict[str, str]] = None,
+        timeout: float = 60.0
+    ):
+        self.model = model
+        self._client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            default_headers=default_headers,
+            timeout=timeout
+        ) if api_key else None
+        
+    @classmethod
+    def from_settings(cls, model: str = "gpt-4") -> "LLMClient":
+        """Build a client from environment settings, preferring Portkey when configured"""
+        if settings.portkey_api_key:
+            return cls(
+                api_key=settings.openai_api_key or settings.portkey_api_key,
+                model=model,
+                base_url=settings.portkey_gateway_url,
+                default_headers={
+                    "x-portkey-api-key": settings.portkey_api_key,
+                    "x-portkey-virtual-key": settings.portkey_virtual_key
+                }
+            )
+        return cls(api_key=settings.openai_api_key, model=model)
+        
+    @property
+    def is_configured(self) -> bool:
+        """Whether an API key is available"""
+        return self._client is not None
+        
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 800
+    ) -> str:
+        """Run a chat completion and return the reply text"""
+        if self._client is None:
+            raise RuntimeError("LLM client is not configured")
+            
+        response = await self._client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        
+        usage = response.usage
+        if usage is not None:
+            logger.info("LLM completion",
+                        model=response.model,
+                        prompt_tokens=usage.prompt_tokens,
+                        completion_tokens=usage.completion_tokens)
+                        
+        return response.choices[0].message.content or ""
+        
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 800
+    ) -> AsyncIterator[str]:
+        """Run a streaming chat completion, yielding text deltas as they arrive"""
+        if self._client is None:
+            raise RuntimeError("LLM client is not configured")
+            
+        stream = await self._client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+                
+    async def close(self):
+        """Close the underlying HTTP client"""
+        if self._client is not None:
+            await self._client.close()
+
+def extract_json(reply: str) -> Dict[str, Any]:
+    """Parse the JSON object in a reply, tolerating prose or code fences around it"""
+    start = reply.find("{")
+    end = reply.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("No JSON object in LLM reply")
+    return json.loads(reply[start:end + 1])
\ No newline at end of file
@@ -0,0 +1,413 @@
+"""
+LLM Router - Latency-aware routing across LLM providers with hedged requests
+and failover
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, AsyncIterator, Callable, Tuple
+from anthropic import AsyncAnthropic
+from services.llm_client import LLMClient
+from services.rate_limiter import LLMRateLimiter, get_rate_limiter, estimate_tokens, PRIORITY_NORMAL, PRIORITY_LOW
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+class LLMProvider:
+    """A single (provider, model) route"""
+    
+    def __init__(self, name: str, model: str):
+        self.name = name
+        self.model = model
+        
+    @property
+    def route_id(self) -> str:
+        return f"{self.name}:{self.model}"
+        
+    async def complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        raise NotImplementedError
+        
+    async def stream(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+        
+    async def close(self):
+        pass
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI-compatible chat API (direct or through Portkey)"""
+    
+    def __init__(self, name: str, client: LLMClient):
+        super().__init__(name, client.model)
+        self.client = client
+        
+    async def complete(self, messages, temperature, max_tokens) -> str:
+        return await self.client.complete(messages, temperature=temperature, max_tokens=max_tokens)
+        
+    async def stream(self, messages, temperature, max_tokens) -> AsyncIterator[str]:
+        async for delta in self.client.stream(messages, temperature=temperature, max_tokens=max_tokens):
+            yield delta
+            
+    async def close(self):
+        await self.client.close()
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic messages API"""
+    
+    def __init__(self, api_key: str, model: str, timeout: float = 60.0):
+        super().__init__("anthropic", model)
+        self._client = AsyncAnthropic(api_key=api_key, timeout=timeout)
+        
+    @staticmethod
+    def _split_system(messages: List[Dict[str, str]]) -> Tuple[str, List[Dict[str, str]]]:
+        system = "\n".join(m["content"] for m in messages if m["role"] == "system")
+        return system, [m for m in messages if m["role"] != "system"]
+        
+    async def complete(self, messages, temperature, max_tokens) -> str:
+        system, chat = self._split_system(messages)
+        response = await self._client.messages.create(
+            model=self.model,
+            system=system,
+            messages=chat,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return "".join(block.text for block in response.content if block.type == "text")
+        
+    async def stream(self, messages, temperature, max_tokens) -> AsyncIterator[str]:
+        system, chat = self._split_system(messages)
+        async with self._client.messages.stream(
+            model=self.model,
+            system=system,
+            messages=chat,
+            temperature=temperature,
+            max_tokens=max_tokens
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+                
+    async def close(self):
+        await self._client.close()
+
+def _default_stub_reply(provider: "StubProvider", messages: List[Dict[str, str]]) -> str:
+    return json.dumps({
+        "text": f"[{provider.route_id}] Stub content for: {messages[-1]['content'][:60]}",
+        "hashtags": ["#RealEstate", "#Stub"],
+        "call_to_action": "Contact us today for a showing!"
+    })
+
+class StubProvider(LLMProvider):
+    """Offline provider with configurable latency and failure rate, for tests
+    and local development"""
+    
+    def __init__(
+        self,
+        name: str = "stub",
+        model: str = "stub-model",
+        latency_seconds: float = 0.05,
+        latency_jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        reply: Optional[Callable[["StubProvider", List[Dict[str, str]]], str]] = None,
+        seed: Optional[int] = None
+    ):
+        super().__init__(name, model)
+        self.latency_seconds = latency_seconds
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.reply = reply or _default_stub_reply
+        self.calls = 0
+        self._random = random.Random(seed)
+        
+    async def _simulate(self):
+        self.calls += 1
+        delay = max(0.0, self._random.gauss(self.latency_seconds, self.latency_jitter))
+        await asyncio.sleep(delay)
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError(f"{self.route_id} simulated failure")
+            
+    async def complete(self, messages, temperature, max_tokens) -> str:
+        await self._simulate()
+        return self.reply(self, messages)
+        
+    async def stream(self, messages, temperature, max_tokens) -> AsyncIterator[str]:
+        await self._simulate()
+        for word in self.reply(self, messages).split(" "):
+            yield word + " "
+
+class RouteStats:
+    """Rolling latency and error-rate window for one route"""
+    
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.counters = {"requests": 0, "errors": 0, "wins": 0, "hedges": 0, "failovers": 0}
+        
+    def record(self, latency: Optional[float], ok: bool):
+        self.counters["requests"] += 1
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+        else:
+            self.counters["errors"] += 1
+            
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct * len(ordered)))]
+        
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+class LLMRouter:
+    """Routes chat completions across providers.
+    
+    Healthy routes are ranked by rolling median latency. If the chosen route
+    has not answered within its p95, a hedged duplicate goes to the next
+    route; errors fail over immediately. The first success wins and the
+    remaining requests are cancelled. Every attempt first waits on the
+    shared rate limiter, so hedges and failovers respect provider quotas.
+    """
+    
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        window: int = 200,
+        min_samples: int = 20,
+        default_hedge_delay: float = 8.0,
+        min_hedge_delay: float = 0.05,
+        max_error_rate: float = 0.5,
+        rate_limiter: Optional[LLMRateLimiter] = None
+    ):
+        self.providers = providers
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_error_rate = max_error_rate
+        self.rate_limiter = rate_limiter
+        self._stats = {provider.route_id: RouteStats(window) for provider in providers}
+        
+    @classmethod
+    def from_settings(cls, model: str = "gpt-4") -> "LLMRouter":
+        """Build the routes available in this environment"""
+        providers: List[LLMProvider] = []
+        
+        # Imported here: the cassette providers subclass LLMProvider
+        from services.llm_cassette import Cassette, LatencyModel, RecordingProvider, ReplayProvider
+        
+        if settings.llm_provider_mode == "stub":
+            providers = [
+                StubProvider("stub-primary", latency_seconds=0.2, latency_jitter=0.05),
+                StubProvider("stub-secondary", latency_seconds=0.3, latency_jitter=0.05)
+            ]
+        elif settings.llm_provider_mode == "replay":
+            # One route per recorded provider, so hedging and failover run as they did live
+            cassette = Cassette(settings.llm_cassette_path)
+            providers = [
+                ReplayProvider(
+                    cassette,
+                    LatencyModel.parse(settings.llm_replay_latency, scale=settings.llm_replay_latency_scale, seed=seed),
+                    *route_id.split(":", 1)
+                )
+                for seed, route_id in enumerate(cassette.route_ids() or ["replay:replay"])
+            ]
+        else:
+            if settings.portkey_api_key:
+                providers.append(OpenAIProvider("portkey", LLMClient.from_settings(model=model)))
+            if settings.openai_api_key:
+                providers.append(OpenAIProvider("openai", LLMClient(api_key=settings.openai_api_key, model=model)))
+            if settings.anthropic_api_key:
+                providers.append(AnthropicProvider(settings.anthropic_api_key, settings.anthropic_model))
+                
+            if settings.llm_provider_mode == "record":
+                cassette = Cassette(settings.llm_cassette_path)
+                providers = [RecordingProvider(provider, cassette) for provider in providers]
+                
+        return cls(
+            providers,
+            default_hedge_delay=settings.llm_hedge_default_delay,
+            max_error_rate=settings.llm_max_error_rate,
+            rate_limiter=get_rate_limiter()
+        )
+        
+    @property
+    def is_configured(self) -> bool:
+        """Whether any route is available"""
+        return bool(self.providers)
+        
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 800,
+        priority: int = PRIORITY_NORMAL
+    ) -> str:
+        """Run a chat completion on the best route, hedging and failing over.
+        
+        `model` is a preference: routes serving it are tried first. Hedged
+        duplicates queue behind `priority` on the rate limiter.
+        """
+        candidates = self._rank(model)
+        if not candidates:
+            raise RuntimeError("No LLM providers configured")
+            
+        pending: Dict[asyncio.Task, LLMProvider] = {}
+        launched = 0
+        last_error: Optional[BaseException] = None
+        
+        def launch():
+            nonlocal launched
+            provider = candidates[launched]
+            launched += 1
+            task = asyncio.create_task(self._timed_complete(
+                provider, messages, temperature, max_tokens,
+                priority if launched == 1 else max(priority, PRIORITY_LOW)
+            ))
+            pending[task] = provider
+            
+        launch()
+        try:
+            while pending:
+                newest = candidates[launched - 1]
+                timeout = self._hedge_delay(newest) if launched < len(candidates) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                
+                if not done:
+                    self._stats[newest.route_id].counters["hedges"] += 1
+                    logger.info("Hedging LLM request", slow_route=newest.route_id,
+                                hedge_route=candidates[launched].route_id)
+                    launch()
+                    continue
+                    
+                for task in done:
+                    provider = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        self._stats[provider.route_id].counters["wins"] += 1
+                        return task.result()
+                        
+                    last_error = error
+                    self._throttle_if_rate_limited(provider, error)
+                    logger.warning("LLM route failed", route=provider.route_id, error=str(error))
+                    if launched < len(candidates) and len(pending) == 0:
+                        self._stats[provider.route_id].counters["failovers"] += 1
+                        launch()
+                        
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+                
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 800,
+        priority: int = PRIORITY_NORMAL
+    ) -> AsyncIterator[str]:
+        """Stream from the best route, failing over until the first token arrives"""
+        candidates = self._rank(model)
+        if not candidates:
+            raise RuntimeError("No LLM providers configured")
+            
+        last_error: Optional[BaseException] = None
+        for provider in candidates:
+            stats = self._stats[provider.route_id]
+            await self._acquire(provider, messages, max_tokens, priority)
+            started = time.monotonic()
+            first_token = False
+            try:
+                async for delta in provider.stream(messages, temperature, max_tokens):
+                    if not first_token:
+                        first_token = True
+                        stats.record(time.monotonic() - started, True)
+                        stats.counters["wins"] += 1
+                    yield delta
+                return
+            except Exception as e:
+                if first_token:
+                    raise
+                stats.record(None, False)
+                stats.counters["failovers"] += 1
+                last_error = e
+                self._throttle_if_rate_limited(provider, e)
+                logger.warning("LLM stream route failed", route=provider.route_id, error=str(e))
+                
+        raise last_error
+        
+    def stats(self) -> Dict[str, Any]:
+        """Rolling latency / error metrics per route"""
+        return {
+            route_id: {
+                **route.counters,
+                "error_rate": round(route.error_rate, 4),
+                "p50_seconds": route.percentile(0.5),
+                "p95_seconds": route.percentile(0.95)
+            }
+            for route_id, route in self._stats.items()
+        }
+        
+    async def close(self):
+        """Close every provider"""
+        for provider in self.providers:
+            await provider.close()
+            
+    async def _acquire(self, provider: LLMProvider, messages, max_tokens: int, priority: int):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(provider.route_id, estimate_tokens(messages, max_tokens), priority)
+            
+    def _throttle_if_rate_limited(self, provider: LLMProvider, error: BaseException):
+        if self.rate_limiter is None or getattr(error, "status_code", None) != 429:
+            return
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+        self.rate_limiter.throttle(provider.route_id, retry_after)
+        
+    async def _timed_complete(self, provider: LLMProvider, messages, temperature, max_tokens, priority) -> str:
+        stats = self._stats[provider.route_id]
+        # Queueing on the rate limiter is not provider latency
+        await self._acquire(provider, messages, max_tokens, priority)
+        started = time.monotonic()
+        try:
+            reply = await provider.complete(messages, temperature, max_tokens)
+        except asyncio.CancelledError:
+            # A cancelled hedge loser is neither a success nor an error
+            raise
+        except Exception:
+            stats.record(None, False)
+            raise
+        stats.record(time.monotonic() - started, True)
+        return reply
+        
+    def _hedge_delay(self, provider: LLMProvider) -> float:
+        stats = self._stats[provider.route_id]
+        if len(stats.latencies) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, stats.percentile(0.95))
+        
+    def _rank(self, model: Optional[str]) -> List[LLMProvider]:
+        def key(indexed):
+            index, provider = indexed
+            stats = self._stats[provider.route_id]
+            unhealthy = len(stats.outcomes) >= self.min_samples and stats.error_rate > self.max_error_rate
+            median = stats.percentile(0.5) if len(stats.latencies) >= self.min_samples else None
+            return (
+                unhealthy,
+                model is not None and provider.model != model,
+                median if median is not None else self.default_hedge_delay,
+                index
+            )
+            
+        return [provider for _, provider in sorted(enumerate(self.providers), key=key)]
\ No newline at end of file
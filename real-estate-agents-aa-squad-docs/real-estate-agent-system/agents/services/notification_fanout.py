@@ -0,0 +1,149 @@
+"""
+Notification Fan-out - Delivers notifications to every channel concurrently,
+with a bounded pool, retries and latency metrics per channel
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+import structlog
+
+logger = structlog.get_logger()
+
+Sender = Callable[[Any, Any], Awaitable[None]]
+
+# (job index, channel name, "sent" or "failed")
+OutcomeHook = Callable[[int, str, str], None]
+
+class ChannelStats:
+    """Rolling send latency and outcome counters for one channel"""
+    
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.counters = {"sent": 0, "failed": 0, "attempts": 0, "retries": 0, "timeouts": 0}
+        self.in_flight = 0
+        
+    def record(self, latency: float, ok: bool):
+        self.counters["attempts"] += 1
+        if ok:
+            self.latencies.append(latency)
+            
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct * len(ordered)))]
+
+class Channel:
+    """One delivery channel (email, push, sms) backed by a single provider.
+    
+    At most `concurrency` sends are in flight at once, so a provider's own
+    limits are respected. Each send is bounded by `timeout` and retried up
+    to `retries` times with exponential backoff; the slot is released while
+    waiting to retry so other notifications can use it.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        send: Sender,
+        concurrency: int = 10,
+        retries: int = 2,
+        retry_backoff: float = 0.5,
+        timeout: float = 10.0,
+        window: int = 500
+    ):
+        self.name = name
+        self.send = send
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.stats = ChannelStats(window)
+        self._slots = asyncio.Semaphore(concurrency)
+        
+    async def deliver(self, notification: Any, agent: Any) -> str:
+        """Send one notification; returns "sent" or "failed" """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats.counters["retries"] += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                
+            async with self._slots:
+                self.stats.in_flight += 1
+                started = time.monotonic()
+                try:
+                    await asyncio.wait_for(self.send(notification, agent), self.timeout)
+                    self.stats.record(time.monotonic() - started, True)
+                    self.stats.counters["sent"] += 1
+                    return "sent"
+                except Exception as e:
+                    self.stats.record(time.monotonic() - started, False)
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.stats.counters["timeouts"] += 1
+                    error = str(e) or type(e).__name__
+                finally:
+                    self.stats.in_flight -= 1
+                    
+        self.stats.counters["failed"] += 1
+        logger.error("Failed to send notification",
+                     channel=self.name,
+                     error=error,
+                     attempts=self.retries + 1,
+                     notification_id=str(notification.id))
+        return "failed"
+        
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.stats.in_flight,
+            "p50_seconds": self.stats.percentile(0.5),
+            "p95_seconds": self.stats.percentile(0.95),
+            **self.stats.counters
+        }
+
+class NotificationFanout:
+    """Runs the channel sends for a batch of notifications concurrently.
+    
+    Every (notification, channel) pair is an independent task, queued on
+    that channel's pool, so a slow or failing provider only delays its own
+    channel.
+    """
+    
+    def __init__(self, channels: Dict[str, Channel]):
+        self.channels = channels
+        
+    async def deliver(
+        self,
+        jobs: List[Tuple[Any, Any, List[str]]],
+        on_outcome: Optional[OutcomeHook] = None
+    ) -> List[Dict[str, str]]:
+        """Deliver (notification, agent, channel names) jobs.
+        
+        `on_outcome(job index, channel, status)` is called as each send
+        finishes, so callers can record progress before the slowest channel
+        is done. Returns, for each job in order, the status of each channel.
+        """
+        pairs = [
+            (index, name)
+            for index, (_, _, names) in enumerate(jobs)
+            for name in names
+        ]
+        
+        async def send(index: int, name: str) -> str:
+            outcome = await self.channels[name].deliver(jobs[index][0], jobs[index][1])
+            if on_outcome is not None:
+                on_outcome(index, name, outcome)
+            return outcome
+            
+        outcomes = await asyncio.gather(*(send(index, name) for index, name in pairs))
+        
+        statuses: List[Dict[str, str]] = [{} for _ in jobs]
+        for (index, name), outcome in zip(pairs, outcomes):
+            statuses[index][name] = outcome
+        return statuses
+        
+    def stats(self) -> Dict[str, Any]:
+        """Per-channel delivery counters and latency percentiles"""
+        return {name: channel.snapshot() for name, channel in self.channels.items()}
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Partition Maintenance - Creates upcoming monthly partitions for the
+append-only log tables and retires months past their retention
+"""
+
+import re
+from datetime import date
+from typing import Dict, Any, List, Optional
+from sqlalchemy import text
+from database import connection
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+NOTIFICATIONS_TABLE = "public.rltr_mktg_notifications"
+APPROVAL_LOGS_TABLE = "public.rltr_mktg_approval_logs"
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` away from `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+class PartitionMaintainer:
+    """Keeps monthly range partitions ahead of time and enforces retention.
+    
+    `retention_months` maps each partitioned table to the number of whole
+    months to keep before the current one (0 keeps everything). Expired
+    partitions are detached with DETACH ... CONCURRENTLY, so inserts into
+    the parent are never blocked, and then dropped unless `drop_detached`
+    is off, in which case they remain as standalone tables for archiving.
+    """
+    
+    def __init__(
+        self,
+        retention_months: Dict[str, int],
+        months_ahead: int = 3,
+        drop_detached: bool = True
+    ):
+        self.retention_months = retention_months
+        self.months_ahead = months_ahead
+        self.drop_detached = drop_detached
+        
+    @classmethod
+    def from_settings(cls) -> "PartitionMaintainer":
+        return cls(
+            retention_months={
+                NOTIFICATIONS_TABLE: settings.notifications_retention_months,
+                APPROVAL_LOGS_TABLE: settings.approval_logs_retention_months
+            },
+            months_ahead=settings.partition_months_ahead,
+            drop_detached=settings.partition_drop_detached
+        )
+        
+    async def run(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """Create missing partitions, then retire expired ones"""
+        created = await self.ensure_partitions(today)
+        retired = await self.apply_retention(today)
+        return {"created": created, "retired": retired}
+        
+    async def ensure_partitions(self, today: Optional[date] = None) -> List[str]:
+        """Make sure this month and the next `months_ahead` have partitions"""
+        current = (today or date.today()).replace(day=1)
+        created = []
+        async with connection.engine.begin() as conn:
+            for table in self.retention_months:
+                existing = set(await self._partitions(conn, table))
+                for offset in range(self.months_ahead + 1):
+                    month = add_months(current, offset)
+                    if month in existing:
+                        continue
+                    result = await conn.execute(
+                        text("SELECT meta.create_monthly_partition(:table, :month)"),
+                        {"table": table, "month": month}
+                    )
+                    created.append(result.scalar_one())
+                    
+        if created:
+            logger.info("Created partitions", partitions=created)
+        return created
+        
+    async def apply_retention(self, today: Optional[date] = None) -> List[str]:
+        """Detach (and optionally drop) partitions older than each table's retention"""
+        current = (today or date.today()).replace(day=1)
+        retired = []
+        
+        # DETACH CONCURRENTLY cannot run inside a transaction block
+        async with connection.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for table, months in self.retention_months.items():
+                if months <= 0:
+                    continue
+                cutoff = add_months(current, -months)
+                schema = table.split(".")[0]
+                for month, partition in (await self._partitions(conn, table)).items():
+                    if month >= cutoff:
+                        continue
+                    qualified = f"{schema}.{partition}"
+                    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {qualified} CONCURRENTLY"))
+                    if self.drop_detached:
+                        await conn.execute(text(f"DROP TABLE {qualified}"))
+                    retired.append(qualified)
+                    
+        if retired:
+            logger.info("Retired partitions", partitions=retired, dropped=self.drop_detached)
+        return retired
+        
+    @staticmethod
+    async def _partitions(conn, table: str) -> Dict[date, str]:
+        """Monthly partitions currently attached to `table`, by month"""
+        schema, name = table.split(".")
+        result = await conn.execute(
+            text("""
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+                JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_namespace AS ns ON ns.oid = parent.relnamespace
+                WHERE ns.nspname = :schema AND parent.relname = :name
+            """),
+            {"schema": schema, "name": name}
+        )
+        partitions = {}
+        for (relname,) in result.all():
+            match = _PARTITION_SUFFIX.search(relname)
+            if match:
+                partitions[date(int(match.group(1)), int(match.group(2)), 1)] = relname
+        return partitions
\ No newline at end of file
@@ -0,0 +1,291 @@
+"""
+Rate Limiter - Token-bucket limiter for LLM request (RPM) and token (TPM)
+quotas, shared process-wide and optionally coordinated through Redis
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from typing import Dict, Any, List, Optional
+import redis.asyncio as redis
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Takes from the request and token buckets together, or from neither.
+# Returns 0 when granted, otherwise the seconds to wait before retrying.
+_TAKE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local wait = 0
+local levels = {}
+for i = 1, 2 do
+    local rate = tonumber(ARGV[(i - 1) * 3 + 1])
+    local capacity = tonumber(ARGV[(i - 1) * 3 + 2])
+    local amount = tonumber(ARGV[(i - 1) * 3 + 3])
+    local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - ts) * rate)
+    levels[i] = level
+    if rate > 0 and level < amount then
+        wait = math.max(wait, (amount - level) / rate)
+    end
+end
+for i = 1, 2 do
+    local amount = tonumber(ARGV[(i - 1) * 3 + 3])
+    local level = levels[i]
+    if wait == 0 then
+        level = level - amount
+    end
+    redis.call('HSET', KEYS[i], 'level', level, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], 3600)
+end
+return tostring(wait)
+"""
+
+class RateLimit:
+    """Requests and tokens per minute allowed on one route (0 = unlimited)"""
+    
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+
+class TokenBucket:
+    """Continuously refilling bucket; `rate` is units per second"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+        
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+        
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+        
+    def take(self, amount: float, now: float):
+        if not self.unlimited:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+            
+    def drain(self, seconds: float, now: float):
+        """Empty the bucket so nothing is granted for `seconds`"""
+        if not self.unlimited:
+            self._refill(now)
+            self.level = min(self.level, -seconds * self.rate)
+
+class _Route:
+    """Buckets and wait queue for one (provider, model) route"""
+    
+    def __init__(self, route_id: str, limit: RateLimit, headroom: float, burst_seconds: float):
+        self.route_id = route_id
+        self.limit = limit
+        
+        # Refill at just under the quota and cap bursts at a few seconds'
+        # worth, so throughput stays flat instead of spiking into 429s
+        request_rate = limit.rpm * headroom / 60.0
+        token_rate = limit.tpm * headroom / 60.0
+        self.requests = TokenBucket(request_rate, max(1.0, request_rate * burst_seconds))
+        self.tokens = TokenBucket(token_rate, token_rate * burst_seconds)
+        
+        self.waiters: List[tuple] = []
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.wakeup = asyncio.Event()
+        self.counters = {"granted": 0, "waited": 0, "throttled": 0, "wait_seconds": 0.0}
+
+class LLMRateLimiter:
+    """Paces LLM calls under each route's RPM and TPM quotas.
+    
+    Callers wait in a per-route priority queue; the head of the queue is
+    granted as soon as both buckets allow it, so high-priority interactive
+    requests overtake queued batch work. With Redis, the buckets live in
+    Redis and are shared by every process using the same quota.
+    """
+    
+    def __init__(
+        self,
+        limits: Optional[Dict[str, RateLimit]] = None,
+        default_limit: Optional[RateLimit] = None,
+        headroom: float = 0.95,
+        burst_seconds: float = 5.0,
+        redis_url: Optional[str] = None,
+        namespace: str = "llmrate"
+    ):
+        self.limits = limits or {}
+        self.default_limit = default_limit or RateLimit()
+        self.headroom = headroom
+        self.burst_seconds = burst_seconds
+        self.namespace = namespace
+        self._routes: Dict[str, _Route] = {}
+        self._sequence = itertools.count()
+        self._redis = redis.from_url(redis_url, decode_responses=True) if redis_url else None
+        self._redis_errors = 0
+        
+    @classmethod
+    def from_settings(cls) -> "LLMRateLimiter":
+        """Build a limiter from LLM_RATE_LIMITS / LLM_DEFAULT_RPM / LLM_DEFAULT_TPM"""
+        limits = {
+            route_id: RateLimit(rpm=int(limit.get("rpm", 0)), tpm=int(limit.get("tpm", 0)))
+            for route_id, limit in json.loads(settings.llm_rate_limits or "{}").items()
+        }
+        return cls(
+            limits=limits,
+            default_limit=RateLimit(rpm=settings.llm_default_rpm, tpm=settings.llm_default_tpm),
+            headroom=settings.llm_rate_limit_headroom,
+            redis_url=settings.redis_url if settings.llm_rate_limit_redis else None
+        )
+        
+    def _route(self, route_id: str) -> _Route:
+        route = self._routes.get(route_id)
+        if route is None:
+            limit = self.limits.get(route_id) or self.limits.get(route_id.split(":", 1)[-1]) or self.default_limit
+            route = _Route(route_id, limit, self.headroom, self.burst_seconds)
+            self._routes[route_id] = route
+        return route
+        
+    async def acquire(self, route_id: str, estimated_tokens: int, priority: int = PRIORITY_NORMAL):
+        """Wait until a request of `estimated_tokens` may be sent on `route_id`.
+        
+        Limits may be configured per route ("openai:gpt-4") or per model ("gpt-4").
+        """
+        route = self._route(route_id)
+        if not route.limit.rpm and not route.limit.tpm:
+            route.counters["granted"] += 1
+            return
+            
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(route.waiters, (priority, next(self._sequence), estimated_tokens, future))
+        route.wakeup.set()
+        if route.dispatcher is None or route.dispatcher.done():
+            route.dispatcher = asyncio.create_task(self._dispatch(route))
+            
+        started = time.monotonic()
+        await future
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            route.counters["waited"] += 1
+            route.counters["wait_seconds"] += waited
+            
+    def throttle(self, route_id: str, retry_after: Optional[float] = None):
+        """Pause a route after the provider answered 429"""
+        route = self._route(route_id)
+        seconds = retry_after if retry_after is not None else 1.0
+        now = time.monotonic()
+        route.requests.drain(seconds, now)
+        route.tokens.drain(seconds, now)
+        route.counters["throttled"] += 1
+        logger.warning("LLM route throttled", route=route_id, retry_after=seconds)
+        
+    async def _dispatch(self, route: _Route):
+        """Grant waiters in priority order as the buckets refill"""
+        while route.waiters:
+            priority, _, tokens, future = route.waiters[0]
+            if future.done():
+                # Caller was cancelled while queued
+                heapq.heappop(route.waiters)
+                continue
+                
+            wait = await self._try_take(route, tokens)
+            if wait <= 0:
+                heapq.heappop(route.waiters)
+                route.counters["granted"] += 1
+                future.set_result(None)
+                continue
+                
+            # Sleep until the head fits, waking early if a new caller queues
+            # so a higher-priority request is considered straight away
+            route.wakeup.clear()
+            try:
+                await asyncio.wait_for(route.wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+                
+    async def _try_take(self, route: _Route, tokens: int) -> float:
+        if self._redis is not None:
+            try:
+                wait = await self._redis.eval(
+                    _TAKE_SCRIPT,
+                    2,
+                    f"{self.namespace}:{route.route_id}:requests",
+                    f"{self.namespace}:{route.route_id}:tokens",
+                    route.requests.rate, route.requests.capacity, 1,
+                    route.tokens.rate, route.tokens.capacity, min(tokens, route.tokens.capacity)
+                )
+                # A local 429 pause still applies on top of the shared quota
+                now = time.monotonic()
+                return max(float(wait), route.requests.wait_time(0, now), route.tokens.wait_time(0, now))
+            except Exception as e:
+                self._redis_errors += 1
+                logger.warning("Rate limiter Redis unavailable, using local buckets", error=str(e))
+                
+        now = time.monotonic()
+        wait = max(route.requests.wait_time(1, now), route.tokens.wait_time(tokens, now))
+        if wait <= 0:
+            route.requests.take(1, now)
+            route.tokens.take(tokens, now)
+        return wait
+        
+    def stats(self) -> Dict[str, Any]:
+        """Per-route grants, queueing and throttling"""
+        return {
+            "redis_errors": self._redis_errors,
+            "routes": {
+                route_id: {
+                    **route.counters,
+                    "wait_seconds": round(route.counters["wait_seconds"], 3),
+                    "queued": len(route.waiters),
+                    "rpm": route.limit.rpm,
+                    "tpm": route.limit.tpm
+                }
+                for route_id, route in self._routes.items()
+            }
+        }
+        
+    async def close(self):
+        """Stop dispatchers and close the Redis connection"""
+        for route in self._routes.values():
+            if route.dispatcher is not None:
+                route.dispatcher.cancel()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a request counts against TPM: the prompt (~4 characters per
+    token) plus the completion allowance, as providers reserve max_tokens"""
+    prompt_chars = sum(len(message.get("content") or "") for message in messages)
+    return prompt_chars // 4 + 4 * len(messages) + max_tokens
+
+_shared_limiter: Optional[LLMRateLimiter] = None
+
+def get_rate_limiter() -> LLMRateLimiter:
+    """Process-wide limiter shared by every agent's LLM router"""
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = LLMRateLimiter.from_settings()
+    return _shared_limiter
+
+async def close_rate_limiter():
+    """Close the process-wide limiter, if one was created"""
+    global _shared_limiter
+    if _shared_limiter is not None:
+        await _shared_limiter.close()
+        _shared_limiter = None
\ No newline at end of file
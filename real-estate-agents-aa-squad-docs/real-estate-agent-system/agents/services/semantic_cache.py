@@ -0,0 +1,328 @@
+"""
+Semantic Content Cache - Reuses prior generations for near-identical listings
+via similarity search over meta.embeddings
+"""
+
+import hashlib
+import json
+import math
+import re
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Callable, Awaitable, Tuple
+from sqlalchemy import text
+from database.connection import get_session
+import structlog
+
+logger = structlog.get_logger()
+
+EMBEDDING_DIM = 384
+CONTENT_GENERATION_KIND = "content_generation"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+@lru_cache(maxsize=262144)
+def _feature_bucket(feature: str, dim: int) -> Tuple[int, float]:
+    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+    return int.from_bytes(digest[:4], "little") % dim, 1.0 if digest[4] & 1 else -1.0
+
+def hashing_features(text_value: str, dim: int = EMBEDDING_DIM) -> List[Tuple[int, float]]:
+    """(bucket, sign) for each unigram and bigram of the text"""
+    tokens = _TOKEN_RE.findall(text_value.lower())
+    features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    return [_feature_bucket(feature, dim) for feature in features]
+
+def hashing_embedding(text_value: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """Deterministic signed feature-hashing embedding (unigrams + bigrams).
+    
+    Cheap and dependency free; good enough to detect near-duplicate listing
+    text such as tract homes that share a builder description.
+    """
+    vector = [0.0] * dim
+    
+    for bucket, sign in hashing_features(text_value, dim):
+        vector[bucket] += sign
+        
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
+
+async def _default_embed(text_value: str) -> List[float]:
+    return hashing_embedding(text_value)
+
+def _to_pgvector(vector: List[float]) -> str:
+    return "[" + ",".join(f"{v:.6f}" for v in vector) + "]"
+
+class SemanticContentCache:
+    """Looks up previously generated content for similar listings and adapts
+    the listing-specific details (address, price, square footage)"""
+    
+    def __init__(
+        self,
+        prompt_version: str,
+        similarity_threshold: float = 0.97,
+        embed: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+        embedding_model: str = "hashing-v1",
+        enabled: bool = True,
+        index=None
+    ):
+        self.prompt_version = prompt_version
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed or _default_embed
+        # Vectors from different models are not comparable
+        self.embedding_model = embedding_model
+        # Optional in-process services.vector_index.VectorIndex; Postgres is
+        # queried while it is not loaded
+        self.index = index
+        self.enabled = enabled
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "errors": 0
+        }
+        
+    @staticmethod
+    def listing_text(
+        listing: Dict[str, Any],
+        content_type: str,
+        context: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Text that is embedded for similarity search.
+        
+        Address and price are deliberately left out: they differ between
+        otherwise identical homes and are substituted when content is reused.
+        """
+        parts = [
+            f"content type: {content_type}",
+            f"beds: {listing.get('beds')}",
+            f"baths: {listing.get('baths')}",
+            f"features: {', '.join(sorted(listing.get('key_features') or []))}",
+            f"description: {listing.get('description') or ''}"
+        ]
+        if context:
+            parts.append(f"context: {json.dumps(context, sort_keys=True, default=str)}")
+        return "\n".join(parts)
+        
+    @staticmethod
+    def is_embeddable(listing: Dict[str, Any]) -> bool:
+        """Only listings with descriptive data can be matched meaningfully"""
+        return bool(listing.get("description") or listing.get("key_features"))
+        
+    async def lookup(
+        self,
+        listing: Dict[str, Any],
+        content_type: str,
+        context: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return adapted content from the most similar prior generation, if any"""
+        if not self.enabled or not self.is_embeddable(listing):
+            return None
+            
+        filters = {
+            "content_type": content_type,
+            "prompt_version": self.prompt_version,
+            "embedding_model": self.embedding_model,
+            "beds": self._as_text(listing.get("beds")),
+            "baths": self._as_text(listing.get("baths"))
+        }
+        
+        try:
+            embedding = await self.embed(self.listing_text(listing, content_type, context))
+            
+            if self.index is not None and self.index.ready:
+                matches = self.index.search(embedding, CONTENT_GENERATION_KIND, k=1, where=filters)
+                metadata, similarity = (matches[0][1]["metadata"], matches[0][0]) if matches else (None, 0.0)
+            else:
+                metadata, similarity = await self._nearest_in_database(embedding, filters)
+                
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning("Semantic cache lookup failed", error=str(e))
+            return None
+            
+        if metadata is None or similarity < self.similarity_threshold:
+            self._stats["misses"] += 1
+            return None
+            
+        adapted = self.adapt(
+            metadata["generated_content"],
+            metadata.get("substitutions", {}),
+            self.substitutions(listing)
+        )
+        if adapted is None:
+            self._stats["misses"] += 1
+            logger.info("Semantic cache match rejected, details cannot be adapted",
+                        source_listing_id=metadata.get("listing_id"))
+            return None
+            
+        self._stats["hits"] += 1
+        logger.info("Semantic cache hit",
+                    source_listing_id=metadata.get("listing_id"),
+                    similarity=round(float(similarity), 4))
+                    
+        return adapted
+        
+    async def _nearest_in_database(self, embedding: List[float], filters: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], float]:
+        session = await get_session()
+        async with session:
+            result = await session.execute(
+                text("""
+                    SELECT metadata, 1 - (embedding <=> CAST(:embedding AS vector)) AS similarity
+                    FROM meta.embeddings
+                    WHERE kind = :kind
+                      AND metadata->>'content_type' = :content_type
+                      AND metadata->>'prompt_version' = :prompt_version
+                      AND metadata->>'embedding_model' = :embedding_model
+                      AND metadata->>'beds' IS NOT DISTINCT FROM :beds
+                      AND metadata->>'baths' IS NOT DISTINCT FROM :baths
+                    ORDER BY embedding <=> CAST(:embedding AS vector)
+                    LIMIT 1
+                """),
+                {"embedding": _to_pgvector(embedding), "kind": CONTENT_GENERATION_KIND, **filters}
+            )
+            row = result.first()
+        return (row.metadata, float(row.similarity)) if row is not None else (None, 0.0)
+        
+    async def store(
+        self,
+        listing_id: str,
+        listing: Dict[str, Any],
+        content_type: str,
+        context: Optional[Dict[str, Any]],
+        generated_content: Dict[str, Any]
+    ):
+        """Record a fresh generation so similar listings can reuse it"""
+        if not self.enabled or not self.is_embeddable(listing):
+            return
+            
+        # Empty (failed or garbled) generations must never be handed out
+        if not isinstance(generated_content, dict) or not str(generated_content.get("text") or "").strip():
+            return
+            
+        try:
+            listing_text = self.listing_text(listing, content_type, context)
+            embedding = await self.embed(listing_text)
+            
+            metadata = {
+                "listing_id": str(listing_id),
+                "content_type": content_type,
+                "prompt_version": self.prompt_version,
+                "embedding_model": self.embedding_model,
+                "beds": self._as_text(listing.get("beds")),
+                "baths": self._as_text(listing.get("baths")),
+                "substitutions": self.substitutions(listing),
+                "generated_content": generated_content
+            }
+            
+            session = await get_session()
+            async with session:
+                result = await session.execute(
+                    text("""
+                        INSERT INTO meta.embeddings (content, embedding, kind, ref_id, metadata)
+                        VALUES (:content, CAST(:embedding AS vector), :kind, :ref_id, CAST(:metadata AS jsonb))
+                        RETURNING id
+                    """),
+                    {
+                        "content": listing_text,
+                        "embedding": _to_pgvector(embedding),
+                        "kind": CONTENT_GENERATION_KIND,
+                        "ref_id": str(listing_id),
+                        "metadata": json.dumps(metadata, default=str)
+                    }
+                )
+                row_id = result.scalar_one()
+                await session.commit()
+                
+            if self.index is not None:
+                self.index.add(row_id, CONTENT_GENERATION_KIND, str(listing_id), metadata, embedding)
+            self._stats["stores"] += 1
+            
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning("Semantic cache store failed", listing_id=listing_id, error=str(e))
+            
+    @staticmethod
+    def substitutions(listing: Dict[str, Any]) -> Dict[str, List[str]]:
+        """Listing-specific strings, in every format a generation may use them"""
+        values: Dict[str, List[str]] = {}
+        
+        address = listing.get("address")
+        if isinstance(address, dict):
+            values["full_address"] = [address.get("full_address")] if address.get("full_address") else []
+            values["street"] = [address.get("street")] if address.get("street") else []
+        elif address:
+            values["full_address"] = [str(address)]
+            
+        price = listing.get("price")
+        if price:
+            price = float(price)
+            values["price"] = [f"${price:,.0f}", f"{price:,.0f}", f"{price:.0f}"]
+            
+        sqft = listing.get("sqft")
+        if sqft:
+            values["sqft"] = [f"{int(sqft):,}", str(int(sqft))]
+            
+        return values
+        
+    @classmethod
+    def adapt(
+        cls,
+        content: Any,
+        source: Dict[str, List[str]],
+        target: Dict[str, List[str]]
+    ) -> Optional[Any]:
+        """Swap the source listing's details for the target listing's.
+        
+        Returns None when the content mentions a source detail the target
+        listing has no counterpart for, rather than leaking it.
+        """
+        replacements = []
+        for field, source_values in source.items():
+            target_values = target.get(field) or []
+            for index, old in enumerate(source_values):
+                if not old:
+                    continue
+                if index >= len(target_values):
+                    if cls._mentions(content, old):
+                        return None
+                elif old != target_values[index]:
+                    replacements.append((old, target_values[index]))
+                    
+        # Longest first so "$500,000" is replaced before "500,000"
+        replacements.sort(key=lambda pair: len(pair[0]), reverse=True)
+        return cls._replace(content, replacements)
+        
+    @classmethod
+    def _replace(cls, content: Any, replacements: List[tuple]) -> Any:
+        if isinstance(content, str):
+            if not replacements:
+                return content
+            pattern = re.compile("|".join(re.escape(old) for old, _ in replacements))
+            lookup = dict(replacements)
+            return pattern.sub(lambda match: lookup[match.group(0)], content)
+        if isinstance(content, dict):
+            return {key: cls._replace(value, replacements) for key, value in content.items()}
+        if isinstance(content, list):
+            return [cls._replace(value, replacements) for value in content]
+        return content
+        
+    @classmethod
+    def _mentions(cls, content: Any, value: str) -> bool:
+        if isinstance(content, str):
+            return value in content
+        if isinstance(content, dict):
+            return any(cls._mentions(item, value) for item in content.values())
+        if isinstance(content, list):
+            return any(cls._mentions(item, value) for item in content)
+        return False
+        
+    @staticmethod
+    def _as_text(value: Any) -> Optional[str]:
+        return None if value is None else str(value)
+        
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0
+        }
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Status Counters - Per-agent dashboard badge counts maintained incrementally
+on status transitions and periodically reconciled against the database
+"""
+
+from typing import Dict, Any, Optional
+import redis.asyncio as redis
+from sqlalchemy import text
+from database.connection import get_session
+from config import settings
+import structlog
+
+logger = structlog.get_logger()
+
+PENDING_APPROVALS = "pending_approvals"
+UNREAD_NOTIFICATIONS = "unread_notifications"
+FAILED_POSTS = "failed_posts"
+COUNTERS = (PENDING_APPROVALS, UNREAD_NOTIFICATIONS, FAILED_POSTS)
+
+# Authoritative counts for every agent, used to correct drift
+RECONCILE_SQL = """
+    SELECT a.id AS agent_id,
+           COALESCE(c.pending, 0) AS pending_approvals,
+           COALESCE(n.unread, 0) AS unread_notifications,
+           COALESCE(p.failed, 0) AS failed_posts
+    FROM public.rltr_mktg_agents AS a
+    LEFT JOIN (
+        SELECT agent_id, count(*) AS pending
+        FROM public.rltr_mktg_content_pieces
+        WHERE status = 'pending_approval_agent'
+        GROUP BY agent_id
+    ) AS c ON c.agent_id = a.id
+    LEFT JOIN (
+        SELECT agent_id, count(*) AS unread
+        FROM public.rltr_mktg_notifications
+        WHERE is_read = false
+        GROUP BY agent_id
+    ) AS n ON n.agent_id = a.id
+    LEFT JOIN (
+        SELECT cp.agent_id, count(*) AS failed
+        FROM public.rltr_mktg_post_schedule AS ps
+        JOIN public.rltr_mktg_content_pieces AS cp ON cp.id = ps.content_piece_id
+        WHERE ps.status = 'failed'
+        GROUP BY cp.agent_id
+    ) AS p ON p.agent_id = a.id
+"""
+
+class StatusCounters:
+    """Badge counts per agent, one Redis hash (or in-memory dict) per agent.
+    
+    Writers apply deltas after committing a status change; reads are a
+    single hash lookup. Increments are best effort: a lost update only
+    lasts until the next reconcile().
+    """
+    
+    def __init__(self, redis_url: Optional[str] = None, namespace: str = "counters"):
+        self.namespace = namespace
+        self._memory: Dict[str, Dict[str, int]] = {}
+        self._redis = redis.from_url(redis_url, decode_responses=True) if redis_url else None
+        self._stats = {"updates": 0, "reads": 0, "reconciliations": 0, "corrections": 0, "redis_errors": 0}
+        
+    @classmethod
+    def from_settings(cls) -> "StatusCounters":
+        return cls(redis_url=settings.redis_url if settings.status_counters_redis else None)
+        
+    def _key(self, agent_id: str) -> str:
+        return f"{self.namespace}:{agent_id}"
+        
+    async def add(self, agent_id: str, **deltas: int):
+        """Apply deltas, e.g. add(agent_id, pending_approvals=-1, unread_notifications=1)"""
+        deltas = {counter: delta for counter, delta in deltas.items() if delta}
+        if not agent_id or not deltas:
+            return
+        self._stats["updates"] += 1
+        
+        if self._redis is not None:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for counter, delta in deltas.items():
+                        pipe.hincrby(self._key(agent_id), counter, delta)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                self._stats["redis_errors"] += 1
+                logger.warning("Status counter update failed", agent_id=agent_id, error=str(e))
+                return
+                
+        counts = self._memory.setdefault(str(agent_id), {})
+        for counter, delta in deltas.items():
+            counts[counter] = counts.get(counter, 0) + delta
+            
+    async def get(self, agent_id: str) -> Dict[str, int]:
+        """Current badge counts for an agent"""
+        self._stats["reads"] += 1
+        counts: Dict[str, Any] = {}
+        if self._redis is not None:
+            try:
+                counts = await self._redis.hgetall(self._key(agent_id))
+            except Exception as e:
+                self._stats["redis_errors"] += 1
+                logger.warning("Status counter read failed", agent_id=agent_id, error=str(e))
+        else:
+            counts = self._memory.get(str(agent_id), {})
+        # Deltas racing a reconcile can briefly undershoot
+        return {counter: max(0, int(counts.get(counter, 0))) for counter in COUNTERS}
+        
+    async def reconcile(self) -> Dict[str, int]:
+        """Overwrite every agent's counters with counts from the database"""
+        session = await get_session()
+        async with session:
+            result = await session.execute(text(RECONCILE_SQL))
+            rows = result.all()
+            
+        corrections = 0
+        if self._redis is not None:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for row in rows:
+                    pipe.hgetall(self._key(str(row.agent_id)))
+                previous = await pipe.execute()
+                for row in rows:
+                    pipe.hset(self._key(str(row.agent_id)), mapping={counter: getattr(row, counter) for counter in COUNTERS})
+                await pipe.execute()
+        else:
+            previous = [self._memory.get(str(row.agent_id), {}) for row in rows]
+            for row in rows:
+                self._memory[str(row.agent_id)] = {counter: getattr(row, counter) for counter in COUNTERS}
+                
+        for row, counts in zip(rows, previous):
+            if any(int(counts.get(counter, 0)) != getattr(row, counter) for counter in COUNTERS):
+                corrections += 1
+                
+        self._stats["reconciliations"] += 1
+        self._stats["corrections"] += corrections
+        return {"agents": len(rows), "corrected": corrections}
+        
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis" if self._redis is not None else "memory", **self._stats}
+        
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+
+_shared_counters: Optional[StatusCounters] = None
+
+def get_status_counters() -> StatusCounters:
+    """Process-wide counters shared by every agent"""
+    global _shared_counters
+    if _shared_counters is None:
+        _shared_counters = StatusCounters.from_settings()
+    return _shared_counters
+
+async def close_status_counters():
+    """Close the process-wide counters, if they were created"""
+    global _shared_counters
+    if _shared_counters is not None:
+        await _shared_counters.close()
+        _shared_counters = None
\ No newline at end of file
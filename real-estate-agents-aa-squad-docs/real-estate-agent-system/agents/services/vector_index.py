@@ -0,0 +1,491 @@
+"""
+Vector Index - In-process mirror of meta.embeddings for low-latency
+similarity search, persisted as memory-mapped snapshot files
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from database.connection import get_session
+from config import settings
+import structlog
+
+try:
+    import hnswlib
+except ImportError:  # optional: exact NumPy search is used instead
+    hnswlib = None
+
+logger = structlog.get_logger()
+
+EMBEDDING_DIM = 384
+
+# Change feed start for an empty index
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _build_graph(vectors: np.ndarray, dim: int, m: int = 16):
+    """HNSW graph over `vectors`, labelled by position (runs in a worker thread)"""
+    index = hnswlib.Index(space="ip", dim=dim)
+    index.init_index(max_elements=max(len(vectors) * 2, 1024), ef_construction=200, M=m)
+    if len(vectors):
+        index.add_items(vectors, np.arange(len(vectors)))
+    return index
+
+class _Partition:
+    """Vectors of one embedding kind: a read-only (memory-mapped) base from the
+    last snapshot plus an in-memory delta of rows added since. Updated and
+    deleted rows stay in place as tombstones until the next snapshot."""
+    
+    def __init__(self, dim: int, base: Optional[np.ndarray] = None, rows: Optional[List[Dict[str, Any]]] = None):
+        self.dim = dim
+        self.base = base if base is not None else np.zeros((0, dim), dtype=np.float32)
+        self.delta = np.zeros((256, dim), dtype=np.float32)
+        self.delta_count = 0
+        self.rows = rows or []
+        self.deleted: set = set()
+        self.hnsw = None
+        
+    def __len__(self) -> int:
+        return len(self.base) + self.delta_count
+        
+    @property
+    def live(self) -> int:
+        return len(self) - len(self.deleted)
+        
+    def add(self, vector: np.ndarray, row: Dict[str, Any]) -> int:
+        if self.delta_count == len(self.delta):
+            grown = np.zeros((len(self.delta) * 2, self.dim), dtype=np.float32)
+            grown[:self.delta_count] = self.delta
+            self.delta = grown
+        self.delta[self.delta_count] = vector
+        self.delta_count += 1
+        self.rows.append(row)
+        position = len(self.rows) - 1
+        if self.hnsw is not None:
+            if self.hnsw.get_current_count() >= self.hnsw.get_max_elements():
+                self.hnsw.resize_index(self.hnsw.get_max_elements() * 2)
+            self.hnsw.add_items(vector[None, :], [position])
+        return position
+        
+    def remove(self, position: int):
+        self.deleted.add(position)
+        if self.hnsw is not None:
+            self.hnsw.mark_deleted(position)
+            
+    def matrix(self) -> np.ndarray:
+        """Every vector as one contiguous array"""
+        if not self.delta_count:
+            return np.asarray(self.base)
+        return np.concatenate([self.base, self.delta[:self.delta_count]])
+        
+    def attach_hnsw(self, index, built: int):
+        """Adopt a graph built over the first `built` rows.
+        
+        Runs on the event loop, so rows added or removed while the graph was
+        being built in a thread are applied before it starts serving queries.
+        """
+        if len(self) > built:
+            if len(self) > index.get_max_elements():
+                index.resize_index(len(self) * 2)
+            index.add_items(self.matrix()[built:], np.arange(built, len(self)))
+        for position in self.deleted:
+            index.mark_deleted(position)
+        self.hnsw = index
+        
+    def search(self, queries: np.ndarray, k: int) -> List[List[Tuple[float, int]]]:
+        """Top-k (score, row position) per query, skipping removed rows"""
+        k = min(k, self.live)
+        if k == 0:
+            return [[] for _ in queries]
+            
+        if self.hnsw is not None:
+            self.hnsw.set_ef(max(64, k))
+            try:
+                labels, distances = self.hnsw.knn_query(queries, k=k)
+            except RuntimeError:
+                # Too few reachable live elements (many tombstones); search exactly
+                pass
+            else:
+                # hnswlib "ip" distance is 1 - dot product
+                return [
+                    [(1.0 - float(distance), int(label)) for label, distance in zip(row_labels, row_distances)]
+                    for row_labels, row_distances in zip(labels, distances)
+                ]
+                
+        # One matrix product for the whole batch of queries
+        scores = self.base @ queries.T
+        if self.delta_count:
+            scores = np.concatenate([scores, self.delta[:self.delta_count] @ queries.T])
+            
+        fetch = min(k + len(self.deleted), len(self))
+        results = []
+        for column in scores.T:
+            top = np.argpartition(-column, fetch - 1)[:fetch] if fetch < len(column) else np.arange(len(column))
+            top = top[np.argsort(-column[top])]
+            results.append([(float(column[i]), int(i)) for i in top if int(i) not in self.deleted][:k])
+        return results
+
+class VectorIndex:
+    """Mirror of meta.embeddings partitioned by kind.
+    
+    Startup maps the last snapshot into memory and then only fetches rows
+    changed since it; sync() keeps it current after that. Changes are read
+    by `updated_at` from a trailing window (`sync_window` before the last
+    sync), so rows whose transactions commit late are still picked up, and
+    deletions come from the meta.embeddings_deleted tombstones. Search is an
+    exact batched dot product over normalized vectors, or an HNSW graph when
+    hnswlib is installed and a partition is large.
+    """
+    
+    def __init__(
+        self,
+        dim: int = EMBEDDING_DIM,
+        snapshot_dir: Optional[str] = None,
+        hnsw_threshold: int = 50000,
+        overfetch: int = 64,
+        sync_window: float = 300.0,
+        tombstone_days: int = 7
+    ):
+        self.dim = dim
+        self.snapshot_dir = snapshot_dir
+        self.hnsw_threshold = hnsw_threshold
+        self.overfetch = overfetch
+        self.sync_window = timedelta(seconds=sync_window)
+        self.tombstone_retention = timedelta(days=tombstone_days)
+        self.ready = False
+        self._partitions: Dict[str, _Partition] = {}
+        self._locations: Dict[int, Tuple[str, int]] = {}
+        self._synced_at: Optional[datetime] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._stats = {"searches": 0, "search_seconds": 0.0, "synced_rows": 0, "removed_rows": 0, "snapshots": 0}
+        
+    @classmethod
+    def from_settings(cls) -> "VectorIndex":
+        return cls(
+            snapshot_dir=settings.vector_index_snapshot_dir,
+            sync_window=settings.vector_index_sync_window_seconds,
+            tombstone_days=settings.vector_index_tombstone_days
+        )
+        
+    def add(
+        self,
+        row_id: int,
+        kind: str,
+        ref_id: Optional[str],
+        metadata: Dict[str, Any],
+        vector,
+        updated_at: Optional[str] = None
+    ):
+        """Add one meta.embeddings row (ignored if already indexed)"""
+        if row_id in self._locations:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+            
+        partition = self._partitions.get(kind)
+        if partition is None:
+            partition = self._partitions[kind] = _Partition(self.dim)
+        position = partition.add(vector, {"id": row_id, "ref_id": ref_id, "metadata": metadata, "updated_at": updated_at})
+        self._locations[row_id] = (kind, position)
+        
+    def remove(self, row_id: int) -> bool:
+        """Drop one row from search results; False if it was not indexed"""
+        location = self._locations.pop(row_id, None)
+        if location is None:
+            return False
+        kind, position = location
+        self._partitions[kind].remove(position)
+        return True
+        
+    def _apply(self, row_id: int, kind: str, ref_id: Optional[str], metadata: Dict[str, Any], vector, updated_at: str):
+        """Index a row from the change feed, replacing an older version of it"""
+        location = self._locations.get(row_id)
+        if location is not None:
+            current = self._partitions[location[0]].rows[location[1]]
+            if current["updated_at"] == updated_at:
+                return
+            if current["updated_at"] is None:
+                # Added locally by the writer right after its insert
+                current["updated_at"] = updated_at
+                return
+            self.remove(row_id)
+        self.add(row_id, kind, ref_id, metadata, vector, updated_at)
+        
+    def search(
+        self,
+        vector,
+        kind: str,
+        k: int = 10,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """Most similar rows of `kind` as (cosine similarity, row)"""
+        return self.search_many([vector], kind, k, where)[0]
+        
+    def search_many(
+        self,
+        vectors: List[Any],
+        kind: str,
+        k: int = 10,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[float, Dict[str, Any]]]]:
+        """Batched search; `where` keeps rows whose metadata equals every given value.
+        
+        Filtered searches over-fetch and filter the candidates, so a very
+        selective filter may return fewer than k rows.
+        """
+        started = time.perf_counter()
+        partition = self._partitions.get(kind)
+        if partition is None or not partition.live:
+            return [[] for _ in vectors]
+            
+        queries = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.dim)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+        
+        fetch = k * self.overfetch if where else k
+        results = []
+        for candidates in partition.search(queries, fetch):
+            matches = []
+            for score, position in candidates:
+                row = partition.rows[position]
+                if where and any(row["metadata"].get(field) != value for field, value in where.items()):
+                    continue
+                matches.append((score, row))
+                if len(matches) == k:
+                    break
+            results.append(matches)
+            
+        self._stats["searches"] += len(vectors)
+        self._stats["search_seconds"] += time.perf_counter() - started
+        return results
+        
+    async def load(self):
+        """Map the snapshot (if any) and catch up from meta.embeddings"""
+        if self.snapshot_dir and os.path.exists(os.path.join(self.snapshot_dir, "manifest.json")):
+            try:
+                loaded = await asyncio.to_thread(self._read_snapshot)
+                async with self._lock:
+                    self._install(*loaded)
+            except Exception as e:
+                logger.warning("Vector index snapshot unreadable, rebuilding", error=str(e))
+                self._partitions, self._locations, self._synced_at = {}, {}, None
+                
+        await self.sync()
+        await self._build_hnsw()
+        self.ready = True
+        logger.info("Vector index loaded", rows=len(self._locations), synced_at=str(self._synced_at))
+        
+    async def sync(self, page_size: int = 5000) -> int:
+        """Apply rows inserted, updated or deleted since the last sync"""
+        applied = 0
+        removed = 0
+        async with self._lock:
+            session = await get_session()
+            async with session:
+                started = (await session.execute(text("SELECT now()"))).scalar_one()
+                since = self._synced_at - self.sync_window if self._synced_at else EPOCH
+                
+                if self._synced_at is not None:
+                    if started - self._synced_at > self.tombstone_retention:
+                        # Tombstones older than the index may be gone; diff the ids instead
+                        result = await session.execute(text("SELECT id FROM meta.embeddings"))
+                        present = set(result.scalars().all())
+                        deleted_ids = [row_id for row_id in self._locations if row_id not in present]
+                    else:
+                        result = await session.execute(
+                            text("SELECT id FROM meta.embeddings_deleted WHERE deleted_at >= :since"),
+                            {"since": since}
+                        )
+                        deleted_ids = result.scalars().all()
+                    for row_id in deleted_ids:
+                        removed += self.remove(row_id)
+                        
+                # Keyset pagination over the change feed
+                after_at, after_id = since, 0
+                while True:
+                    result = await session.execute(
+                        text("""
+                            SELECT id, kind, ref_id, metadata, updated_at, CAST(embedding AS text) AS embedding
+                            FROM meta.embeddings
+                            WHERE (updated_at, id) > (:after_at, :after_id)
+                            ORDER BY updated_at, id
+                            LIMIT :limit
+                        """),
+                        {"after_at": after_at, "after_id": after_id, "limit": page_size}
+                    )
+                    rows = result.all()
+                    
+                    for row in rows:
+                        vector = np.array(row.embedding.strip("[]").split(","), dtype=np.float32)
+                        self._apply(row.id, row.kind, row.ref_id, row.metadata or {}, vector, row.updated_at.isoformat())
+                        applied += 1
+                    if len(rows) < page_size:
+                        break
+                    after_at, after_id = rows[-1].updated_at, rows[-1].id
+                    
+                await session.execute(
+                    text("DELETE FROM meta.embeddings_deleted WHERE deleted_at < :cutoff"),
+                    {"cutoff": started - self.tombstone_retention}
+                )
+                await session.commit()
+                
+            self._synced_at = started
+            
+        self._stats["synced_rows"] += applied
+        self._stats["removed_rows"] += removed
+        return applied
+        
+    async def snapshot(self):
+        """Write every partition to a new snapshot generation and remap it"""
+        if not self.snapshot_dir:
+            return
+            
+        async with self._lock:
+            captured = {}
+            for kind, partition in self._partitions.items():
+                # Tombstoned rows are compacted out of the files
+                live = [position for position in range(len(partition)) if position not in partition.deleted]
+                vectors = partition.matrix() if len(live) == len(partition) else partition.matrix()[live]
+                captured[kind] = (vectors, [partition.rows[position] for position in live], len(partition), set(partition.deleted))
+            generation = self._generation + 1
+            await asyncio.to_thread(
+                self._write_snapshot,
+                {kind: (vectors, rows) for kind, (vectors, rows, _, _) in captured.items()},
+                generation,
+                self._synced_at
+            )
+            loaded = await asyncio.to_thread(self._read_snapshot)
+            
+            # Continue from the fresh files so the delta buffers start empty,
+            # re-applying rows removed and added while the files were being written
+            previous = self._partitions
+            self._install(*loaded)
+            for kind, partition in previous.items():
+                _, _, length, deleted = captured.get(kind, (None, [], 0, set()))
+                for position in partition.deleted - deleted:
+                    if position < length:
+                        self.remove(partition.rows[position]["id"])
+            for kind, partition in previous.items():
+                length = captured[kind][2] if kind in captured else 0
+                if length < len(partition):
+                    vectors = partition.matrix()
+                    for position in range(length, len(partition)):
+                        if position not in partition.deleted:
+                            row = partition.rows[position]
+                            self.add(row["id"], kind, row["ref_id"], row["metadata"], vectors[position], row["updated_at"])
+                # Without tombstones row positions are unchanged, so the graph stays valid
+                if partition.hnsw is not None and not partition.deleted:
+                    self._partitions[kind].hnsw = partition.hnsw
+                    
+        await self._build_hnsw()
+        self._stats["snapshots"] += 1
+        
+    def _write_snapshot(
+        self,
+        captured: Dict[str, Tuple[np.ndarray, List[Dict[str, Any]]]],
+        generation: int,
+        synced_at: Optional[datetime]
+    ):
+        # Each snapshot goes to its own directory, and only the manifest
+        # switches to it, so a crash mid-write leaves the previous one intact
+        directory = f"gen-{generation:08d}"
+        path = os.path.join(self.snapshot_dir, directory)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        for kind, (vectors, rows) in captured.items():
+            np.save(os.path.join(path, f"{kind}.npy"), vectors)
+            with open(os.path.join(path, f"{kind}.rows.json"), "w") as f:
+                json.dump(rows, f, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+                
+        manifest_path = os.path.join(self.snapshot_dir, "manifest.json")
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump({
+                "dim": self.dim,
+                "generation": generation,
+                "directory": directory,
+                "synced_at": synced_at.isoformat() if synced_at else None,
+                "kinds": list(captured)
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(manifest_path + ".tmp", manifest_path)
+        
+        # Keep the generation being replaced (its files are still mapped) and drop older ones
+        for entry in os.listdir(self.snapshot_dir):
+            if entry.startswith("gen-") and entry < f"gen-{generation - 1:08d}":
+                shutil.rmtree(os.path.join(self.snapshot_dir, entry), ignore_errors=True)
+                
+    def _read_snapshot(self) -> Tuple[Dict[str, _Partition], Dict[int, Tuple[str, int]], Optional[datetime], int]:
+        """Map the current generation's files (runs in a worker thread)"""
+        with open(os.path.join(self.snapshot_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest["dim"] != self.dim:
+            raise ValueError(f"Snapshot has {manifest['dim']}-dim vectors, expected {self.dim}")
+            
+        path = os.path.join(self.snapshot_dir, manifest["directory"])
+        partitions = {}
+        locations = {}
+        for kind in manifest["kinds"]:
+            base = np.load(os.path.join(path, f"{kind}.npy"), mmap_mode="r")
+            with open(os.path.join(path, f"{kind}.rows.json")) as f:
+                rows = json.load(f)
+            partitions[kind] = _Partition(self.dim, base=base, rows=rows)
+            locations.update((row["id"], (kind, position)) for position, row in enumerate(rows))
+            
+        synced_at = datetime.fromisoformat(manifest["synced_at"]) if manifest["synced_at"] else None
+        return partitions, locations, synced_at, manifest["generation"]
+        
+    def _install(self, partitions: Dict[str, _Partition], locations: Dict[int, Tuple[str, int]], synced_at: Optional[datetime], generation: int):
+        self._partitions = partitions
+        self._locations = locations
+        self._synced_at = synced_at
+        self._generation = generation
+        
+    async def _build_hnsw(self):
+        """Build graphs for large partitions in a thread, attaching them on the loop"""
+        if hnswlib is None:
+            return
+        for kind, partition in list(self._partitions.items()):
+            if partition.hnsw is not None or partition.live < self.hnsw_threshold:
+                continue
+            built = len(partition)
+            index = await asyncio.to_thread(_build_graph, partition.matrix()[:built], self.dim)
+            if self._partitions.get(kind) is not partition:
+                # Replaced by a snapshot meanwhile; the next pass builds for the new one
+                continue
+            partition.attach_hnsw(index, built)
+            logger.info("Built HNSW graph", kind=kind, rows=len(partition))
+            
+    def stats(self) -> Dict[str, Any]:
+        """Index size and search latency"""
+        searches = self._stats["searches"]
+        return {
+            **{key: value for key, value in self._stats.items() if key != "search_seconds"},
+            "ready": self.ready,
+            "synced_at": self._synced_at.isoformat() if self._synced_at else None,
+            "generation": self._generation,
+            "partitions": {
+                kind: {"rows": partition.live, "tombstones": len(partition.deleted), "hnsw": partition.hnsw is not None}
+                for kind, partition in self._partitions.items()
+            },
+            "avg_search_ms": round(self._stats["search_seconds"] * 1000 / searches, 4) if searches else 0.0
+        }
+
+_shared_index: Optional[VectorIndex] = None
+
+def get_vector_index() -> VectorIndex:
+    """Process-wide index shared by every agent"""
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = VectorIndex.from_settings()
+    return _shared_index
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""
+Shared fixtures for the agent system tests
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import pytest
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules import each other both as `agents.agents.*` (package rooted one level
+# up) and as `services.*` / `config` (rooted at the agents directory)
+for path in (AGENTS_DIR, os.path.dirname(AGENTS_DIR)):
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
+
+AGENT_ID = "00000000-0000-0000-0000-00000000a9e1"
+
+class FakeResult:
+    """Minimal stand-in for a SQLAlchemy result"""
+    
+    def __init__(self, rows: Optional[List[Any]] = None, rowcount: Optional[int] = None):
+        self.rows = [self._row(row) for row in (rows or [])]
+        self.rowcount = len(self.rows) if rowcount is None else rowcount
+        
+    @staticmethod
+    def _row(row: Any) -> Any:
+        if isinstance(row, dict):
+            return SimpleNamespace(**row, _mapping=row)
+        return row
+        
+    def __iter__(self):
+        return iter(self.rows)
+        
+    def all(self) -> List[Any]:
+        return list(self.rows)
+        
+    def first(self) -> Any:
+        return self.rows[0] if self.rows else None
+        
+    def one_or_none(self) -> Any:
+        return self.first()
+        
+    def scalar_one(self) -> Any:
+        return self._scalar(self.rows[0])
+        
+    def scalar_one_or_none(self) -> Any:
+        return self._scalar(self.rows[0]) if self.rows else None
+        
+    def scalar(self) -> Any:
+        return self.scalar_one_or_none()
+        
+    def scalars(self) -> "FakeResult":
+        return FakeResult([self._scalar(row) for row in self.rows])
+        
+    @staticmethod
+    def _scalar(row: Any) -> Any:
+        if isinstance(row, SimpleNamespace):
+            return next(iter(row._mapping.values()))
+        return row
+
+class FakeSession:
+    """Async session double that records statements and answers them from
+    handlers matched on a fragment of the SQL text"""
+    
+    def __init__(self):
+        self.executed: List[Tuple[str, Dict[str, Any]]] = []
+        self.handlers: List[Tuple[str, Callable[[Dict[str, Any]], FakeResult]]] = []
+        self.commits = 0
+        self.rollbacks = 0
+        
+    def on(self, fragment: str, handler: Any):
+        """Answer statements containing `fragment` with a FakeResult, a list of
+        rows or a callable taking the bound parameters"""
+        if not callable(handler):
+            rows = handler
+            handler = lambda params: rows if isinstance(rows, FakeResult) else FakeResult(rows)
+        self.handlers.append((" ".join(fragment.split()), handler))
+        
+    def statements(self, fragment: str) -> List[Dict[str, Any]]:
+        """Parameters of every executed statement containing `fragment`"""
+        fragment = " ".join(fragment.split())
+        return [params for sql, params in self.executed if fragment in sql]
+        
+    async def execute(self, statement: Any, params: Optional[Dict[str, Any]] = None) -> FakeResult:
+        sql = " ".join(str(statement).split())
+        params = params or {}
+        self.executed.append((sql, params))
+        for fragment, handler in self.handlers:
+            if fragment in sql:
+                result = handler(params)
+                return result if isinstance(result, FakeResult) else FakeResult(result)
+        return FakeResult()
+        
+    async def commit(self):
+        self.commits += 1
+        
+    async def rollback(self):
+        self.rollbacks += 1
+        
+    async def close(self):
+        pass
+        
+    async def __aenter__(self) -> "FakeSession":
+        return self
+        
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+class ContentRow:
+    """One content piece whose UPDATE applies only if status and version still match.
+    
+    Each status in `interfere` is written by a concurrent writer between one
+    of our reads and the write that follows it.
+    """
+    
+    def __init__(self, session: FakeSession, status: str, interfere=None):
+        self.status = status
+        self.version = 1
+        self.interfere = interfere or []
+        self.writes = 0
+        session.on("SELECT status, version, agent_id, content_type", self.read)
+        session.on("UPDATE public.rltr_mktg_content_pieces", self.write)
+        
+    def read(self, params):
+        return [{"status": self.status, "version": self.version, "agent_id": AGENT_ID, "content_type": "flyer_text"}]
+        
+    def write(self, params):
+        if self.interfere:
+            self.status = self.interfere.pop(0)
+            self.version += 1
+        if (params["status"], params["version"]) != (self.status, self.version):
+            return []
+        self.status = params["target"]
+        self.version += 1
+        self.writes += 1
+        return [{"version": self.version}]
+
+@pytest.fixture
+def fake_session() -> FakeSession:
+    return FakeSession()
+
+@pytest.fixture
+def patch_session(monkeypatch, fake_session):
+    """Route get_session() in the given modules to the fake session"""
+    def apply(*modules):
+        async def get_session():
+            return fake_session
+        for module in modules:
+            monkeypatch.setattr(module, "get_session", get_session)
+        return fake_session
+    return apply
+
+class FakeRedis:
+    """In-memory subset of redis.asyncio used by the caches"""
+    
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        
+    async def get(self, key: str) -> Any:
+        return self.data.get(key)
+        
+    async def set(self, key: str, value: Any, ex: Optional[int] = None, get: bool = False) -> Any:
+        previous = self.data.get(key)
+        self.data[key] = value
+        return previous if get else True
+        
+    async def sadd(self, key: str, *members: Any) -> int:
+        self.data.setdefault(key, set()).update(members)
+        return len(members)
+        
+    async def smembers(self, key: str) -> set:
+        return set(self.data.get(key, set()))
+        
+    async def expire(self, key: str, seconds: int) -> bool:
+        return key in self.data
+        
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+        
+    async def aclose(self):
+        pass
+        
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.calls = []
+        
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+        
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+        
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+        
+    async def execute(self) -> List[Any]:
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
\ No newline at end of file
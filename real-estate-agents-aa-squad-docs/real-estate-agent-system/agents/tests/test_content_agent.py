@@ -0,0 +1,166 @@
+"""
+Tests for content generation caching and persistence in the Content Agent
+"""
+
+import uuid
+from decimal import Decimal
+import pytest
+import pytest_asyncio
+import agents.agents.base_agent as base_agent
+from agents.agents.content_agent import ContentAgent
+
+LISTING_ROW = {
+    "id": uuid.UUID("00000000-0000-0000-0000-000000000001"),
+    "source_id": "holiday_001",
+    "address": {"full_address": "123 Main St, Anytown, CA 90210", "street": "123 Main St"},
+    "price": Decimal("500000"),
+    "beds": 3,
+    "baths": 2,
+    "sqft": 1500,
+    "description": "Beautiful family home",
+    "key_features": ["Swimming Pool"],
+    "image_urls": [],
+    "status": "active"
+}
+
+class FakeLLM:
+    is_configured = True
+    
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+        
+    async def complete(self, messages, **params):
+        self.calls += 1
+        return self.replies.pop(0)
+
+@pytest_asyncio.fixture
+async def content_agent(patch_session):
+    agent = ContentAgent()
+    agent.generation_cache._redis = None
+    agent.semantic_cache.enabled = False
+    agent.llm_client = FakeLLM(['{"text": "Copy %d", "hashtags": ["home"]}' % n for n in range(10)])
+    await agent.initialize()
+    yield agent
+    agent._is_active = False
+
+@pytest.mark.asyncio
+async def test_load_listing_normalizes_row(content_agent, patch_session):
+    session = patch_session(base_agent)
+    session.on("FROM public.rltr_mktg_listings", [LISTING_ROW])
+    
+    listing = await content_agent.load_listing(str(LISTING_ROW["id"]))
+    
+    assert listing["id"] == str(LISTING_ROW["id"])
+    assert listing["price"] == 500000.0
+
+@pytest.mark.asyncio
+async def test_load_listing_raises_for_unknown_listing(content_agent, patch_session):
+    patch_session(base_agent)
+    
+    with pytest.raises(ValueError):
+        await content_agent.load_listing(str(uuid.uuid4()))
+
+@pytest.mark.asyncio
+async def test_generation_is_keyed_on_listing_content(content_agent, patch_session):
+    session = patch_session(base_agent)
+    session.on("RETURNING id", lambda params: [{"id": uuid.uuid4()}])
+    listing_id = str(LISTING_ROW["id"])
+    listing = {**LISTING_ROW, "id": listing_id, "price": 500000}
+    
+    first = await content_agent.generate_content(listing_id, "flyer_text", "agent", {"listing": listing})
+    again = await content_agent.generate_content(listing_id, "flyer_text", "agent", {"listing": dict(listing)})
+    changed = await content_agent.generate_content(
+        listing_id, "flyer_text", "agent", {"listing": {**listing, "description": "Renovated"}}
+    )
+    
+    assert (first["cache_hit"], again["cache_hit"], changed["cache_hit"]) == (False, True, False)
+    assert again["generated_content"] == first["generated_content"]
+    assert content_agent.llm_client.calls == 2
+
+@pytest.mark.asyncio
+async def test_generation_loads_listing_when_not_given(content_agent, patch_session):
+    session = patch_session(base_agent)
+    session.on("FROM public.rltr_mktg_listings", [LISTING_ROW])
+    session.on("RETURNING id", lambda params: [{"id": uuid.uuid4()}])
+    
+    await content_agent.generate_content(str(LISTING_ROW["id"]), "flyer_text", "agent")
+    
+    assert session.statements("FROM public.rltr_mktg_listings")
+
+@pytest.mark.asyncio
+async def test_placeholder_content_is_not_shared_semantically(content_agent, patch_session):
+    session = patch_session(base_agent)
+    session.on("RETURNING id", lambda params: [{"id": uuid.uuid4()}])
+    stored = []
+    
+    async def store(*args):
+        stored.append(args)
+        
+    content_agent.llm_client.is_configured = False
+    content_agent.semantic_cache.store = store
+    listing_id = str(LISTING_ROW["id"])
+    
+    await content_agent.generate_content(listing_id, "flyer_text", "agent", {"listing": {**LISTING_ROW, "id": listing_id}})
+    
+    assert stored == []    
+@pytest.mark.asyncio
+async def test_streamed_content_is_persisted_as_draft(content_agent, patch_session):
+    session = patch_session(base_agent)
+    piece_id = uuid.uuid4()
+    session.on("INSERT INTO public.rltr_mktg_content_pieces", [{"id": piece_id}])
+    content_agent.llm_client.is_configured = False
+    listing_id = str(LISTING_ROW["id"])
+    completed = []
+    
+    async def on_complete(result):
+        completed.append(result)
+        
+    events = [
+        event async for event in content_agent.stream_content(
+            listing_id, "flyer_text", "agent", {"listing": {**LISTING_ROW, "id": listing_id}}, on_complete
+        )
+    ]
+    
+    assert events[-1]["event"] == "complete"
+    assert events[-1]["data"]["content_piece_id"] == str(piece_id)
+    assert completed[0]["content_piece_id"] == str(piece_id)
+    insert, = session.statements("INSERT INTO public.rltr_mktg_content_pieces")
+    assert insert["listing_id"] == listing_id and insert["content_type"] == "flyer_text"
+    assert session.commits == 1
+
+@pytest.mark.asyncio
+async def test_variants_are_persisted_with_real_ids(content_agent, patch_session):
+    session = patch_session(base_agent)
+    session.on("INSERT INTO public.rltr_mktg_content_pieces", lambda params: [{"id": uuid.uuid4()}])
+    content_agent.llm_client = FakeLLM([
+        '{"flyer_text": {"text": "Flyer"}, "social_media_post:instagram": {"text": "Post"}}'
+    ])
+    listing_id = str(LISTING_ROW["id"])
+    
+    result = await content_agent.generate_content_variants(
+        listing_id, ["flyer_text", "social_media_post"], "agent", ["instagram"],
+        {"listing": {**LISTING_ROW, "id": listing_id}}
+    )
+    
+    ids = [piece["content_piece_id"] for piece in result["pieces"]]
+    assert len(ids) == len(set(ids)) == 2
+    assert all(uuid.UUID(piece_id) for piece_id in ids)
+    assert len(session.statements("INSERT INTO public.rltr_mktg_content_pieces")) == 2
+    assert result["llm_calls"] == 1
+
+@pytest.mark.asyncio
+async def test_multi_variant_reply_that_is_not_an_object_falls_back(content_agent, monkeypatch):
+    import agents.agents.content_agent as content_module
+    replies = iter([["not", "an", "object"], {"text": "Flyer"}, {"text": "Email"}])
+    monkeypatch.setattr(content_module, "extract_json", lambda reply: next(replies))
+    variants = [
+        ("flyer_text", "flyer_text", {}, "key-1"),
+        ("email_campaign", "email_campaign", {}, "key-2")
+    ]
+    
+    generated, llm_calls = await content_agent._call_llm_multi("1", LISTING_ROW, variants)
+    
+    assert generated["flyer_text"]["text"] == "Flyer"
+    assert generated["email_campaign"]["text"] == "Email"
+    assert llm_calls == 3
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Tests for compare-and-set content status transitions
+"""
+
+import pytest
+from conftest import FakeSession, ContentRow, AGENT_ID
+from services.content_state import (
+    transition, check_transition, sources_for, InvalidTransition, TransitionConflict,
+    DRAFT, PENDING_APPROVAL, APPROVED, REJECTED, POSTED, AWAITING_APPROVAL
+)
+
+def test_transition_table():
+    check_transition(DRAFT, PENDING_APPROVAL)
+    with pytest.raises(InvalidTransition):
+        check_transition(DRAFT, POSTED)
+    assert PENDING_APPROVAL in sources_for(APPROVED)
+
+@pytest.mark.asyncio
+async def test_transition_bumps_version():
+    session = FakeSession()
+    row = ContentRow(session, PENDING_APPROVAL)
+    
+    change = await transition(session, "piece", APPROVED, {"feedback": "ok", "status": "ignored"})
+    
+    assert (change.previous_status, change.status, change.version) == (PENDING_APPROVAL, APPROVED, 2)
+    assert change.changed and change.agent_id == AGENT_ID
+    update, = session.statements("UPDATE public.rltr_mktg_content_pieces")
+    assert update["feedback"] == "ok" and "ignored" not in update.values()
+
+@pytest.mark.asyncio
+async def test_transition_to_current_status_is_a_no_op():
+    session = FakeSession()
+    row = ContentRow(session, PENDING_APPROVAL)
+    
+    change = await transition(session, "piece", PENDING_APPROVAL)
+    
+    assert not change.changed and row.writes == 0
+
+@pytest.mark.asyncio
+async def test_conflicting_write_is_retried_against_the_new_status():
+    session = FakeSession()
+    # A draft is rejected by someone else before our approval request lands
+    row = ContentRow(session, DRAFT, interfere=[REJECTED])
+    
+    change = await transition(session, "piece", PENDING_APPROVAL)
+    
+    assert (change.previous_status, change.status) == (REJECTED, PENDING_APPROVAL)
+    assert len(session.statements("SELECT status, version")) == 2
+
+@pytest.mark.asyncio
+async def test_conflicting_write_is_revalidated():
+    session = FakeSession()
+    # A concurrent decision rejected the piece before our approval landed
+    row = ContentRow(session, PENDING_APPROVAL, interfere=[REJECTED])
+    
+    with pytest.raises(InvalidTransition):
+        await transition(session, "piece", APPROVED, allowed_from=AWAITING_APPROVAL)
+    assert row.status == REJECTED
+
+@pytest.mark.asyncio
+async def test_transition_gives_up_after_repeated_conflicts():
+    session = FakeSession()
+    row = ContentRow(session, PENDING_APPROVAL, interfere=[PENDING_APPROVAL] * 3)
+    
+    with pytest.raises(TransitionConflict):
+        await transition(session, "piece", APPROVED, max_attempts=3)
+    assert row.writes == 0
+
+@pytest.mark.asyncio
+async def test_transition_of_missing_piece():
+    session = FakeSession()
+    
+    with pytest.raises(ValueError):
+        await transition(session, "piece", APPROVED)
\ No newline at end of file
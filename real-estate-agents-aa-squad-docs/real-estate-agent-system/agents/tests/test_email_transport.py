@@ -0,0 +1,133 @@
+"""
+Tests for the pooled SMTP transport's bounce and throttle handling
+"""
+
+import time
+from email.message import EmailMessage
+import aiosmtplib
+import pytest
+import services.email_transport as email_transport
+from services.email_transport import SMTPTransport
+
+class FakeSMTP:
+    """Stands in for aiosmtplib.SMTP; `outcomes` are consumed one per send"""
+    
+    outcomes = []
+    opened = []
+    
+    def __init__(self, **options):
+        self.is_connected = False
+        self.resets = 0
+        FakeSMTP.opened.append(self)
+        
+    async def connect(self):
+        self.is_connected = True
+        
+    async def send_message(self, message):
+        outcome = FakeSMTP.outcomes.pop(0) if FakeSMTP.outcomes else {}
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome, "OK"
+        
+    async def rset(self):
+        self.resets += 1
+        
+    async def quit(self):
+        self.is_connected = False
+        
+    def close(self):
+        self.is_connected = False
+
+@pytest.fixture
+def transport(monkeypatch):
+    FakeSMTP.outcomes = []
+    FakeSMTP.opened = []
+    monkeypatch.setattr(email_transport.aiosmtplib, "SMTP", FakeSMTP)
+    bounces = []
+    
+    async def on_bounce(recipient, code, reason):
+        bounces.append((recipient, code))
+        
+    transport = SMTPTransport("smtp.example.com", sender="noreply@example.com", on_bounce=on_bounce)
+    transport.bounces = bounces
+    return transport
+
+def message(*recipients):
+    msg = EmailMessage()
+    msg["To"] = ", ".join(recipients or ["pat@example.com"])
+    msg["Subject"] = "Hello"
+    msg.set_content("Body")
+    return msg
+
+def refused(recipient, code):
+    return aiosmtplib.SMTPRecipientRefused(code, "refused", recipient)
+
+@pytest.mark.asyncio
+async def test_connections_are_reused(transport):
+    assert await transport.send(message()) == "sent"
+    assert await transport.send(message()) == "sent"
+    
+    assert len(FakeSMTP.opened) == 1
+    assert transport.stats()["sent"] == 2
+
+@pytest.mark.asyncio
+async def test_permanent_refusal_of_every_recipient_is_a_bounce(transport):
+    FakeSMTP.outcomes = [aiosmtplib.SMTPRecipientsRefused([refused("a@example.com", 550), refused("b@example.com", 551)])]
+    
+    assert await transport.send(message("a@example.com", "b@example.com")) == "bounced"
+    assert transport.bounces == [("a@example.com", 550), ("b@example.com", 551)]
+
+@pytest.mark.asyncio
+async def test_partial_permanent_refusal_bounces_only_that_recipient(transport):
+    FakeSMTP.outcomes = [{"b@example.com": aiosmtplib.SMTPResponse(550, "no such user")}]
+    
+    assert await transport.send(message("a@example.com", "b@example.com")) == "sent"
+    assert transport.bounces == [("b@example.com", 550)]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [
+    aiosmtplib.SMTPSenderRefused(550, "sender rejected", "noreply@example.com"),
+    aiosmtplib.SMTPResponseException(552, "message too large"),
+    aiosmtplib.SMTPResponseException(554, "transaction failed"),
+    aiosmtplib.SMTPDataError(554, "content rejected")
+])
+async def test_message_level_errors_are_raised_not_bounced(transport, error):
+    FakeSMTP.outcomes = [error]
+    
+    with pytest.raises(type(error)):
+        await transport.send(message())
+    assert transport.bounces == []
+    assert transport.stats()["bounced"] == 0
+
+@pytest.mark.asyncio
+async def test_temporary_refusal_throttles_and_raises(transport):
+    FakeSMTP.outcomes = [aiosmtplib.SMTPRecipientsRefused([refused("a@example.com", 450), refused("b@example.com", 550)])]
+    
+    with pytest.raises(aiosmtplib.SMTPRecipientsRefused):
+        await transport.send(message("a@example.com", "b@example.com"))
+    assert transport.bounces == []
+    assert transport._paused_until > time.monotonic()
+
+@pytest.mark.asyncio
+async def test_throttle_pauses_sending_without_a_rate(transport, monkeypatch):
+    FakeSMTP.outcomes = [aiosmtplib.SMTPResponseException(421, "slow down")]
+    sleeps = []
+    
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        transport._paused_until = 0.0
+        
+    monkeypatch.setattr(email_transport.asyncio, "sleep", sleep)
+    
+    with pytest.raises(aiosmtplib.SMTPResponseException):
+        await transport.send(message())
+    assert await transport.send(message()) == "sent"
+    assert sleeps and sleeps[0] > 0
+
+@pytest.mark.asyncio
+async def test_dropped_connection_is_retried_once(transport):
+    FakeSMTP.outcomes = [aiosmtplib.SMTPServerDisconnected("gone")]
+    
+    assert await transport.send(message()) == "sent"
+    assert len(FakeSMTP.opened) == 2
+    assert transport.stats()["reconnects"] == 1
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Tests for the micro-batched embedding service
+"""
+
+import asyncio
+import numpy as np
+import pytest
+import services.embedding_service as embedding_service
+from services.embedding_service import EmbeddingService, HashingEmbedder, LISTING_KIND
+from services.semantic_cache import hashing_embedding
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+        
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        return super().encode(texts)
+
+def test_hashing_embedder_matches_the_semantic_cache():
+    texts = ["three bed craftsman with a pool", ""]
+    
+    matrix = HashingEmbedder().encode(texts)
+    
+    assert np.allclose(matrix[0], hashing_embedding(texts[0]), atol=1e-6)
+    assert not matrix[1].any()
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_batch():
+    embedder = CountingEmbedder()
+    service = EmbeddingService(embedder=embedder, max_batch_size=64, max_wait_ms=5)
+    
+    vectors = await asyncio.gather(*(service.embed(f"listing {i}") for i in range(10)))
+    
+    assert len(embedder.batches) == 1 and len(embedder.batches[0]) == 10
+    assert len(vectors) == 10 and len(vectors[0]) == embedder.dim
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting():
+    embedder = CountingEmbedder()
+    service = EmbeddingService(embedder=embedder, max_batch_size=4, max_wait_ms=10000)
+    
+    await asyncio.wait_for(asyncio.gather(*(service.embed(f"listing {i}") for i in range(8))), timeout=1)
+    
+    assert [len(batch) for batch in embedder.batches] == [4, 4]
+
+@pytest.mark.asyncio
+async def test_duplicates_are_coalesced_then_cached():
+    embedder = CountingEmbedder()
+    service = EmbeddingService(embedder=embedder, max_wait_ms=1)
+    
+    await asyncio.gather(service.embed("same"), service.embed("same"))
+    await service.embed("same")
+    
+    assert embedder.batches == [["same"]]
+    stats = service.stats()
+    assert (stats["coalesced"], stats["cache_hits"]) == (1, 1)
+
+@pytest.mark.asyncio
+async def test_lru_evicts_the_oldest_vector():
+    service = EmbeddingService(cache_size=2, max_wait_ms=1)
+    
+    for text_value in ("a", "b", "a", "c"):
+        await service.embed(text_value)
+        
+    assert service.stats()["cached_vectors"] == 2
+    assert service._cache_get(embedding_service.content_hash("b")) is None
+
+@pytest.mark.asyncio
+async def test_embed_many_keeps_input_order():
+    embedder = CountingEmbedder()
+    service = EmbeddingService(embedder=embedder)
+    await service.embed_many(["b"])
+    
+    matrix = await service.embed_many(["a", "b", "c", "a"], batch_size=1)
+    
+    assert embedder.batches == [["b"], ["a"], ["c"]]
+    assert np.array_equal(matrix[0], matrix[3])
+    assert np.allclose(matrix[1], hashing_embedding("b"), atol=1e-6)
+
+@pytest.mark.asyncio
+async def test_store_inserts_one_statement(patch_session):
+    session = patch_session(embedding_service)
+    service = EmbeddingService()
+    
+    stored = await service.store(LISTING_KIND, [("l1", "first", {}), ("l2", "second", {"a": 1})])
+    
+    insert, = session.statements("INSERT INTO meta.embeddings")
+    assert stored == 2 and insert["ref_ids"] == ["l1", "l2"]
+    assert '"embedding_model": "hashing-v1"' in insert["metadata"][1]
+    assert session.commits == 1
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Tests for micro-batched engagement stream consumption
+"""
+
+import json
+import pytest
+from conftest import FakeRedis, AGENT_ID
+from services.engagement_stream import EngagementStreamConsumer
+
+STREAM = "engagements:ingest"
+
+class FakeStreamRedis(FakeRedis):
+    """FakeRedis plus the stream commands used by the consumer"""
+    
+    def __init__(self):
+        super().__init__()
+        self.entries = {}
+        self.acked = []
+        self.dead = []
+        self.pending = []
+        
+    async def exists(self, key: str) -> int:
+        return int(key in self.data)
+        
+    async def xack(self, stream: str, group: str, *entry_ids: str) -> int:
+        self.acked.extend(entry_ids)
+        return len(entry_ids)
+        
+    async def xdel(self, stream: str, *entry_ids: str) -> int:
+        return sum(1 for entry_id in entry_ids if self.entries.pop(entry_id, None) is not None)
+        
+    async def xadd(self, stream: str, fields):
+        self.dead.append(fields)
+        
+    async def xpending_range(self, stream, group, min, max, count, idle=None):
+        return self.pending
+        
+    async def xclaim(self, stream, group, consumer, min_idle_time, entry_ids):
+        return [(entry_id, self.entries.get(entry_id, {})) for entry_id in entry_ids]
+
+def entry(entry_id: str, event_id: str, listing_id: str = "listing-1", event=None):
+    fields = {
+        "event_id": event_id,
+        "agent_id": AGENT_ID,
+        "listing_id": listing_id,
+        "event": json.dumps(event or {"platform": "facebook", "type": "comment"})
+    }
+    return entry_id, fields
+
+@pytest.fixture
+def stream():
+    redis = FakeStreamRedis()
+    handled = []
+    failing = set()
+    
+    async def handler(agent_id, listing_id, events):
+        if listing_id in failing:
+            raise RuntimeError("handler failed")
+        handled.append((agent_id, listing_id, [event["event_id"] for event in events]))
+        
+    consumer = EngagementStreamConsumer(handler, "redis://localhost:6379", STREAM, "core", consumer="test")
+    consumer._redis = redis
+    return consumer, redis, handled, failing
+
+@pytest.mark.asyncio
+async def test_batch_is_deduplicated_and_grouped_per_listing(stream):
+    consumer, redis, handled, _ = stream
+    entries = [entry("1-0", "fb:1"), entry("2-0", "fb:2", "listing-2"), entry("3-0", "fb:1"), entry("4-0", "fb:3")]
+    
+    await consumer.process(entries)
+    
+    assert sorted(handled) == [
+        (AGENT_ID, "listing-1", ["fb:1", "fb:3"]),
+        (AGENT_ID, "listing-2", ["fb:2"])
+    ]
+    assert sorted(redis.acked) == ["1-0", "2-0", "3-0", "4-0"]
+    assert consumer.stats()["duplicates"] == 1
+
+@pytest.mark.asyncio
+async def test_events_seen_in_an_earlier_batch_are_skipped(stream):
+    consumer, redis, handled, _ = stream
+    await consumer.process([entry("1-0", "fb:1")])
+    
+    await consumer.process([entry("2-0", "fb:1"), entry("3-0", "fb:2")])
+    
+    assert [ids for _, _, ids in handled] == [["fb:1"], ["fb:2"]]
+    assert redis.acked == ["1-0", "2-0", "3-0"]
+
+@pytest.mark.asyncio
+async def test_malformed_and_deleted_entries_are_acknowledged(stream):
+    consumer, redis, handled, _ = stream
+    
+    await consumer.process([("1-0", {"event_id": "fb:1", "event": "{not json"}), ("2-0", {})])
+    
+    assert handled == [] and sorted(redis.acked) == ["1-0", "2-0"]
+
+@pytest.mark.asyncio
+async def test_failed_group_stays_pending_and_is_retried(stream):
+    consumer, redis, handled, failing = stream
+    failing.add("listing-2")
+    first, second = entry("1-0", "fb:1"), entry("2-0", "fb:2", "listing-2")
+    redis.entries.update([first, second])
+    
+    await consumer.process([first, second])
+    
+    assert redis.acked == ["1-0"] and "engagements:ingest:seen:fb:2" not in redis.data
+    assert consumer.stats()["failed_groups"] == 1
+    
+    failing.clear()
+    redis.pending = [{"message_id": "2-0", "times_delivered": 1}]
+    await consumer._reclaim()
+    
+    assert handled[-1] == (AGENT_ID, "listing-2", ["fb:2"])
+    assert redis.acked == ["1-0", "2-0"] and consumer.stats()["reclaimed"] == 1
+
+@pytest.mark.asyncio
+async def test_exhausted_entries_are_dead_lettered(stream):
+    consumer, redis, handled, _ = stream
+    dead = entry("1-0", "fb:1")
+    redis.entries.update([dead])
+    redis.pending = [{"message_id": "1-0", "times_delivered": consumer.max_deliveries}]
+    
+    await consumer._reclaim()
+    
+    assert handled == [] and redis.dead == [dead[1]]
+    assert redis.acked == ["1-0"] and consumer.stats()["dead_lettered"] == 1
\ No newline at end of file
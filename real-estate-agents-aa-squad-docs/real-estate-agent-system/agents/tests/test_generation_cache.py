@@ -0,0 +1,73 @@
+"""
+Tests for the tiered generation cache and listing fingerprints
+"""
+
+from decimal import Decimal
+import pytest
+from conftest import FakeRedis
+from services.generation_cache import GenerationCache
+
+LISTING = {
+    "id": "1",
+    "source_id": "holiday_001",
+    "address": {"full_address": "123 Main St, Anytown, CA 90210"},
+    "price": 500000,
+    "beds": 3,
+    "baths": 2,
+    "sqft": 1500,
+    "description": "Beautiful family home",
+    "key_features": ["Swimming Pool"],
+    "image_urls": [],
+    "status": "active"
+}
+
+def make_cache(redis=None) -> GenerationCache:
+    cache = GenerationCache(max_entries=8, ttl_seconds=60)
+    cache._redis = redis
+    return cache
+
+def test_fingerprint_ignores_numeric_representation():
+    from_database = {**LISTING, "price": Decimal("500000"), "updated_at": "2024-01-01"}
+    assert GenerationCache.listing_fingerprint(LISTING) == GenerationCache.listing_fingerprint(from_database)
+
+def test_fingerprint_changes_with_content():
+    changed = {**LISTING, "description": "Renovated family home"}
+    assert GenerationCache.listing_fingerprint(LISTING) != GenerationCache.listing_fingerprint(changed)
+
+@pytest.mark.asyncio
+async def test_get_or_generate_coalesces_and_caches():
+    cache = make_cache()
+    key = cache.make_key(GenerationCache.listing_fingerprint(LISTING), "flyer_text", "v1", {})
+    calls = []
+    
+    async def generate():
+        calls.append(1)
+        return {"text": "copy"}
+        
+    assert await cache.get_or_generate(key, generate, listing_id="1") == ({"text": "copy"}, False)
+    assert await cache.get_or_generate(key, generate, listing_id="1") == ({"text": "copy"}, True)
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_refresh_listing_uses_fingerprint_shared_in_redis():
+    redis = FakeRedis()
+    first = make_cache(redis)
+    key = first.make_key(GenerationCache.listing_fingerprint(LISTING), "flyer_text", "v1", {})
+    await first.set(key, {"text": "copy"}, listing_id="1")
+    assert await first.refresh_listing(LISTING) == 0
+    
+    # A restarted process (or another replica) has no in-memory fingerprints
+    second = make_cache(redis)
+    assert await second.refresh_listing(LISTING) == 0
+    assert await second.refresh_listing({**LISTING, "price": 450000}) == 1
+    assert key not in redis.data
+
+@pytest.mark.asyncio
+async def test_refresh_listing_without_redis_tracks_fingerprints_in_process():
+    cache = make_cache()
+    key = cache.make_key(GenerationCache.listing_fingerprint(LISTING), "flyer_text", "v1", {})
+    await cache.set(key, {"text": "copy"}, listing_id="1")
+    
+    assert await cache.refresh_listing(LISTING) == 0
+    assert await cache.refresh_listing({**LISTING, "beds": 4}) == 1
+    assert await cache.get(key) is None
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Tests for engagement scoring and lead notifications
+"""
+
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+import pytest_asyncio
+import agents.agents.base_agent as base_agent
+import agents.agents.lead_manager_agent as lead_manager_agent
+from agents.agents.lead_manager_agent import LeadManagerAgent
+from services.engagement_scorer import EngagementScorer
+
+class RecordingCounters:
+    def __init__(self):
+        self.deltas = []
+        
+    async def add(self, agent_id, **deltas):
+        self.deltas.append((agent_id, deltas))
+
+def test_score_ranks_intent_above_passive_engagement():
+    now = datetime.now().isoformat()
+    scores = EngagementScorer().score([
+        {"type": "view", "timestamp": now},
+        {"type": "comment", "text": "Is this still available? Can we tour?", "timestamp": now,
+         "history": ["liked 3 posts"], "user_profile": {"location": "Anytown"}}
+    ])
+    
+    assert scores.shape == (2,)
+    assert scores[1] > 0.5 > scores[0]
+
+def test_recency_decays_with_half_life():
+    scorer = EngagementScorer()
+    fresh, stale = scorer.features([
+        {"type": "like", "timestamp": datetime.now().isoformat()},
+        {"type": "like", "timestamp": (datetime.now() - timedelta(hours=24)).isoformat()}
+    ])[:, 2]
+    
+    assert fresh == pytest.approx(1.0, abs=1e-3)
+    assert stale == pytest.approx(0.5, abs=1e-3)
+
+def test_select_returns_top_fraction_best_first():
+    scores = np.array([0.9, 0.2, 0.7, 0.95, 0.6, 0.1, 0.8, 0.3, 0.4, 0.55])
+    
+    assert EngagementScorer().select(scores, fraction=0.3, min_score=0.5).tolist() == [3, 0, 6]
+
+def test_select_respects_min_score_and_max_count():
+    scores = np.array([0.9, 0.2, 0.7, 0.95])
+    scorer = EngagementScorer()
+    
+    assert scorer.select(scores, fraction=1.0, min_score=0.8).tolist() == [3, 0]
+    assert scorer.select(scores, fraction=1.0, min_score=0.5, max_count=1).tolist() == [3]
+    assert scorer.select(scores, fraction=1.0, min_score=0.99).tolist() == []
+    assert scorer.select(np.zeros(0), fraction=0.5).tolist() == []
+
+@pytest_asyncio.fixture
+async def lead_manager(monkeypatch):
+    counters = RecordingCounters()
+    monkeypatch.setattr(lead_manager_agent, "get_status_counters", lambda: counters)
+    agent = LeadManagerAgent()
+    agent.counters = counters
+    await agent.initialize()
+    yield agent
+    await agent.shutdown()
+
+@pytest.mark.asyncio
+async def test_strong_leads_create_one_notification(lead_manager, patch_session):
+    session = patch_session(base_agent)
+    notification_id = uuid.uuid4()
+    session.on("INSERT INTO public.rltr_mktg_notifications", [{"id": notification_id}])
+    now = datetime.now().isoformat()
+    events = [
+        {"event_id": str(n), "type": "message", "text": "What is the price? I'd like a showing", "timestamp": now,
+         "history": ["saved 5 listings"], "user_profile": {"location": "Anytown"}}
+        for n in range(3)
+    ] + [{"event_id": "passive", "type": "view", "timestamp": now}]
+    
+    result = await lead_manager.process_engagements("agent", str(uuid.uuid4()), events)
+    
+    assert [lead["event_id"] for lead in result["leads"]] == ["0", "1", "2"]
+    assert result["notification_id"] == str(notification_id)
+    insert, = session.statements("INSERT INTO public.rltr_mktg_notifications")
+    assert insert["message_text"] == "3 promising lead(s) from 4 new engagements"
+    assert session.commits == 1
+    assert lead_manager.counters.deltas == [("agent", {"unread_notifications": 1})]
+
+@pytest.mark.asyncio
+async def test_weak_engagement_does_not_notify(lead_manager, patch_session):
+    session = patch_session(base_agent)
+    
+    result = await lead_manager.process_engagements("agent", None, [{"type": "view"}])
+    
+    assert result["leads"] == [] and result["notification_id"] is None
+    assert session.executed == []
+    assert lead_manager.counters.deltas == []
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Tests for LLM record/replay
+"""
+
+import pytest
+from services.llm_cassette import Cassette, CassetteMiss, LatencyModel, RecordingProvider, ReplayProvider, request_key
+from services.llm_router import LLMRouter, StubProvider
+
+MESSAGES = [{"role": "user", "content": "Describe the listing"}]
+
+def replies(*texts):
+    remaining = list(texts)
+    return lambda provider, messages: remaining.pop(0)
+
+@pytest.mark.asyncio
+async def test_recordings_replay_in_order_after_reload(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    recorder = RecordingProvider(StubProvider("live", latency_seconds=0.0, reply=replies("first", "second")), Cassette(path))
+    await recorder.complete(MESSAGES, 0.7, 100)
+    await recorder.complete(MESSAGES, 0.7, 100)
+    
+    cassette = Cassette(path)
+    replay = ReplayProvider(cassette, LatencyModel("fixed", [0.0]))
+    
+    assert len(cassette) == 2 and cassette.route_ids() == ["live:stub-model"]
+    assert [await replay.complete(MESSAGES, 0.7, 100) for _ in range(3)] == ["first", "second", "first"]
+
+@pytest.mark.asyncio
+async def test_unrecorded_requests_miss(tmp_path):
+    replay = ReplayProvider(Cassette(str(tmp_path / "empty.jsonl")), LatencyModel("fixed", [0.0]))
+    
+    with pytest.raises(CassetteMiss):
+        await replay.complete(MESSAGES, 0.7, 100)
+        
+    replay.fallback_reply = "fallback"
+    assert await replay.complete(MESSAGES, 0.7, 100) == "fallback"
+    assert replay.counters == {"hits": 0, "misses": 2}
+
+@pytest.mark.asyncio
+async def test_replay_prefers_its_own_route(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"))
+    key = request_key(MESSAGES, 0.7, 100)
+    cassette.record(key, MESSAGES, "from openai", 0.1, "openai:gpt-4")
+    cassette.record(key, MESSAGES, "from anthropic", 0.2, "anthropic:claude")
+    
+    anthropic = ReplayProvider(cassette, LatencyModel("fixed", [0.0]), "anthropic", "claude")
+    other = ReplayProvider(cassette, LatencyModel("fixed", [0.0]), "portkey", "gpt-4")
+    
+    assert await anthropic.complete(MESSAGES, 0.7, 100) == "from anthropic"
+    assert await other.complete(MESSAGES, 0.7, 100) == "from openai"
+
+@pytest.mark.asyncio
+async def test_streams_are_recorded_and_replayed_word_by_word(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"))
+    recorder = RecordingProvider(StubProvider(latency_seconds=0.0, reply=replies("three bed home")), cassette)
+    recorded = [delta async for delta in recorder.stream(MESSAGES, 0.7, 100)]
+    
+    replay = ReplayProvider(cassette, LatencyModel("fixed", [0.0]))
+    replayed = [delta async for delta in replay.stream(MESSAGES, 0.7, 100)]
+    
+    assert "".join(replayed) == "".join(recorded) == "three bed home "
+    assert replayed[:2] == ["three ", "bed "]
+
+@pytest.mark.asyncio
+async def test_router_replays_with_hedging_intact(tmp_path):
+    cassette = Cassette(str(tmp_path / "cassette.jsonl"))
+    key = request_key(MESSAGES, 0.7, 800)
+    cassette.record(key, MESSAGES, "slow", 1.0, "slow:a")
+    cassette.record(key, MESSAGES, "fast", 0.01, "fast:b")
+    router = LLMRouter([
+        ReplayProvider(cassette, LatencyModel("recorded"), "slow", "a"),
+        ReplayProvider(cassette, LatencyModel("recorded"), "fast", "b")
+    ], default_hedge_delay=0.05)
+    
+    assert await router.complete(MESSAGES) == "fast"
+
+def test_latency_models_are_seeded():
+    first = LatencyModel.parse("lognormal:0.5,0.3", seed=7)
+    second = LatencyModel.parse("lognormal:0.5,0.3", seed=7)
+    
+    assert [first.sample() for _ in range(5)] == [second.sample() for _ in range(5)]
+    assert LatencyModel.parse("recorded", scale=0.5).sample(2.0) == 1.0
+    assert LatencyModel.parse("fixed:0.25").sample(9.0) == 0.25
+    with pytest.raises(ValueError):
+        LatencyModel.parse("uniform:1")
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Tests for hedged, failing-over LLM routing
+"""
+
+import pytest
+from services.llm_router import LLMRouter, StubProvider
+
+MESSAGES = [{"role": "user", "content": "Describe the listing"}]
+
+def named(provider, messages):
+    return provider.name
+
+def stub(name, **kwargs):
+    return StubProvider(name, model=kwargs.pop("model", "stub-model"), reply=named, seed=1, **kwargs)
+
+@pytest.mark.asyncio
+async def test_slow_route_is_hedged():
+    slow = stub("slow", latency_seconds=1.0)
+    fast = stub("fast", latency_seconds=0.01)
+    router = LLMRouter([slow, fast], default_hedge_delay=0.05)
+    
+    assert await router.complete(MESSAGES) == "fast"
+    
+    stats = router.stats()
+    assert stats["slow:stub-model"]["hedges"] == 1
+    assert stats["fast:stub-model"]["wins"] == 1
+    # The cancelled loser is neither a success nor an error
+    assert stats["slow:stub-model"]["requests"] == 0
+
+@pytest.mark.asyncio
+async def test_failed_route_fails_over_without_waiting_for_the_hedge():
+    broken = stub("broken", latency_seconds=0.01, failure_rate=1.0)
+    backup = stub("backup", latency_seconds=0.01)
+    router = LLMRouter([broken, backup], default_hedge_delay=5.0)
+    
+    assert await router.complete(MESSAGES) == "backup"
+    
+    stats = router.stats()
+    assert stats["broken:stub-model"]["failovers"] == 1
+    assert stats["broken:stub-model"]["errors"] == 1
+
+@pytest.mark.asyncio
+async def test_last_error_is_raised_when_every_route_fails():
+    router = LLMRouter([
+        stub("a", latency_seconds=0.0, failure_rate=1.0),
+        stub("b", latency_seconds=0.0, failure_rate=1.0)
+    ])
+    
+    with pytest.raises(ConnectionError, match="b:stub-model"):
+        await router.complete(MESSAGES)
+
+@pytest.mark.asyncio
+async def test_no_routes():
+    router = LLMRouter([])
+    
+    assert not router.is_configured
+    with pytest.raises(RuntimeError):
+        await router.complete(MESSAGES)
+
+def test_ranking_prefers_healthy_fast_routes_serving_the_model():
+    first = stub("first")
+    second = stub("second")
+    other = stub("other", model="other-model")
+    router = LLMRouter([first, second, other], min_samples=2)
+    
+    assert router._rank("other-model")[0] is other
+    
+    for _ in range(2):
+        router._stats[first.route_id].record(0.5, True)
+        router._stats[second.route_id].record(0.1, True)
+    assert router._rank(None)[:2] == [second, first]
+    
+    for _ in range(3):
+        router._stats[second.route_id].record(None, False)
+    assert router._rank(None)[-1] is second
+
+def test_hedge_delay_tracks_p95_once_warm():
+    route = stub("route")
+    router = LLMRouter([route], min_samples=3, default_hedge_delay=8.0, min_hedge_delay=0.05)
+    
+    assert router._hedge_delay(route) == 8.0
+    for latency in (0.01, 0.02, 0.3):
+        router._stats[route.route_id].record(latency, True)
+    assert router._hedge_delay(route) == 0.3
+
+@pytest.mark.asyncio
+async def test_stream_fails_over_before_the_first_token():
+    broken = stub("broken", latency_seconds=0.0, failure_rate=1.0)
+    backup = stub("backup", latency_seconds=0.0)
+    router = LLMRouter([broken, backup])
+    
+    deltas = [delta async for delta in router.stream(MESSAGES)]
+    
+    assert "".join(deltas).strip() == "backup"
+    assert router.stats()["broken:stub-model"]["failovers"] == 1
\ No newline at end of file
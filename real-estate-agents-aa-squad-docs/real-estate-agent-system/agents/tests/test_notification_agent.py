@@ -0,0 +1,227 @@
+"""
+Tests for notification delivery cycles in the Notification Agent
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+import pytest_asyncio
+import agents.agents.base_agent as base_agent
+import agents.agents.notification_agent as notification_agent_module
+from agents.agents.notification_agent import NotificationAgent
+from services.status_counters import StatusCounters
+
+AGENT_ID = uuid.uuid4()
+
+class FakePushRedis:
+    def __init__(self):
+        self.published = []
+        
+    async def publish(self, channel, message):
+        self.published.append(json.loads(message))
+        return 1
+        
+    async def aclose(self):
+        pass
+
+def notification(notification_type="system_alert", **fields):
+    return {
+        "id": uuid.uuid4(),
+        "agent_id": AGENT_ID,
+        "notification_type": notification_type,
+        "message_text": "Something happened",
+        "related_entity_id": None,
+        "created_at": datetime.now(timezone.utc),
+        "delivery_channels": {},
+        "delivery_attempts": 1,
+        **fields
+    }
+
+AGENT_ROW = {
+    "id": AGENT_ID,
+    "name": "Pat Agent",
+    "email": "pat@example.com",
+    "phone": None,
+    "notification_preferences": {"email": True, "push": True}
+}
+
+@pytest_asyncio.fixture
+async def notification_agent():
+    agent = NotificationAgent()
+    await agent._push_redis.aclose()
+    agent._push_redis = FakePushRedis()
+    agent.email_transport = None
+    await agent.initialize()
+    yield agent
+    await agent.shutdown()
+
+def recorded_outcomes(session):
+    return [outcome for params in session.statements("SET delivery_channels = n.delivery_channels || d.channels, delivery_status")
+            for outcome in json.loads(params["outcomes"])]
+
+@pytest.mark.asyncio
+async def test_delivery_cycle_records_every_channel(notification_agent, patch_session):
+    session = patch_session(base_agent)
+    claimed = [notification(), notification(delivery_channels={"email": "sent"})]
+    session.on("WITH claimable AS", claimed)
+    session.on("FROM public.rltr_mktg_agents", [AGENT_ROW])
+    
+    results = await notification_agent.process_pending_notifications()
+    
+    assert results["processed"] == 2 and results["failed"] == 0
+    assert (results["email_sent"], results["push_sent"]) == (1, 2)
+    agents_query, = session.statements("FROM public.rltr_mktg_agents")
+    assert agents_query["ids"] == [str(AGENT_ID)]
+    outcomes = {outcome["id"]: outcome for outcome in recorded_outcomes(session)}
+    assert outcomes[str(claimed[0]["id"])]["channels"] == {"email": "sent", "push": "sent"}
+    assert outcomes[str(claimed[1]["id"])]["channels"] == {"push": "sent"}
+    assert len(notification_agent._push_redis.published) == 2
+
+@pytest.mark.asyncio
+async def test_agent_details_are_cached_between_cycles(notification_agent, patch_session):
+    session = patch_session(base_agent)
+    batches = [[notification()], [notification()]]
+    session.on("WITH claimable AS", lambda params: batches.pop(0) if batches else [])
+    session.on("FROM public.rltr_mktg_agents", [AGENT_ROW])
+    
+    await notification_agent.process_pending_notifications()
+    await notification_agent.process_pending_notifications()
+    
+    assert len(session.statements("FROM public.rltr_mktg_agents")) == 1
+    notification_agent.invalidate_agent(str(AGENT_ID))
+    batches.append([notification()])
+    await notification_agent.process_pending_notifications()
+    assert len(session.statements("FROM public.rltr_mktg_agents")) == 2
+
+@pytest.mark.asyncio
+async def test_non_urgent_notifications_are_delivered_as_a_digest(notification_agent, patch_session):
+    session = patch_session(base_agent)
+    claimed = [notification("new_listing", message_text=f"Listing {n}") for n in range(3)]
+    session.on("WITH claimable AS", claimed)
+    session.on("FROM public.rltr_mktg_agents", [AGENT_ROW])
+    
+    results = await notification_agent.process_pending_notifications()
+    
+    assert (results["processed"], results["digests"]) == (3, 1)
+    push, = notification_agent._push_redis.published
+    assert push["event"]["count"] == 3
+    assert {outcome["id"] for outcome in recorded_outcomes(session)} == {str(item["id"]) for item in claimed}
+
+def as_rows(*rows):
+    return [SimpleNamespace(**row) for row in rows]
+
+def test_urgent_notifications_are_never_coalesced(notification_agent):
+    urgent = notification_agent_module.settings.notification_urgent_types[0]
+    other_agent = uuid.uuid4()
+    notifications = as_rows(
+        notification(urgent), notification(urgent),
+        notification("new_listing"), notification("new_listing", agent_id=other_agent), notification("new_listing")
+    )
+    
+    groups = notification_agent._coalesce(notifications)
+    
+    assert [len(group) for group in groups] == [1, 1, 2, 1]
+    assert {item.agent_id for item in groups[2]} == {AGENT_ID}
+
+def test_digest_lists_at_most_the_configured_items(notification_agent, monkeypatch):
+    monkeypatch.setattr(notification_agent_module.settings, "notification_digest_max_items", 2)
+    notifications = as_rows(*(notification("new_listing", message_text=f"Listing {n}") for n in range(5)))
+    
+    lines = notification_agent._render_digest(notifications).split("\n")
+    
+    assert lines[0].endswith("(5 updates)")
+    assert lines[1:] == ["- Listing 0", "- Listing 1", "...and 3 more"]
+
+def test_digest_channel_counts_as_sent_only_for_every_member():
+    members = as_rows(
+        notification("new_listing", delivery_channels={"email": "sent", "push": "sent"}),
+        notification("new_listing", delivery_channels={"email": "sent"})
+    )
+    
+    digest = notification_agent_module.NotificationDigest(members, "2 updates")
+    
+    assert digest.delivery_channels == {"email": "sent"}
+    assert digest.count == 2 and digest.id == members[0].id
+
+@pytest.mark.asyncio
+async def test_failed_channel_is_recorded_for_retry(notification_agent, patch_session):
+    session = patch_session(base_agent)
+    session.on("WITH claimable AS", [notification()])
+    session.on("FROM public.rltr_mktg_agents", [AGENT_ROW])
+    
+    async def broken_publish(channel, message):
+        raise ConnectionError("redis down")
+        
+    notification_agent._push_redis.publish = broken_publish
+    notification_agent.fanout.channels["push"].retries = 0
+    
+    results = await notification_agent.process_pending_notifications()
+    
+    assert results["failed"] == 1
+    outcome, = recorded_outcomes(session)
+    assert outcome["failed"] is True and outcome["channels"] == {"email": "sent", "push": "failed"}
+    
+@pytest.mark.asyncio
+async def test_slow_channel_renews_the_lease_and_keeps_sent_channels(notification_agent, patch_session, monkeypatch):
+    session = patch_session(base_agent)
+    monkeypatch.setattr(notification_agent_module.settings, "notification_delivery_progress_seconds", 0.01)
+    claimed = notification()
+    session.on("WITH claimable AS", [claimed])
+    session.on("FROM public.rltr_mktg_agents", [AGENT_ROW])
+    publish = notification_agent._push_redis.publish
+    
+    async def slow_publish(channel, message):
+        await asyncio.sleep(0.1)
+        return await publish(channel, message)
+        
+    notification_agent._push_redis.publish = slow_publish
+    
+    await notification_agent.process_pending_notifications()
+    
+    renewals = session.statements("delivery_claimed_until = now() + make_interval(secs => :lease_seconds) FROM")
+    assert renewals and json.loads(renewals[0]["outcomes"]) == [
+        {"id": str(claimed["id"]), "created_at": claimed["created_at"].isoformat(), "channels": {"email": "sent"}}
+    ]
+    assert renewals[0]["lease_seconds"] == notification_agent_module.settings.notification_delivery_lease_seconds
+    outcome, = recorded_outcomes(session)
+    assert outcome["channels"] == {"email": "sent", "push": "sent"}
+
+@pytest.mark.asyncio
+async def test_full_batches_are_claimed_until_the_backlog_drains(notification_agent, patch_session, monkeypatch):
+    session = patch_session(base_agent)
+    monkeypatch.setattr(notification_agent_module.settings, "notification_delivery_batch_size", 1)
+    batches = [[notification()], [notification()]]
+    session.on("WITH claimable AS", lambda params: batches.pop(0) if batches else [])
+    session.on("FROM public.rltr_mktg_agents", [AGENT_ROW])
+    
+    results = await notification_agent.process_pending_notifications()
+    
+    assert (results["batches"], results["processed"]) == (2, 2)
+    assert len(session.statements("WITH claimable AS")) == 3
+
+@pytest.mark.asyncio
+async def test_mark_read_decrements_unread_once(notification_agent, patch_session, monkeypatch):
+    session = patch_session(base_agent)
+    counters = StatusCounters()
+    monkeypatch.setattr(notification_agent_module, "get_status_counters", lambda: counters)
+    await counters.add(str(AGENT_ID), unread_notifications=1)
+    # The second call finds the notification already read
+    flips = iter([True, False])
+    session.on("SET is_read = true", lambda params: [{"agent_id": AGENT_ID}] if next(flips) else [])
+    session.on("SELECT 1 FROM public.rltr_mktg_notifications", [{"exists": 1}])
+    
+    await notification_agent.mark_notification_read(str(uuid.uuid4()))
+    await notification_agent.mark_notification_read(str(uuid.uuid4()))
+    
+    assert (await counters.get(str(AGENT_ID)))["unread_notifications"] == 0
+    assert counters.stats()["updates"] == 2
+
+@pytest.mark.asyncio
+async def test_mark_read_of_unknown_notification(notification_agent, patch_session):
+    patch_session(base_agent)
+    
+    with pytest.raises(ValueError):
+        await notification_agent.mark_notification_read(str(uuid.uuid4()))
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Tests for concurrent multi-channel notification fan-out
+"""
+
+import asyncio
+from types import SimpleNamespace
+import pytest
+from services.notification_fanout import Channel, NotificationFanout
+
+NOTIFICATION = SimpleNamespace(id="n1")
+
+class Provider:
+    """Send function with scripted failures and in-flight tracking"""
+    
+    def __init__(self, latency: float = 0.0, failures: int = 0):
+        self.latency = latency
+        self.failures = failures
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        
+    async def __call__(self, notification, agent):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("provider unavailable")
+        finally:
+            self.in_flight -= 1
+
+@pytest.mark.asyncio
+async def test_failed_send_is_retried():
+    provider = Provider(failures=1)
+    channel = Channel("email", provider, retries=2, retry_backoff=0.0)
+    
+    assert await channel.deliver(NOTIFICATION, None) == "sent"
+    
+    snapshot = channel.snapshot()
+    assert (snapshot["attempts"], snapshot["retries"], snapshot["sent"]) == (2, 1, 1)
+
+@pytest.mark.asyncio
+async def test_send_fails_after_the_last_retry():
+    provider = Provider(failures=5)
+    channel = Channel("sms", provider, retries=1, retry_backoff=0.0)
+    
+    assert await channel.deliver(NOTIFICATION, None) == "failed"
+    assert provider.calls == 2 and channel.snapshot()["failed"] == 1
+
+@pytest.mark.asyncio
+async def test_slow_send_times_out():
+    channel = Channel("push", Provider(latency=1.0), retries=0, timeout=0.05)
+    
+    assert await channel.deliver(NOTIFICATION, None) == "failed"
+    assert channel.snapshot()["timeouts"] == 1
+
+@pytest.mark.asyncio
+async def test_channel_pool_bounds_concurrency():
+    provider = Provider(latency=0.02)
+    channel = Channel("email", provider, concurrency=2)
+    
+    await asyncio.gather(*(channel.deliver(NOTIFICATION, None) for _ in range(6)))
+    
+    assert provider.peak == 2 and channel.snapshot()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_slow_channel_does_not_delay_the_others():
+    fanout = NotificationFanout({
+        "email": Channel("email", Provider(latency=0.2)),
+        "push": Channel("push", Provider()),
+        "sms": Channel("sms", Provider(failures=1), retries=0)
+    })
+    finished = []
+    
+    statuses = await fanout.deliver(
+        [(NOTIFICATION, None, ["email", "push"]), (NOTIFICATION, None, ["sms"])],
+        on_outcome=lambda index, name, status: finished.append((index, name, status))
+    )
+    
+    assert statuses == [{"email": "sent", "push": "sent"}, {"sms": "failed"}]
+    # Outcomes are reported as each send finishes, slowest last
+    assert finished[-1] == (0, "email", "sent")
+    assert set(fanout.stats()) == {"email", "push", "sms"}
\ No newline at end of file
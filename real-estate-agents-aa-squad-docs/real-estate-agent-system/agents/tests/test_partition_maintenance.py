@@ -0,0 +1,82 @@
+"""
+Tests for monthly partition creation and retention
+"""
+
+from contextlib import asynccontextmanager
+from datetime import date
+import pytest
+from conftest import FakeSession
+from database import connection
+from services.partition_maintenance import PartitionMaintainer, add_months, NOTIFICATIONS_TABLE, APPROVAL_LOGS_TABLE
+
+class FakeConnection(FakeSession):
+    def __init__(self, partitions):
+        super().__init__()
+        self.isolation_level = None
+        self.on("FROM pg_inherits", lambda params: [(name,) for name in partitions.get(params["name"], [])])
+        self.on("meta.create_monthly_partition", lambda params: [f"{params['table']}_p{params['month']:%Y%m}"])
+        
+    async def execution_options(self, isolation_level=None):
+        self.isolation_level = isolation_level
+        return self
+
+class FakeEngine:
+    def __init__(self, conn: FakeConnection):
+        self.conn = conn
+        self.transactions = 0
+        
+    @asynccontextmanager
+    async def begin(self):
+        self.transactions += 1
+        yield self.conn
+        
+    @asynccontextmanager
+    async def connect(self):
+        yield self.conn
+
+@pytest.fixture
+def engine(monkeypatch):
+    def install(partitions):
+        fake = FakeEngine(FakeConnection(partitions))
+        monkeypatch.setattr(connection, "engine", fake)
+        return fake
+    return install
+
+def test_add_months_crosses_years():
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+@pytest.mark.asyncio
+async def test_only_missing_months_are_created(engine):
+    fake = engine({"rltr_mktg_notifications": ["rltr_mktg_notifications_p202610", "rltr_mktg_notifications_default"]})
+    maintainer = PartitionMaintainer({NOTIFICATIONS_TABLE: 6}, months_ahead=2)
+    
+    created = await maintainer.ensure_partitions(date(2026, 10, 19))
+    
+    assert created == [f"{NOTIFICATIONS_TABLE}_p202611", f"{NOTIFICATIONS_TABLE}_p202612"]
+    assert fake.transactions == 1
+
+@pytest.mark.asyncio
+async def test_expired_partitions_are_detached_concurrently_and_dropped(engine):
+    fake = engine({
+        "rltr_mktg_notifications": ["rltr_mktg_notifications_p202607", "rltr_mktg_notifications_p202608"],
+        "rltr_mktg_approval_logs": ["rltr_mktg_approval_logs_p201901"]
+    })
+    maintainer = PartitionMaintainer({NOTIFICATIONS_TABLE: 2, APPROVAL_LOGS_TABLE: 0})
+    
+    retired = await maintainer.apply_retention(date(2026, 10, 19))
+    
+    assert retired == ["public.rltr_mktg_notifications_p202607"]
+    assert fake.conn.isolation_level == "AUTOCOMMIT"
+    assert fake.conn.statements(
+        f"ALTER TABLE {NOTIFICATIONS_TABLE} DETACH PARTITION public.rltr_mktg_notifications_p202607 CONCURRENTLY"
+    )
+    assert fake.conn.statements("DROP TABLE public.rltr_mktg_notifications_p202607")
+
+@pytest.mark.asyncio
+async def test_detached_partitions_can_be_kept_for_archiving(engine):
+    fake = engine({"rltr_mktg_notifications": ["rltr_mktg_notifications_p202501"]})
+    maintainer = PartitionMaintainer({NOTIFICATIONS_TABLE: 1}, drop_detached=False)
+    
+    assert await maintainer.apply_retention(date(2026, 10, 19)) == ["public.rltr_mktg_notifications_p202501"]
+    assert not fake.conn.statements("DROP TABLE")
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Tests for the token-bucket LLM rate limiter
+"""
+
+import asyncio
+import time
+import pytest
+from services.rate_limiter import (
+    TokenBucket, LLMRateLimiter, RateLimit, estimate_tokens, PRIORITY_HIGH, PRIORITY_LOW
+)
+
+def test_bucket_refills_continuously_up_to_capacity():
+    bucket = TokenBucket(rate=2.0, capacity=4.0)
+    bucket.updated = 0.0
+    
+    bucket.take(4, now=0.0)
+    assert bucket.wait_time(1, now=0.0) == 0.5
+    assert bucket.wait_time(1, now=0.5) == 0.0
+    assert bucket.wait_time(1, now=100.0) == 0.0
+    assert bucket.level == 4.0
+
+def test_oversized_requests_are_capped_at_capacity():
+    bucket = TokenBucket(rate=1.0, capacity=10.0)
+    bucket.updated = 0.0
+    
+    # A request larger than the bucket waits for a full bucket, not forever
+    assert bucket.wait_time(50, now=0.0) == 0.0
+    bucket.take(50, now=0.0)
+    assert bucket.level == 0.0
+
+def test_drain_blocks_for_the_given_seconds():
+    bucket = TokenBucket(rate=1.0, capacity=5.0)
+    bucket.updated = 0.0
+    
+    bucket.drain(3.0, now=0.0)
+    assert bucket.wait_time(1, now=0.0) == 4.0
+    assert bucket.wait_time(1, now=4.0) == 0.0
+
+def test_zero_rate_is_unlimited():
+    bucket = TokenBucket(rate=0.0, capacity=0.0)
+    
+    bucket.take(1000, now=0.0)
+    assert bucket.unlimited and bucket.wait_time(1000, now=0.0) == 0.0
+
+def test_estimate_tokens_reserves_the_completion():
+    messages = [{"role": "user", "content": "x" * 400}]
+    
+    assert estimate_tokens(messages, max_tokens=800) == 100 + 4 + 800
+
+def limiter(rpm: int = 600, tpm: int = 0) -> LLMRateLimiter:
+    # 10 requests a second with room for one at a time
+    return LLMRateLimiter(default_limit=RateLimit(rpm=rpm, tpm=tpm), headroom=1.0, burst_seconds=0.1)
+
+@pytest.mark.asyncio
+async def test_unconfigured_route_is_granted_immediately():
+    unlimited = LLMRateLimiter()
+    
+    await unlimited.acquire("openai:gpt-4", 1000)
+    
+    assert unlimited.stats()["routes"]["openai:gpt-4"]["granted"] == 1
+
+@pytest.mark.asyncio
+async def test_high_priority_callers_overtake_queued_batch_work():
+    rate_limiter = limiter()
+    await rate_limiter.acquire("route", 10)
+    granted = []
+    
+    async def acquire(name, priority):
+        await rate_limiter.acquire("route", 10, priority)
+        granted.append(name)
+        
+    await asyncio.gather(acquire("batch", PRIORITY_LOW), acquire("interactive", PRIORITY_HIGH))
+    
+    assert granted == ["interactive", "batch"]
+    assert rate_limiter.stats()["routes"]["route"]["waited"] == 2
+    await rate_limiter.close()
+
+@pytest.mark.asyncio
+async def test_per_route_limit_overrides_the_default():
+    rate_limiter = LLMRateLimiter(limits={"gpt-4": RateLimit(rpm=60)}, default_limit=RateLimit())
+    
+    await rate_limiter.acquire("other:model", 10)
+    
+    assert rate_limiter._route("openai:gpt-4").limit.rpm == 60
+    assert rate_limiter._route("other:model").limit.rpm == 0
+
+@pytest.mark.asyncio
+async def test_throttle_pauses_the_route():
+    rate_limiter = limiter()
+    rate_limiter.throttle("route", retry_after=0.2)
+    
+    started = time.monotonic()
+    await rate_limiter.acquire("route", 10)
+    
+    assert time.monotonic() - started >= 0.2
+    assert rate_limiter.stats()["routes"]["route"]["throttled"] == 1
+    await rate_limiter.close()
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Tests for reusing generations across similar listings
+"""
+
+import pytest
+import services.semantic_cache as semantic_cache
+from services.semantic_cache import SemanticContentCache
+
+SOURCE = {
+    "address": {"full_address": "1 Oak Ln, Anytown, CA", "street": "1 Oak Ln"},
+    "price": 500000,
+    "sqft": 1500,
+    "beds": 3,
+    "baths": 2,
+    "description": "Tract home with open floor plan"
+}
+
+TARGET = {
+    "address": {"full_address": "9 Elm Ct, Anytown, CA", "street": "9 Elm Ct"},
+    "price": 525000,
+    "sqft": 1600,
+    "beds": 3,
+    "baths": 2,
+    "description": "Tract home with open floor plan"
+}
+
+CONTENT = {
+    "text": "Welcome to 1 Oak Ln! 1,500 sq ft for $500,000.",
+    "hashtags": ["#1OakLn"],
+    "call_to_action": "Tour 1 Oak Ln today"
+}
+
+async def embed(text_value):
+    return semantic_cache.hashing_embedding(text_value)
+
+def make_cache() -> SemanticContentCache:
+    return SemanticContentCache(prompt_version="v1", similarity_threshold=0.9, embed=embed)
+
+def test_adapt_swaps_every_listing_detail():
+    adapted = SemanticContentCache.adapt(
+        CONTENT, SemanticContentCache.substitutions(SOURCE), SemanticContentCache.substitutions(TARGET)
+    )
+    
+    assert adapted["text"] == "Welcome to 9 Elm Ct! 1,600 sq ft for $525,000."
+    assert adapted["call_to_action"] == "Tour 9 Elm Ct today"
+
+def test_adapt_rejects_content_mentioning_details_the_target_lacks():
+    target = {**TARGET, "sqft": None}
+    
+    assert SemanticContentCache.adapt(
+        CONTENT, SemanticContentCache.substitutions(SOURCE), SemanticContentCache.substitutions(target)
+    ) is None
+
+def test_adapt_ignores_missing_details_the_content_does_not_use():
+    target = {**TARGET, "sqft": None}
+    content = {"text": "Welcome to 1 Oak Ln!"}
+    
+    assert SemanticContentCache.adapt(
+        content, SemanticContentCache.substitutions(SOURCE), SemanticContentCache.substitutions(target)
+    ) == {"text": "Welcome to 9 Elm Ct!"}
+
+@pytest.mark.asyncio
+async def test_lookup_counts_unadaptable_match_as_miss(patch_session):
+    session = patch_session(semantic_cache)
+    metadata = {
+        "listing_id": "source",
+        "generated_content": CONTENT,
+        "substitutions": SemanticContentCache.substitutions(SOURCE)
+    }
+    session.on("FROM meta.embeddings", [{"metadata": metadata, "similarity": 0.99}])
+    cache = make_cache()
+    
+    assert (await cache.lookup(TARGET, "flyer_text"))["text"].startswith("Welcome to 9 Elm Ct")
+    assert await cache.lookup({**TARGET, "sqft": None}, "flyer_text") is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+@pytest.mark.asyncio
+async def test_lookup_skips_listings_without_descriptive_data(patch_session):
+    session = patch_session(semantic_cache)
+    
+    assert await make_cache().lookup({"id": "1"}, "flyer_text") is None
+    assert session.executed == []
+
+@pytest.mark.asyncio
+async def test_store_skips_empty_generations(patch_session):
+    session = patch_session(semantic_cache)
+    session.on("INSERT INTO meta.embeddings", [{"id": 7}])
+    cache = make_cache()
+    
+    await cache.store("1", SOURCE, "flyer_text", None, {"text": "  ", "hashtags": []})
+    assert session.executed == []
+    
+    await cache.store("1", SOURCE, "flyer_text", None, CONTENT)
+    assert len(session.statements("INSERT INTO meta.embeddings")) == 1
+    assert cache.stats()["stores"] == 1
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+Tests for scheduled posting and failed-post counters
+"""
+
+import uuid
+import pytest
+import pytest_asyncio
+import agents.agents.base_agent as base_agent
+import agents.agents.social_media_agent as social_media_agent
+import services.status_counters as status_counters
+from agents.agents.social_media_agent import SocialMediaAgent
+from services.status_counters import StatusCounters
+
+AGENT_ID = str(uuid.uuid4())
+CONTENT_PIECE_ID = uuid.uuid4()
+
+@pytest_asyncio.fixture
+async def social_media(monkeypatch):
+    counters = StatusCounters()
+    monkeypatch.setattr(social_media_agent, "get_status_counters", lambda: counters)
+    agent = SocialMediaAgent()
+    agent.counters = counters
+    await agent.initialize()
+    yield agent
+    await agent.shutdown()
+
+def seed_post(session, previous_status, content_status="approved_for_posting"):
+    session.on("UPDATE public.rltr_mktg_post_schedule AS ps SET status = :status",
+               [{"content_piece_id": CONTENT_PIECE_ID, "previous_status": previous_status}])
+    session.on("SELECT status, version, agent_id, content_type",
+               [{"status": content_status, "version": 3, "agent_id": AGENT_ID, "content_type": "social_media_post"}])
+    session.on("RETURNING version", [{"version": 4}])
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("previous_status, success, failed_posts", [
+    ("sent", False, 1),
+    ("failed", True, 0),
+    ("failed", False, 1),
+    ("sent", True, 0)
+])
+async def test_record_post_result_applies_failed_post_delta(
+    social_media, patch_session, previous_status, success, failed_posts
+):
+    session = patch_session(base_agent)
+    await social_media.counters.add(AGENT_ID, failed_posts=1 if previous_status == "failed" else 0)
+    content_status = "posting_failed" if previous_status == "failed" else "approved_for_posting"
+    seed_post(session, previous_status, content_status)
+    
+    result = await social_media.record_post_result(str(uuid.uuid4()), success, error_message=None if success else "rate limited")
+    
+    assert result["status"] == ("success" if success else "failed")
+    counts = await social_media.counters.get(AGENT_ID)
+    assert counts["failed_posts"] == failed_posts
+    assert counts["unread_notifications"] == 1
+    notification, = session.statements("INSERT INTO public.rltr_mktg_notifications")
+    assert notification["notification_type"] == ("posting_success" if success else "posting_failed")
+    assert notification["related_entity_id"] == str(CONTENT_PIECE_ID)
+    assert session.commits == 1
+
+@pytest.mark.asyncio
+async def test_record_post_result_for_unknown_post(social_media, patch_session):
+    session = patch_session(base_agent)
+    
+    with pytest.raises(ValueError):
+        await social_media.record_post_result(str(uuid.uuid4()), True)
+    assert session.commits == 0
+
+@pytest.mark.asyncio
+async def test_process_scheduled_posts_records_every_outcome(social_media, patch_session, monkeypatch):
+    session = patch_session(base_agent)
+    posts = [{"id": uuid.uuid4(), "content_piece_id": CONTENT_PIECE_ID, "social_media_account_id": uuid.uuid4()}
+             for _ in range(2)]
+    session.on("FOR UPDATE SKIP LOCKED", posts)
+    seed_post(session, "sent")
+    
+    async def publish(post):
+        if post.id == posts[1]["id"]:
+            raise RuntimeError("token expired")
+        return "platform-1"
+        
+    monkeypatch.setattr(social_media, "_publish_post", publish)
+    
+    result = await social_media.process_scheduled_posts()
+    
+    assert result == {"claimed": 2, "posted": 1, "failed": 1}
+    recorded = session.statements("UPDATE public.rltr_mktg_post_schedule AS ps SET status = :status")
+    assert [(params["id"], params["status"]) for params in recorded] == [
+        (str(posts[0]["id"]), "success"), (str(posts[1]["id"]), "failed")
+    ]
+    assert recorded[1]["error_message"] == "token expired"
+    assert (await social_media.counters.get(AGENT_ID))["failed_posts"] == 1
+
+@pytest.mark.asyncio
+async def test_schedule_post_requires_approved_content(social_media, patch_session):
+    patch_session(base_agent)
+    
+    with pytest.raises(ValueError):
+        await social_media.schedule_post(str(CONTENT_PIECE_ID), str(uuid.uuid4()))
+
+@pytest.mark.asyncio
+async def test_reconcile_corrects_drifted_counters(patch_session):
+    session = patch_session(status_counters)
+    counters = StatusCounters()
+    await counters.add(AGENT_ID, failed_posts=3, unread_notifications=2)
+    other = str(uuid.uuid4())
+    await counters.add(other, pending_approvals=1)
+    session.on("FROM public.rltr_mktg_agents", [
+        {"agent_id": AGENT_ID, "pending_approvals": 0, "unread_notifications": 2, "failed_posts": 1},
+        {"agent_id": other, "pending_approvals": 1, "unread_notifications": 0, "failed_posts": 0}
+    ])
+    
+    assert await counters.reconcile() == {"agents": 2, "corrected": 1}
+    assert await counters.get(AGENT_ID) == {"pending_approvals": 0, "unread_notifications": 2, "failed_posts": 1}
+
+@pytest.mark.asyncio
+async def test_counters_never_report_negative_counts():
+    counters = StatusCounters()
+    await counters.add(AGENT_ID, failed_posts=-1)
+    
+    assert (await counters.get(AGENT_ID))["failed_posts"] == 0
\ No newline at end of file
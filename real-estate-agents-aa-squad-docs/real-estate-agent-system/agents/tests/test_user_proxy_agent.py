@@ -0,0 +1,199 @@
+"""
+Tests for the approval workflow in the User Proxy Agent
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+import pytest_asyncio
+import agents.agents.base_agent as base_agent
+import agents.agents.user_proxy_agent as user_proxy_agent
+from agents.agents.user_proxy_agent import UserProxyAgent, encode_cursor, decode_cursor
+from conftest import ContentRow, AGENT_ID
+from services.content_state import InvalidTransition
+from services.status_counters import StatusCounters
+
+def pending_rows(count, include_content=False):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for n in range(count):
+        row = {
+            "id": uuid.UUID(int=n + 1),
+            "content_type": "flyer_text",
+            "listing_id": None,
+            "created_at": start - timedelta(minutes=n)
+        }
+        if include_content:
+            row["generated_text"] = {"text": f"Copy {n}"}
+        rows.append(row)
+    return rows
+
+@pytest_asyncio.fixture
+async def user_proxy():
+    agent = UserProxyAgent()
+    await agent.initialize()
+    yield agent
+    await agent.shutdown()
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc)
+    content_piece_id = str(uuid.uuid4())
+    
+    assert decode_cursor(encode_cursor(created_at, content_piece_id)) == (created_at, content_piece_id)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+@pytest.mark.asyncio
+async def test_pending_approvals_pages_with_keyset_cursor(user_proxy, patch_session):
+    session = patch_session(base_agent)
+    session.on("status = 'pending_approval_agent'", pending_rows(3))
+    
+    page = await user_proxy.get_pending_approvals(AGENT_ID, limit=2)
+    
+    assert [item["content_piece_id"] for item in page["pending_approvals"]] == [
+        str(uuid.UUID(int=1)), str(uuid.UUID(int=2))
+    ]
+    assert page["has_more"] is True
+    assert decode_cursor(page["next_cursor"])[1] == str(uuid.UUID(int=2))
+    assert "generated_text" not in page["pending_approvals"][0]
+    
+    await user_proxy.get_pending_approvals(AGENT_ID, limit=2, cursor=page["next_cursor"])
+    sql, params = session.executed[-1]
+    assert "(created_at, id) < (:after_created_at, CAST(:after_id AS uuid))" in sql
+    assert params["after_id"] == str(uuid.UUID(int=2))
+
+@pytest.mark.asyncio
+async def test_pending_approvals_include_content_in_the_same_query(user_proxy, patch_session):
+    session = patch_session(base_agent)
+    session.on("status = 'pending_approval_agent'", pending_rows(1, include_content=True))
+    
+    page = await user_proxy.get_pending_approvals(AGENT_ID, include_content=True)
+    
+    assert page["pending_approvals"][0]["generated_text"] == {"text": "Copy 0"}
+    assert len(session.executed) == 1
+    assert "generated_text" in session.executed[0][0]
+
+@pytest.mark.asyncio
+async def test_approval_detail(user_proxy, patch_session):
+    session = patch_session(base_agent)
+    row = {**pending_rows(1, include_content=True)[0], "status": "pending_approval_agent", "feedback": None}
+    session.on("FROM public.rltr_mktg_content_pieces", [row])
+    
+    detail = await user_proxy.get_approval_detail(AGENT_ID, str(row["id"]))
+    
+    assert detail["generated_text"] == {"text": "Copy 0"}
+    assert detail["status"] == "pending_approval_agent"
+    assert session.statements("agent_id = CAST(:agent_id AS uuid)")[0]["agent_id"] == AGENT_ID
+
+@pytest.mark.asyncio
+async def test_approval_detail_not_found(user_proxy, patch_session):
+    patch_session(base_agent)
+    
+    with pytest.raises(ValueError):
+        await user_proxy.get_approval_detail(AGENT_ID, str(uuid.uuid4()))
+        
+@pytest.mark.asyncio
+async def test_approval_logs_and_notifies_in_the_transition_session(user_proxy, patch_session, monkeypatch):
+    session = patch_session(base_agent)
+    counters = StatusCounters()
+    monkeypatch.setattr(user_proxy_agent, "get_status_counters", lambda: counters)
+    ContentRow(session, "pending_approval_agent")
+    log_id = uuid.uuid4()
+    session.on("INSERT INTO public.rltr_mktg_approval_logs", [{"id": log_id}])
+    session.on("INSERT INTO public.rltr_mktg_notifications", [{"id": uuid.uuid4()}])
+    
+    result = await user_proxy.process_approval_response(str(uuid.uuid4()), AGENT_ID, True, "Looks great")
+    
+    assert result["status"] == "approved_for_posting"
+    assert result["approval_log_id"] == str(log_id)
+    log, = session.statements("INSERT INTO public.rltr_mktg_approval_logs")
+    assert (log["action_type"], log["feedback"]) == ("approved", "Looks great")
+    assert session.statements("INSERT INTO public.rltr_mktg_notifications")[0]["notification_type"] == "approval_processed"
+    assert session.commits == 1
+    assert (await counters.get(AGENT_ID))["unread_notifications"] == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_decision_conflict_writes_nothing(user_proxy, patch_session, monkeypatch):
+    session = patch_session(base_agent)
+    counters = StatusCounters()
+    monkeypatch.setattr(user_proxy_agent, "get_status_counters", lambda: counters)
+    # Another reviewer rejects the piece between our read and our write
+    row = ContentRow(session, "pending_approval_agent", interfere=["rejected"])
+    
+    with pytest.raises(InvalidTransition):
+        await user_proxy.process_approval_response(str(uuid.uuid4()), AGENT_ID, True)
+        
+    assert row.status == "rejected"
+    assert session.statements("INSERT INTO") == []
+    assert session.commits == 0
+    assert await counters.get(AGENT_ID) == {"pending_approvals": 0, "unread_notifications": 0, "failed_posts": 0}
+
+@pytest.mark.asyncio
+async def test_request_approval_counts_a_new_pending_piece(user_proxy, patch_session, monkeypatch):
+    session = patch_session(base_agent)
+    counters = StatusCounters()
+    monkeypatch.setattr(user_proxy_agent, "get_status_counters", lambda: counters)
+    ContentRow(session, "draft")
+    notification_id = uuid.uuid4()
+    session.on("INSERT INTO public.rltr_mktg_notifications", [{"id": notification_id}])
+    session.on("INSERT INTO public.rltr_mktg_approval_logs", [{"id": uuid.uuid4()}])
+    
+    result = await user_proxy.request_content_approval(str(uuid.uuid4()), AGENT_ID)
+    
+    assert result["notification_id"] == str(notification_id)
+    assert session.statements("INSERT INTO public.rltr_mktg_notifications")[0]["message_text"] == (
+        "New flyer_text content ready for approval"
+    )
+    assert session.commits == 1
+    assert (await counters.get(AGENT_ID))["pending_approvals"] == 1
+
+@pytest.mark.asyncio
+async def test_create_notification_for_unknown_agent(user_proxy, patch_session):
+    session = patch_session(base_agent)
+    
+    with pytest.raises(ValueError):
+        await user_proxy.create_notification(AGENT_ID, "system_alert", "Hello")
+    assert session.statements("INSERT INTO") == []
+
+@pytest.mark.asyncio
+async def test_approval_batch_applies_the_last_decision_per_piece(user_proxy, patch_session, monkeypatch):
+    session = patch_session(base_agent)
+    counters = StatusCounters()
+    monkeypatch.setattr(user_proxy_agent, "get_status_counters", lambda: counters)
+    await counters.add(AGENT_ID, pending_approvals=2)
+    approved, posted, missing = (uuid.UUID(int=n) for n in (1, 2, 3))
+    log_id = uuid.uuid4()
+    session.on("WITH decisions AS", [{
+        "id": approved, "status": "approved_for_posting", "previous_status": "pending_approval_agent",
+        "feedback": "ok", "approval_log_id": log_id
+    }])
+    session.on("SELECT id, status FROM public.rltr_mktg_content_pieces", [{"id": posted, "status": "posted"}])
+    
+    result = await user_proxy.process_approval_batch(AGENT_ID, [
+        {"content_piece_id": str(approved), "approved": False},
+        {"content_piece_id": str(approved).upper(), "approved": True, "feedback": "ok"},
+        {"content_piece_id": str(posted), "approved": True},
+        {"content_piece_id": str(missing), "approved": False},
+        {"content_piece_id": "not-a-uuid", "approved": True}
+    ])
+    
+    batch, = session.statements("WITH decisions AS")
+    assert batch["ids"] == [str(approved), str(posted), str(missing)]
+    assert batch["approved"] == [True, True, False]
+    assert [item["status"] for item in result["results"]] == [
+        "approved_for_posting", "approved_for_posting", "invalid_transition", "not_found", "invalid_id"
+    ]
+    assert result["results"][1]["approval_log_id"] == str(log_id)
+    assert result["results"][2]["current_status"] == "posted"
+    assert (result["approved"], result["rejected"], result["failed"]) == (1, 0, 3)
+    assert session.commits == 1
+    assert await counters.get(AGENT_ID) == {"pending_approvals": 1, "unread_notifications": 1, "failed_posts": 0}
+
+@pytest.mark.asyncio
+async def test_approval_batch_of_malformed_ids_skips_the_database(user_proxy, patch_session):
+    session = patch_session(base_agent)
+    
+    result = await user_proxy.process_approval_batch(AGENT_ID, [{"content_piece_id": None, "approved": True}])
+    
+    assert result["results"] == [{"content_piece_id": "None", "status": "invalid_id"}]
+    assert session.statements("WITH decisions AS") == []
@@ -0,0 +1,98 @@
+"""
+Tests for the in-process vector index mirror of meta.embeddings
+"""
+
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+import services.vector_index as vector_index
+from services.vector_index import VectorIndex
+
+KIND = "content_generation"
+
+def unit(*values):
+    return list(values) + [0.0] * (4 - len(values))
+
+def index_of(*rows, **kwargs) -> VectorIndex:
+    index = VectorIndex(dim=4, **kwargs)
+    for row_id, vector, metadata in rows:
+        index.add(row_id, KIND, str(row_id), metadata, vector)
+    return index
+
+def test_search_ranks_by_cosine_similarity():
+    index = index_of((1, unit(1, 0), {}), (2, unit(1, 1), {}), (3, unit(0, 1), {}))
+    
+    matches = index.search(unit(2, 0), KIND, k=2)
+    
+    assert [row["id"] for _, row in matches] == [1, 2]
+    assert matches[0][0] == pytest.approx(1.0)
+    assert index.search(unit(1), "listing") == []
+
+def test_where_filters_on_metadata():
+    index = index_of((1, unit(1, 0), {"beds": "3"}), (2, unit(1, 0.1), {"beds": "4"}))
+    
+    matches = index.search(unit(1, 0), KIND, k=1, where={"beds": "4"})
+    
+    assert [row["id"] for _, row in matches] == [2]
+
+def test_removed_rows_are_skipped():
+    index = index_of((1, unit(1, 0), {}), (2, unit(0, 1), {}))
+    
+    assert index.remove(1) and not index.remove(1)
+    
+    assert [row["id"] for _, row in index.search(unit(1, 0), KIND)] == [2]
+    assert index.stats()["partitions"][KIND] == {"rows": 1, "tombstones": 1, "hnsw": False}
+
+def test_delta_buffer_grows():
+    index = VectorIndex(dim=4)
+    for row_id in range(300):
+        index.add(row_id, KIND, None, {}, unit(1, row_id))
+        
+    assert index.search(unit(0, 1), KIND, k=1)[0][1]["id"] == 299
+
+def test_change_feed_replaces_updated_rows():
+    index = VectorIndex(dim=4)
+    index._apply(1, KIND, "a", {"v": 1}, unit(1, 0), "t1")
+    index._apply(1, KIND, "a", {"v": 2}, unit(0, 1), "t2")
+    
+    (score, row), = index.search(unit(0, 1), KIND, k=5)
+    
+    assert row["metadata"] == {"v": 2} and score == pytest.approx(1.0)
+
+def test_locally_added_row_adopts_the_feed_version():
+    index = index_of((1, unit(1, 0), {}))
+    
+    index._apply(1, KIND, "1", {}, unit(1, 0), "t1")
+    
+    assert index.stats()["partitions"][KIND]["tombstones"] == 0
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trip_compacts_tombstones(tmp_path):
+    index = index_of((1, unit(1, 0), {}), (2, unit(0, 1), {}), (3, unit(1, 1), {}), snapshot_dir=str(tmp_path))
+    index.remove(2)
+    
+    await index.snapshot()
+    
+    restored = VectorIndex(dim=4, snapshot_dir=str(tmp_path))
+    restored._install(*restored._read_snapshot())
+    assert restored.stats()["partitions"][KIND] == {"rows": 2, "tombstones": 0, "hnsw": False}
+    assert restored.search(unit(1, 0), KIND, k=1)[0][1]["id"] == 1
+    assert restored._generation == 1
+
+@pytest.mark.asyncio
+async def test_sync_applies_changes_and_tombstones(patch_session):
+    session = patch_session(vector_index)
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    session.on("SELECT now()", [now])
+    session.on("FROM meta.embeddings_deleted WHERE deleted_at >=", [{"id": 1}])
+    session.on("WHERE (updated_at, id) >", [
+        {"id": 2, "kind": KIND, "ref_id": "2", "metadata": {}, "updated_at": now, "embedding": "[0,1,0,0]"}
+    ])
+    index = index_of((1, unit(1, 0), {}))
+    index._synced_at = now
+    
+    applied = await index.sync()
+    
+    assert applied == 1
+    assert [row["id"] for _, row in index.search(unit(1, 1), KIND)] == [2]
+    assert session.commits == 1
\ No newline at end of file
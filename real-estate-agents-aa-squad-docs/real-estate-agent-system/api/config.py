@@ -14,6 +14,19 @@ class Settings(BaseSettings):
     ag2_core_url: str = os.getenv("AG2_CORE_URL", "http://localhost:8001")
     langflow_url: str = os.getenv("LANGFLOW_URL", "http://localhost:7860")
     
+    # Engagement ingestion: events are buffered in a Redis stream that the
+    # AG2 core consumes in micro-batches
+    engagement_stream: str = os.getenv("ENGAGEMENT_STREAM", "engagements:ingest")
+    engagement_max_events_per_request: int = int(os.getenv("ENGAGEMENT_MAX_EVENTS_PER_REQUEST", "1000"))
+    engagement_webhook_secret: str = os.getenv("ENGAGEMENT_WEBHOOK_SECRET", "")
+    
+    # Live notification push: the AG2 core publishes to this Redis channel;
+    # clients that fall more than push_max_pending events behind are dropped
+    push_channel: str = os.getenv("PUSH_CHANNEL", "notifications:push")
+    push_max_pending: int = int(os.getenv("PUSH_MAX_PENDING", "100"))
+    push_keepalive_seconds: float = float(os.getenv("PUSH_KEEPALIVE_SECONDS", "25"))
+    push_retry_ms: int = int(os.getenv("PUSH_RETRY_MS", "5000"))
+    
     # Security
     jwt_secret: str = os.getenv("JWT_SECRET", "your-secret-key-change-this-in-production")
     
@@ -0,0 +1,66 @@
+"""
+Engagement buffer - Durable hand-off of social engagement events from the
+gateway to the AG2 core through a Redis stream
+"""
+
+import hashlib
+import hmac
+import json
+from typing import List, Optional
+import redis.asyncio as redis
+import structlog
+from models import EngagementEvent
+from config import settings
+
+logger = structlog.get_logger()
+
+def event_id(event: EngagementEvent) -> str:
+    """Stable id for an event, so redelivered webhooks deduplicate downstream"""
+    if event.event_id:
+        return f"{event.platform}:{event.event_id}"
+    payload = json.dumps(
+        [event.platform, event.type, event.post_id, event.user_id, event.listing_id, event.text, event.timestamp],
+        default=str
+    )
+    return f"{event.platform}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+def verify_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Check a webhook body's hex HMAC-SHA256 against the shared secret"""
+    if not settings.engagement_webhook_secret or not signature:
+        return False
+    expected = hmac.new(settings.engagement_webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.removeprefix("sha256="))
+
+class EngagementBuffer:
+    """Appends events to a Redis stream.
+    
+    The stream is never trimmed here; the consumer deletes entries once they
+    are processed, so a spike only grows the backlog and nothing is dropped.
+    Enqueueing is a single pipelined round trip regardless of batch size.
+    """
+    
+    def __init__(self, redis_url: str, stream: str):
+        self.stream = stream
+        self._redis = redis.from_url(redis_url, decode_responses=True)
+        
+    async def enqueue(self, agent_id: str, events: List[EngagementEvent]) -> List[str]:
+        """Buffer events for an agent; returns their event ids"""
+        ids = []
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for event in events:
+                ids.append(event_id(event))
+                pipe.xadd(self.stream, {
+                    "event_id": ids[-1],
+                    "agent_id": agent_id,
+                    "listing_id": event.listing_id or "",
+                    "event": event.model_dump_json()
+                })
+            await pipe.execute()
+        return ids
+        
+    async def backlog(self) -> int:
+        """Events waiting in the stream"""
+        return await self._redis.xlen(self.stream)
+        
+    async def close(self):
+        await self._redis.aclose()
\ No newline at end of file
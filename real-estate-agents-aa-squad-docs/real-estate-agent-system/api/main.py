@@ -2,14 +2,20 @@
 API Gateway for Real Estate Agent Marketing System
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
+from pydantic import ValidationError
+import asyncio
 import httpx
 import structlog
 from database.connection import init_database
 from auth import get_current_user, create_access_token
+from engagements import EngagementBuffer, verify_signature
+from push import PushHub
 from models import *
 from config import settings
 
@@ -18,10 +24,16 @@ logger = structlog.get_logger()
 # Initialize HTTP client for AG2 communication
 ag2_client = None
 
+# Redis stream buffering engagement events for the AG2 core
+engagement_buffer = None
+
+# Live notification connections, fed from Redis pub/sub
+push_hub = None
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
-    global ag2_client
+    global ag2_client, engagement_buffer, push_hub
     
     try:
         # Initialize database
@@ -35,6 +47,11 @@ async def lifespan(app: FastAPI):
         )
         logger.info("AG2 client initialized")
         
+        engagement_buffer = EngagementBuffer(settings.redis_url, settings.engagement_stream)
+        
+        push_hub = PushHub(settings.redis_url, settings.push_channel, settings.push_max_pending)
+        push_hub.start()
+        
         yield
         
     except Exception as e:
@@ -44,6 +61,10 @@ async def lifespan(app: FastAPI):
         # Cleanup
         if ag2_client:
             await ag2_client.aclose()
+        if engagement_buffer:
+            await engagement_buffer.close()
+        if push_hub:
+            await push_hub.close()
         logger.info("Application shutdown complete")
 
 # Create FastAPI app
@@ -177,14 +198,143 @@ async def generate_content_for_listing(
         logger.error("Failed to generate content", error=str(e))
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/listings/{listing_id}/generate-content/stream")
+async def stream_content_for_listing(
+    listing_id: str,
+    content_request: ContentGenerationRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream marketing content for a listing as server-sent events"""
+    
+    async def relay():
+        try:
+            # Forward request to AG2 core and relay its event stream unchanged
+            async with ag2_client.stream(
+                "POST",
+                "/agents/generate-content/stream",
+                json={
+                    "listing_id": listing_id,
+                    "content_type": content_request.content_type,
+                    "agent_id": current_user.get("agent_id", "mock-agent-id")
+                },
+                timeout=httpx.Timeout(30.0, read=None)
+            ) as response:
+                if response.status_code != 200:
+                    yield 'event: error\ndata: {"detail": "Failed to generate content"}\n\n'
+                    return
+                    
+                async for chunk in response.aiter_raw():
+                    yield chunk
+                    
+        except httpx.RequestError as e:
+            logger.error("Failed to communicate with AG2 core", error=str(e))
+            yield 'event: error\ndata: {"detail": "Service unavailable"}\n\n'
+            
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/listings/{listing_id}/generate-content-variants")
+async def generate_content_variants_for_listing(
+    listing_id: str,
+    variants_request: ContentVariantsRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Generate several content types / platform posts for a listing in one pass"""
+    try:
+        # Forward request to AG2 core
+        response = await ag2_client.post(
+            "/agents/generate-content-variants",
+            json={
+                "listing_id": listing_id,
+                "content_types": variants_request.content_types,
+                "platforms": variants_request.platforms,
+                "agent_id": current_user.get("agent_id", "mock-agent-id")
+            }
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Failed to generate content variants"
+            )
+            
+    except httpx.RequestError as e:
+        logger.error("Failed to communicate with AG2 core", error=str(e))
+        raise HTTPException(status_code=503, detail="Service unavailable")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to generate content variants", error=str(e))
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# Dashboard endpoints
+@app.get("/dashboard/badges")
+async def get_dashboard_badges(current_user: dict = Depends(get_current_user)):
+    """Get pending approval, unread notification and failed post counts"""
+    try:
+        # Forward request to AG2 core
+        response = await ag2_client.get(
+            "/agents/status-counters",
+            params={"agent_id": current_user.get("agent_id", "mock-agent-id")}
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Failed to get dashboard badges"
+            )
+            
+    except httpx.RequestError as e:
+        logger.error("Failed to communicate with AG2 core", error=str(e))
+        raise HTTPException(status_code=503, detail="Service unavailable")
+
 # Content approval endpoints
 @app.get("/content/pending")
-async def get_pending_content(current_user: dict = Depends(get_current_user)):
-    """Get content pending approval"""
+async def get_pending_content(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_content: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a page of content pending approval; pass next_cursor for the next page"""
+    try:
+        # Forward request to AG2 core
+        params = {
+            "agent_id": current_user.get("agent_id", "mock-agent-id"),
+            "limit": limit,
+            "include_content": include_content
+        }
+        if cursor:
+            params["cursor"] = cursor
+        response = await ag2_client.get("/agents/pending-approvals", params=params)
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Failed to get pending content"
+            )
+            
+    except httpx.RequestError as e:
+        logger.error("Failed to communicate with AG2 core", error=str(e))
+        raise HTTPException(status_code=503, detail="Service unavailable")
+
+@app.get("/content/{content_id}")
+async def get_content_detail(content_id: str, current_user: dict = Depends(get_current_user)):
+    """Get one content piece, including its generated text"""
     try:
         # Forward request to AG2 core
         response = await ag2_client.get(
-            f"/agents/pending-approvals?agent_id={current_user.get('agent_id', 'mock-agent-id')}"
+            f"/agents/pending-approvals/{content_id}",
+            params={"agent_id": current_user.get("agent_id", "mock-agent-id")}
         )
         
         if response.status_code == 200:
@@ -192,7 +342,7 @@ async def get_pending_content(current_user: dict = Depends(get_current_user)):
         else:
             raise HTTPException(
                 status_code=response.status_code,
-                detail="Failed to get pending content"
+                detail="Failed to get content"
             )
             
     except httpx.RequestError as e:
@@ -230,6 +380,41 @@ async def approve_content(
         logger.error("Failed to communicate with AG2 core", error=str(e))
         raise HTTPException(status_code=503, detail="Service unavailable")
 
+@app.post("/content/approve-batch")
+async def approve_content_batch(
+    approval_batch: ContentApprovalBatch,
+    current_user: dict = Depends(get_current_user)
+):
+    """Approve or reject many content pieces in one request"""
+    try:
+        # Forward request to AG2 core
+        response = await ag2_client.post(
+            "/agents/approve-content/batch",
+            json={
+                "agent_id": current_user.get("agent_id", "mock-agent-id"),
+                "decisions": [
+                    {
+                        "content_piece_id": decision.content_id,
+                        "approved": decision.approved,
+                        "feedback": decision.feedback
+                    }
+                    for decision in approval_batch.decisions
+                ]
+            }
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Failed to process approvals"
+            )
+            
+    except httpx.RequestError as e:
+        logger.error("Failed to communicate with AG2 core", error=str(e))
+        raise HTTPException(status_code=503, detail="Service unavailable")
+
 # Social media account endpoints
 @app.get("/social-media/accounts")
 async def get_social_media_accounts(current_user: dict = Depends(get_current_user)):
@@ -277,6 +462,49 @@ async def add_social_media_account(
         logger.error("Failed to add social media account", error=str(e))
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# Engagement ingestion endpoints
+async def _buffer_engagements(agent_id: str, events: List[EngagementEvent]) -> dict:
+    """Append events to the engagement stream; processing happens asynchronously"""
+    if len(events) > settings.engagement_max_events_per_request:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.engagement_max_events_per_request} events per request"
+        )
+        
+    try:
+        event_ids = await engagement_buffer.enqueue(agent_id, events)
+        return {"status": "accepted", "accepted": len(event_ids), "event_ids": event_ids}
+        
+    except Exception as e:
+        # Surface the failure so the sender retries instead of losing events
+        logger.error("Failed to buffer engagement events", error=str(e))
+        raise HTTPException(status_code=503, detail="Service unavailable")
+
+@app.post("/engagements/ingest", status_code=status.HTTP_202_ACCEPTED)
+async def ingest_engagements(
+    ingest_request: EngagementIngestRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Accept a batch of social engagement events for lead processing"""
+    return await _buffer_engagements(current_user.get("agent_id", "mock-agent-id"), ingest_request.events)
+
+@app.post("/webhooks/engagements", status_code=status.HTTP_202_ACCEPTED)
+async def engagement_webhook(
+    request: Request,
+    x_webhook_signature: Optional[str] = Header(None)
+):
+    """Engagement webhook for platform integrations, signed with ENGAGEMENT_WEBHOOK_SECRET"""
+    body = await request.body()
+    if not verify_signature(body, x_webhook_signature):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature")
+        
+    try:
+        webhook = EngagementWebhookRequest.model_validate_json(body)
+    except ValidationError as e:
+        # Same 422 response as a malformed body on /engagements/ingest
+        raise RequestValidationError(e.errors(include_url=False))
+    return await _buffer_engagements(webhook.agent_id, webhook.events)
+
 # Notification endpoints
 @app.get("/notifications")
 async def get_notifications(
@@ -303,6 +531,89 @@ async def get_notifications(
         logger.error("Failed to get notifications", error=str(e))
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/notifications/stream")
+async def stream_notifications(current_user: dict = Depends(get_current_user)):
+    """Live notifications for the user as server-sent events"""
+    connection = push_hub.connect(current_user.get("agent_id", "mock-agent-id"))
+    
+    async def events():
+        try:
+            yield f"retry: {settings.push_retry_ms}\n\n"
+            while not connection.closed:
+                event = await connection.next_event(settings.push_keepalive_seconds)
+                # Comment lines keep proxies from closing an idle stream
+                yield f"event: notification\ndata: {event}\n\n" if event is not None else ": keepalive\n\n"
+        finally:
+            push_hub.disconnect(connection)
+            
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/notifications/ws")
+async def notifications_websocket(websocket: WebSocket, token: Optional[str] = None):
+    """Live notifications over a WebSocket; the bearer token may be passed as ?token="""
+    credentials = token or websocket.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    try:
+        current_user = await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=credentials))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+        
+    await websocket.accept()
+    connection = push_hub.connect(current_user.get("agent_id", "mock-agent-id"))
+    
+    async def watch_disconnect():
+        # Clients never send anything; reading only notices them leaving
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            connection.closed = True
+            connection.offer(None)  # wake the sender
+            
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while not connection.closed:
+            event = await connection.next_event(settings.push_keepalive_seconds)
+            if event is not None:
+                await websocket.send_text(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+        push_hub.disconnect(connection)
+
+@app.put("/notifications/preferences")
+async def update_notification_preferences(
+    preferences: NotificationPreferences,
+    current_user: dict = Depends(get_current_user)
+):
+    """Update which channels the user is notified on"""
+    try:
+        # Forward request to AG2 core
+        response = await ag2_client.post(
+            "/agents/notification-preferences",
+            json={
+                "agent_id": current_user.get("agent_id", "mock-agent-id"),
+                "preferences": preferences.model_dump(exclude_none=True)
+            }
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Failed to update notification preferences"
+            )
+            
+    except httpx.RequestError as e:
+        logger.error("Failed to communicate with AG2 core", error=str(e))
+        raise HTTPException(status_code=503, detail="Service unavailable")
+
 @app.post("/notifications/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
@@ -45,10 +45,22 @@ class ListingResponse(BaseModel):
 class ContentGenerationRequest(BaseModel):
     content_type: str  # social_media_post, flyer_text, property_description, email_campaign
 
+class ContentVariantsRequest(BaseModel):
+    content_types: List[str] = []
+    platforms: List[str] = []  # facebook, instagram, linkedin, twitter
+
 class ContentApproval(BaseModel):
     approved: bool
     feedback: Optional[str] = None
 
+class ContentDecision(BaseModel):
+    content_id: str
+    approved: bool
+    feedback: Optional[str] = None
+
+class ContentApprovalBatch(BaseModel):
+    decisions: List[ContentDecision]
+
 class ContentPieceResponse(BaseModel):
     id: str
     listing_id: str
@@ -79,6 +91,31 @@ class NotificationResponse(BaseModel):
     created_at: str
     related_entity_id: Optional[str] = None
 
+class NotificationPreferences(BaseModel):
+    email: Optional[bool] = None
+    push: Optional[bool] = None
+    sms: Optional[bool] = None
+
+# Engagement ingestion models
+class EngagementEvent(BaseModel):
+    event_id: Optional[str] = None  # platform event id; derived from the payload when missing
+    platform: str
+    type: str  # like, comment, share, save, message, click
+    listing_id: Optional[str] = None
+    post_id: Optional[str] = None
+    user_id: Optional[str] = None  # platform user who engaged
+    user_profile: Dict[str, Any] = {}
+    text: Optional[str] = None
+    history: List[str] = []
+    timestamp: Optional[str] = None
+
+class EngagementIngestRequest(BaseModel):
+    events: List[EngagementEvent]
+
+class EngagementWebhookRequest(BaseModel):
+    agent_id: str
+    events: List[EngagementEvent]
+
 # Post scheduling models
 class PostScheduleRequest(BaseModel):
     content_piece_id: str
@@ -0,0 +1,117 @@
+"""
+Push hub - Delivers notifications to connected dashboards over SSE and
+WebSocket, fanned out across gateway instances through Redis pub/sub
+"""
+
+import asyncio
+import json
+from typing import Dict, Any, Optional, Set
+import redis.asyncio as redis
+import structlog
+
+logger = structlog.get_logger()
+
+class PushConnection:
+    """One connected dashboard: a bounded queue of events waiting to be written"""
+    
+    def __init__(self, agent_id: str, max_pending: int):
+        self.agent_id = agent_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.closed = False
+        
+    def offer(self, event: str) -> bool:
+        """Queue an event without waiting; False if the client has fallen behind"""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+            
+    async def next_event(self, keepalive: float) -> Optional[str]:
+        """Next event, or None after `keepalive` seconds of silence"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), keepalive)
+        except asyncio.TimeoutError:
+            return None
+
+class PushHub:
+    """Registry of open dashboard connections per agent.
+    
+    The AG2 core publishes every push to one Redis channel. Each gateway
+    instance holds a single subscription and hands the message to the local
+    connections of that agent (a dict lookup), so an idle connection costs
+    only its queue and socket. A client that stops reading is disconnected
+    rather than buffered without bound; it can reload from /notifications.
+    """
+    
+    def __init__(self, redis_url: str, channel: str, max_pending: int = 100):
+        self.channel = channel
+        self.max_pending = max_pending
+        self._redis = redis.from_url(redis_url, decode_responses=True)
+        self._connections: Dict[str, Set[PushConnection]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._stats = {"received": 0, "delivered": 0, "dropped_connections": 0}
+        
+    def start(self):
+        self._listener = asyncio.create_task(self._listen())
+        
+    def connect(self, agent_id: str) -> PushConnection:
+        connection = PushConnection(agent_id, self.max_pending)
+        self._connections.setdefault(agent_id, set()).add(connection)
+        return connection
+        
+    def disconnect(self, connection: PushConnection):
+        connection.closed = True
+        connections = self._connections.get(connection.agent_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._connections[connection.agent_id]
+                
+    def dispatch(self, agent_id: str, event: str):
+        """Hand a serialized event to this instance's connections for the agent"""
+        for connection in list(self._connections.get(agent_id, ())):
+            if connection.offer(event):
+                self._stats["delivered"] += 1
+            else:
+                self._stats["dropped_connections"] += 1
+                logger.warning("Dropping slow push connection", agent_id=agent_id)
+                self.disconnect(connection)
+                
+    async def _listen(self):
+        """Relay messages from the Redis channel, resubscribing after errors"""
+        while True:
+            try:
+                async with self._redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        self._stats["received"] += 1
+                        payload = json.loads(message["data"])
+                        if payload.get("agent_id") in self._connections:
+                            self.dispatch(payload["agent_id"], json.dumps(payload["event"]))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Push subscription failed", error=str(e))
+                await asyncio.sleep(1)
+                
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "agents": len(self._connections),
+            "connections": sum(len(connections) for connections in self._connections.values()),
+            **self._stats
+        }
+        
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        for connections in list(self._connections.values()):
+            for connection in list(connections):
+                self.disconnect(connection)
+        await self._redis.aclose()
\ No newline at end of file
@@ -0,0 +1,13 @@
+"""
+Shared setup for the API gateway tests
+"""
+
+import os
+import sys
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Gateway modules import each other by bare name (`from push import PushHub`)
+if API_DIR in sys.path:
+    sys.path.remove(API_DIR)
+sys.path.insert(0, API_DIR)
\ No newline at end of file
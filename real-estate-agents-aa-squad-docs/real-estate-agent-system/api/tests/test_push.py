@@ -0,0 +1,97 @@
+"""
+Tests for the dashboard push hub
+"""
+
+import asyncio
+import json
+import pytest
+from push import PushHub
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = messages
+        self.channels = []
+        
+    async def __aenter__(self):
+        return self
+        
+    async def __aexit__(self, *exc_info):
+        return False
+        
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+        
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        await asyncio.Event().wait()
+
+class FakeRedis:
+    def __init__(self, messages):
+        self.pubsub_instance = FakePubSub(messages)
+        
+    def pubsub(self, ignore_subscribe_messages=False):
+        return self.pubsub_instance
+        
+    async def aclose(self):
+        pass
+
+def hub(max_pending: int = 100, messages=()) -> PushHub:
+    push_hub = PushHub("redis://localhost:6379", "notifications:push", max_pending=max_pending)
+    push_hub._redis = FakeRedis(list(messages))
+    return push_hub
+
+def test_events_reach_every_connection_of_the_agent():
+    push_hub = hub()
+    first, second, other = push_hub.connect("a1"), push_hub.connect("a1"), push_hub.connect("a2")
+    
+    push_hub.dispatch("a1", '{"id": 1}')
+    
+    assert first.queue.qsize() == second.queue.qsize() == 1 and other.queue.empty()
+    assert push_hub.stats() == {"agents": 2, "connections": 3, "received": 0, "delivered": 2, "dropped_connections": 0}
+
+def test_slow_connection_is_dropped():
+    push_hub = hub(max_pending=2)
+    slow = push_hub.connect("a1")
+    
+    for n in range(3):
+        push_hub.dispatch("a1", str(n))
+        
+    assert slow.closed and push_hub.stats()["agents"] == 0
+    assert push_hub.stats()["dropped_connections"] == 1
+
+def test_disconnect_forgets_the_agent():
+    push_hub = hub()
+    connection = push_hub.connect("a1")
+    
+    push_hub.disconnect(connection)
+    push_hub.dispatch("a1", "{}")
+    
+    assert connection.closed and connection.queue.empty()
+    assert push_hub.stats()["connections"] == 0
+
+@pytest.mark.asyncio
+async def test_next_event_returns_none_on_keepalive():
+    connection = hub().connect("a1")
+    
+    assert await connection.next_event(keepalive=0.01) is None
+    connection.offer("event")
+    assert await connection.next_event(keepalive=0.01) == "event"
+
+@pytest.mark.asyncio
+async def test_channel_messages_are_relayed_to_local_connections():
+    push_hub = hub(messages=[
+        {"type": "subscribe", "data": 1},
+        {"type": "message", "data": json.dumps({"agent_id": "elsewhere", "event": {"id": 1}})},
+        {"type": "message", "data": json.dumps({"agent_id": "a1", "event": {"id": 2}})}
+    ])
+    connection = push_hub.connect("a1")
+    push_hub.start()
+    
+    event = await connection.next_event(keepalive=1.0)
+    await push_hub.close()
+    
+    assert json.loads(event) == {"id": 2}
+    assert push_hub.stats()["received"] == 2
+    assert push_hub._redis.pubsub_instance.channels == ["notifications:push"]
+    assert connection.closed
\ No newline at end of file
@@ -18,7 +18,17 @@ CREATE TABLE meta.embeddings (
     id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
     created_at timestamp with time zone DEFAULT now() NOT NULL,
     content text NOT NULL,
-    embedding public.vector(384) NOT NULL
+    embedding public.vector(384) NOT NULL,
+    kind text DEFAULT 'generic' NOT NULL,
+    ref_id text,
+    metadata jsonb DEFAULT '{}'::jsonb NOT NULL,
+    updated_at timestamp with time zone DEFAULT now() NOT NULL
+);
+
+-- Ids of deleted embeddings, so in-process index mirrors can drop them
+CREATE TABLE meta.embeddings_deleted (
+    id bigint NOT NULL,
+    deleted_at timestamp with time zone DEFAULT now() NOT NULL
 );
 
 CREATE TABLE meta.migrations (
@@ -90,6 +100,7 @@ CREATE TABLE public.rltr_mktg_content_pieces (
     created_at timestamp with time zone DEFAULT now(),
     updated_at timestamp with time zone DEFAULT now(),
     last_approved_at timestamp with time zone,
+    version integer DEFAULT 0 NOT NULL,
     CONSTRAINT content_pieces_content_type_check CHECK (content_type IN ('social_media_post', 'flyer_text', 'email_campaign', 'property_description')),
     CONSTRAINT content_pieces_status_check CHECK (status IN ('draft', 'pending_approval_agent', 'pending_external_marketing_approval', 'approved_for_posting', 'rejected', 'pending_ai_revision', 'posted_successfully', 'posting_failed'))
 );
@@ -106,40 +117,95 @@ CREATE TABLE public.rltr_mktg_post_schedule (
     CONSTRAINT post_schedule_status_check CHECK (status IN ('pending', 'sent', 'success', 'failed', 'cancelled'))
 );
 
+-- Append-only tables are range partitioned by month (see
+-- meta.create_monthly_partition below); old months are detached/dropped
+-- by the AG2 core's partition maintenance
 CREATE TABLE public.rltr_mktg_approval_logs (
-    id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+    id uuid DEFAULT gen_random_uuid(),
     content_piece_id uuid REFERENCES public.rltr_mktg_content_pieces(id) ON DELETE CASCADE,
     agent_id uuid REFERENCES public.rltr_mktg_agents(id) ON DELETE CASCADE,
     action_type text NOT NULL,
-    timestamp timestamp with time zone DEFAULT now(),
+    timestamp timestamp with time zone DEFAULT now() NOT NULL,
     feedback text,
+    PRIMARY KEY (id, timestamp),
     CONSTRAINT approval_logs_action_type_check CHECK (action_type IN ('approved', 'rejected', 'requested_revisions', 'sent_to_marketing', 'recorded_marketing_approval'))
-);
+) PARTITION BY RANGE (timestamp);
 
 CREATE TABLE public.rltr_mktg_notifications (
-    id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+    id uuid DEFAULT gen_random_uuid(),
     agent_id uuid REFERENCES public.rltr_mktg_agents(id) ON DELETE CASCADE,
     notification_type text NOT NULL,
     message_text text NOT NULL,
     related_entity_id uuid,
     is_read boolean DEFAULT false,
-    created_at timestamp with time zone DEFAULT now()
-);
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    -- Delivery state: per-channel outcome ({"email": "sent", "sms": "failed"}),
+    -- overall status and the worker lease / retry time
+    delivery_status text DEFAULT 'pending' NOT NULL,
+    delivery_channels jsonb DEFAULT '{}'::jsonb NOT NULL,
+    delivery_attempts integer DEFAULT 0 NOT NULL,
+    delivery_claimed_until timestamp with time zone,
+    PRIMARY KEY (id, created_at),
+    CONSTRAINT notifications_delivery_status_check CHECK (delivery_status IN ('pending', 'sent', 'failed'))
+) PARTITION BY RANGE (created_at);
 
 -- Performance indexes
 CREATE INDEX idx_listings_status ON public.rltr_mktg_listings(status);
 CREATE INDEX idx_listings_updated_at ON public.rltr_mktg_listings(updated_at);
 CREATE INDEX idx_content_pieces_status ON public.rltr_mktg_content_pieces(status);
 CREATE INDEX idx_content_pieces_agent_id ON public.rltr_mktg_content_pieces(agent_id);
+-- Covers the paginated approval inbox (index-only scan, no generated_text)
+CREATE INDEX idx_content_pieces_agent_pending ON public.rltr_mktg_content_pieces(agent_id, status, created_at DESC, id DESC)
+    INCLUDE (content_type, listing_id);
 CREATE INDEX idx_post_schedule_scheduled_at ON public.rltr_mktg_post_schedule(scheduled_at);
 CREATE INDEX idx_notifications_agent_unread ON public.rltr_mktg_notifications(agent_id, is_read);
+-- Delivery queue: only undelivered rows, oldest first
+CREATE INDEX idx_notifications_delivery_pending ON public.rltr_mktg_notifications(created_at)
+    WHERE delivery_status = 'pending';
+-- Digest window check: oldest pending notification per agent and type
+CREATE INDEX idx_notifications_delivery_group ON public.rltr_mktg_notifications(agent_id, notification_type, created_at)
+    WHERE delivery_status = 'pending';
 CREATE INDEX idx_approval_logs_content_piece ON public.rltr_mktg_approval_logs(content_piece_id);
 
+-- Monthly partitions: <table>_pYYYYMM covering [first of month, first of next month)
+CREATE OR REPLACE FUNCTION meta.create_monthly_partition(parent_table text, month date)
+RETURNS text AS $$
+DECLARE
+    start_date date := date_trunc('month', month)::date;
+    partition_table text := parent_table || '_p' || to_char(start_date, 'YYYYMM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %s PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+        partition_table, parent_table, start_date, (start_date + interval '1 month')::date
+    );
+    RETURN partition_table;
+END;
+$$ language 'plpgsql';
+
+-- Current month plus three ahead; maintenance keeps extending this
+DO $$
+BEGIN
+    FOR i IN 0..3 LOOP
+        PERFORM meta.create_monthly_partition('public.rltr_mktg_approval_logs', (date_trunc('month', now()) + i * interval '1 month')::date);
+        PERFORM meta.create_monthly_partition('public.rltr_mktg_notifications', (date_trunc('month', now()) + i * interval '1 month')::date);
+    END LOOP;
+END $$;
+
 -- Vector search index for embeddings
 CREATE INDEX embeddings_embedding_idx ON meta.embeddings USING hnsw (embedding vector_cosine_ops);
+CREATE INDEX idx_embeddings_kind_ref ON meta.embeddings(kind, ref_id);
+CREATE INDEX idx_embeddings_updated ON meta.embeddings(updated_at, id);
+CREATE INDEX idx_embeddings_deleted_at ON meta.embeddings_deleted(deleted_at);
 
 -- Insert initial migration record
 INSERT INTO meta.migrations (version, name) VALUES ('202407160001', 'initial_schema');
+INSERT INTO meta.migrations (version, name) VALUES ('202410190001', 'embeddings_kind_metadata');
+INSERT INTO meta.migrations (version, name) VALUES ('202410200001', 'content_pieces_pending_index');
+INSERT INTO meta.migrations (version, name) VALUES ('202410200002', 'content_pieces_version');
+INSERT INTO meta.migrations (version, name) VALUES ('202410200003', 'monthly_partitions_logs_notifications');
+INSERT INTO meta.migrations (version, name) VALUES ('202410200004', 'notification_delivery_tracking');
+INSERT INTO meta.migrations (version, name) VALUES ('202410200005', 'notification_digest_index');
+INSERT INTO meta.migrations (version, name) VALUES ('202410200006', 'embeddings_change_tracking');
 
 -- Create a trigger to update updated_at timestamps
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -159,3 +225,17 @@ CREATE TRIGGER update_listings_updated_at BEFORE UPDATE ON public.rltr_mktg_list
 
 CREATE TRIGGER update_content_pieces_updated_at BEFORE UPDATE ON public.rltr_mktg_content_pieces 
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE TRIGGER update_embeddings_updated_at BEFORE UPDATE ON meta.embeddings 
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE OR REPLACE FUNCTION meta.record_embedding_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO meta.embeddings_deleted (id) VALUES (OLD.id);
+    RETURN OLD;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER record_embeddings_deleted AFTER DELETE ON meta.embeddings 
+    FOR EACH ROW EXECUTE FUNCTION meta.record_embedding_delete();
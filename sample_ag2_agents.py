@@ -4,17 +4,29 @@ Sample implementation of multi-agent architecture for real estate marketing auto
 """
 
 import os
+import sys
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Annotated, Dict, List, Any, Optional, Callable, Tuple
 from datetime import datetime, timedelta
 import json
+import hashlib
+from functools import lru_cache
+import string
+import textwrap
 
 import ag2
 from ag2 import ConversableAgent, UserProxyAgent, GroupChat, GroupChatManager
 import openai
 import requests
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+# Engagement triage shares the agent system's scorer
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "real-estate-agents-aa-squad-docs", "real-estate-agent-system", "agents"
+))
+from services.engagement_scorer import EngagementScorer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -55,22 +67,540 @@ class MarketingCampaign(BaseModel):
     budget: Optional[float] = None
     status: str = "draft"
 
+class PropertyAnalysis(BaseModel):
+    """Structured reply of a property analysis"""
+    key_selling_points: List[str] = []
+    target_buyer_personas: List[str] = []
+    competitive_price_context: str = ""
+    marketing_angles: List[str] = []
+    potential_concerns: List[str] = []
+
+class PlatformPostContent(BaseModel):
+    """Structured reply for one social media post"""
+    post_text: str = ""
+    hashtags: List[str] = []
+    best_posting_time: Optional[str] = None
+
+class EngagementAnalysis(BaseModel):
+    """Structured reply of an engagement lead analysis"""
+    lead_score: int = Field(0, ge=0, le=10)
+    interest_level: str = ""
+    recommended_actions: List[str] = []
+    best_contact_method: str = ""
+    timing: str = ""
+
+# Structured output
+@lru_cache(maxsize=None)
+def field_validators(model: type) -> Dict[str, TypeAdapter]:
+    """Per-field validators, built once per model, including Field() constraints"""
+    return {
+        name: TypeAdapter(Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation)
+        for name, field in model.model_fields.items()
+    }
+
+@lru_cache(maxsize=None)
+def schema_instructions(model: type) -> str:
+    """Prompt suffix constraining the reply to the model's JSON schema"""
+    return "Respond with only a JSON object matching this JSON schema:\n" + json.dumps(model.model_json_schema())
+
+def build_structured(model: type, data: Dict[str, Any]) -> BaseModel:
+    """Validate field by field, keeping every valid field and defaulting the rest"""
+    try:
+        return model.model_validate(data)
+    except ValidationError:
+        validators = field_validators(model)
+        values = {}
+        for name, value in data.items():
+            if name in validators:
+                try:
+                    values[name] = validators[name].validate_python(value)
+                except ValidationError:
+                    pass
+        return model.model_validate(values)
+
+class IncrementalJSONParser:
+    """Parses a JSON object from a reply as it streams in.
+    
+    Text before the first "{" and after the matching "}" is ignored, so
+    prose and code fences around the object do not matter. Each top-level
+    field is validated against `model` as soon as its value is complete,
+    and value() can turn a truncated reply into the complete part of the
+    object instead of failing.
+    """
+    
+    def __init__(self, model: Optional[type] = None):
+        self.validators = field_validators(model) if model is not None else {}
+        self.fields: Dict[str, Any] = {}
+        self.field_errors: Dict[str, str] = {}
+        self.started = False
+        self.complete = False
+        self._buffer: List[str] = []
+        self._stack: List[list] = []  # [bracket, expecting_key]
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._scalar = False
+        self._member_start = 1
+        self._last_cut = (0, "")
+    
+    def feed(self, chunk: str):
+        for char in chunk:
+            if self.complete:
+                return
+            if not self.started:
+                if char != "{":
+                    continue
+                self.started = True
+            self._consume(char)
+    
+    def _closers(self) -> str:
+        return "".join("}" if bracket == "{" else "]" for bracket, _ in reversed(self._stack))
+    
+    def _cut(self):
+        """The buffer so far ends with a complete value or an open bracket"""
+        self._last_cut = (len(self._buffer), self._closers())
+    
+    def _consume(self, char: str):
+        if self._in_string:
+            self._buffer.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if not self._string_is_key:
+                    self._cut()
+            return
+        
+        if self._scalar and (char in ",]}" or char.isspace()):
+            self._scalar = False
+            self._cut()
+        
+        self._buffer.append(char)
+        top = self._stack[-1] if self._stack else None
+        
+        if char == '"':
+            self._in_string = True
+            self._string_is_key = top is not None and top[0] == "{" and top[1]
+        elif char in "{[":
+            self._stack.append([char, char == "{"])
+            self._cut()
+        elif char in "}]":
+            self._stack.pop()
+            if len(self._stack) == 0:
+                self._member_done(len(self._buffer) - 1)
+                self.complete = True
+            self._cut()
+        elif char == ":":
+            top[1] = False
+        elif char == ",":
+            if top[0] == "{":
+                top[1] = True
+            if len(self._stack) == 1:
+                self._member_done(len(self._buffer) - 1)
+                self._member_start = len(self._buffer)
+        elif not char.isspace():
+            self._scalar = True
+    
+    def _member_done(self, end: int):
+        text = "".join(self._buffer[self._member_start:end]).strip()
+        if not text:
+            return
+        try:
+            member = json.loads("{" + text + "}")
+        except json.JSONDecodeError:
+            return
+        for name, value in member.items():
+            self.fields[name] = value
+            validator = self.validators.get(name)
+            if validator is not None:
+                try:
+                    validator.validate_python(value)
+                except ValidationError as e:
+                    self.field_errors[name] = str(e)
+    
+    def value(self, close_strings: bool = False) -> Dict[str, Any]:
+        """The object parsed so far.
+        
+        A truncated reply is cut back to its last complete value and closed
+        off; `close_strings` also keeps a string that is still streaming,
+        which suits live previews but not results.
+        """
+        if not self.started:
+            return {}
+        text = "".join(self._buffer)
+        candidates = [text] if self.complete else []
+        if close_strings and self._in_string and not self._string_is_key:
+            candidates.append(text.rstrip("\\") + '"' + self._closers())
+        if not self.complete:
+            position, closers = self._last_cut
+            candidates.append(text[:position] + closers)
+        
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except json.JSONDecodeError:
+                continue
+        return dict(self.fields)
+
+# Prompt templates
+try:
+    import tiktoken
+    _ENCODING = tiktoken.encoding_for_model("gpt-4")
+    
+    def count_tokens(text: str) -> int:
+        """Exact token count for the primary model"""
+        return len(_ENCODING.encode(text))
+except ImportError:
+    def count_tokens(text: str) -> int:
+        """Approximate token count (~4 characters per token) without tiktoken"""
+        return (len(text) + 3) // 4
+
+def _truncate_to_tokens(value: Any, max_tokens: int) -> str:
+    """Trim a list (whole items from the end) or text (at a word boundary) to a token budget"""
+    if isinstance(value, (list, tuple)):
+        kept, used = [], 0
+        for item in value:
+            item_tokens = count_tokens(f"{item}, ")
+            if used + item_tokens > max_tokens:
+                break
+            kept.append(str(item))
+            used += item_tokens
+        return ", ".join(kept)
+    
+    text = str(value)
+    if count_tokens(text) <= max_tokens:
+        return text
+    
+    words = text.split()
+    keep = len(words) * max_tokens // max(count_tokens(text), 1)
+    while keep > 0 and count_tokens(" ".join(words[:keep]) + " ...") > max_tokens:
+        keep -= 1
+    return " ".join(words[:keep]) + " ..." if keep else ""
+
+class PromptTemplate:
+    """A versioned prompt, parsed once with the token count of its static text precomputed
+    
+    With an `output_model`, the model's JSON schema is appended so replies
+    are constrained to it.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        version: str,
+        template: str,
+        truncatable: tuple = (),
+        max_tokens: int = 1500,
+        output_model: Optional[type] = None
+    ):
+        self.name = name
+        self.version = version
+        self.template = textwrap.dedent(template).strip()
+        self.truncatable = truncatable
+        self.max_tokens = max_tokens
+        self.output_model = output_model
+        if output_model is not None:
+            schema = schema_instructions(output_model).replace("{", "{{").replace("}", "}}")
+            self.template += "\n\n" + schema
+        
+        parsed = list(string.Formatter().parse(self.template))
+        self.fields = {field for _, field, _, _ in parsed if field}
+        self.static_tokens = count_tokens("".join(literal for literal, _, _, _ in parsed))
+    
+    @property
+    def key(self) -> str:
+        """Identifier used in cache keys; changes whenever the template version does"""
+        return f"{self.name}@{self.version}"
+    
+    def render(self, **values) -> str:
+        """Fill the template, truncating variable fields so the prompt fits max_tokens"""
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Prompt {self.key} is missing fields: {', '.join(sorted(missing))}")
+        
+        fixed = [field for field in self.fields if field not in self.truncatable]
+        budget = self.max_tokens - self.static_tokens - sum(count_tokens(str(values[field])) for field in fixed)
+        
+        # Smallest fields first, so budget they leave unused rolls over to larger ones
+        def size(field):
+            value = values[field]
+            return count_tokens(", ".join(map(str, value)) if isinstance(value, (list, tuple)) else str(value))
+        
+        pending = sorted(self.truncatable, key=size)
+        for index, field in enumerate(pending):
+            share = max(budget, 0) // (len(pending) - index)
+            values[field] = _truncate_to_tokens(values[field], share)
+            budget -= count_tokens(values[field])
+        
+        return self.template.format(**values)
+
+PROMPTS = {template.name: template for template in [
+    PromptTemplate("property_analysis", "v3", """
+        Analyze this property listing and provide marketing insights:
+        
+        Property Details:
+        - Address: {address}
+        - Price: ${price:,}
+        - Bedrooms: {bedrooms}
+        - Bathrooms: {bathrooms}
+        - Square Feet: {square_feet:,}
+        - Features: {features}
+        - Description: {description}
+        
+        Provide:
+        1. Key selling points (top 5)
+        2. Target buyer personas
+        3. Competitive price analysis context
+        4. Suggested marketing angles
+        5. Potential concerns to address
+    """, truncatable=("features", "description"), output_model=PropertyAnalysis),
+    
+    PromptTemplate("property_description", "v2", """
+        Create a compelling property description for {target_audience} buyers:
+        
+        Property: {address}
+        Price: ${price:,}
+        Bedrooms: {bedrooms}
+        Bathrooms: {bathrooms}
+        Square Feet: {square_feet:,}
+        Features: {features}
+        Listing Notes: {description}
+        
+        Requirements:
+        - 150-200 words
+        - Highlight unique features
+        - Create emotional connection
+        - Include call to action
+        - Ensure fair housing compliance
+        - Professional yet engaging tone
+    """, truncatable=("features", "description")),
+    
+    PromptTemplate("platform_post", "v3", """
+        Create {platform} post content for this property listing:
+        
+        Property: {address}
+        Price: ${price:,}
+        Key Features: {features}
+        
+        Platform Requirements:
+        - Maximum {max_chars} characters
+        - Platform: {platform}
+        - Include relevant hashtags
+        - Engaging and professional tone
+        - Include call to action
+        - 5-10 suggested hashtags and a best posting time recommendation
+    """, truncatable=("features",), max_tokens=800, output_model=PlatformPostContent),
+    
+    PromptTemplate("multi_platform_post", "v2", """
+        Create social media post content for this property listing on each platform below:
+        
+        Property: {address}
+        Price: ${price:,}
+        Key Features: {features}
+        
+        Platforms:
+        {requirements}
+        
+        For every platform:
+        - Include relevant hashtags (5-10)
+        - Engaging and professional tone
+        - Include call to action
+        
+        Respond with only a JSON object keyed by platform, where each value is
+        {{"post_text": "...", "hashtags": ["#..."], "best_posting_time": "..."}}
+    """, truncatable=("features",), max_tokens=800),
+    
+    PromptTemplate("marketing_strategy", "v2", """
+        Create a comprehensive marketing strategy for this property:
+        
+        Property: {address}
+        Price Range: ${price:,}
+        Property Type: {property_type}
+        Target Market: {target_market}
+        
+        Provide:
+        1. Platform recommendations (social media, websites, etc.)
+        2. Content types (photos, videos, virtual tours, etc.)
+        3. Timeline (posting frequency and duration)
+        4. Budget allocation suggestions
+        5. Success metrics to track
+        
+        Format as a structured marketing plan.
+    """, max_tokens=600),
+    
+    PromptTemplate("engagement_analysis", "v3", """
+        Analyze this social media engagement for lead potential:
+        
+        Engagement Data:
+        - Platform: {platform}
+        - Type: {engagement_type}
+        - User Profile: {user_profile}
+        - Content Engaged With: {content_type}
+        - Engagement History: {history}
+        - Message: {text}
+        
+        Provide:
+        1. Lead score (1-10)
+        2. Interest level assessment
+        3. Recommended follow-up actions
+        4. Best contact method
+        5. Timing recommendations
+    """, truncatable=("user_profile", "history", "text"), max_tokens=1200, output_model=EngagementAnalysis),
+    
+    PromptTemplate("follow_up_sequence", "v2", """
+        Create a follow-up sequence for this lead:
+        
+        Lead Profile:
+        - Interest Level: {interest_level}
+        - Preferred Contact: {preferred_contact}
+        - Property Interest: {property_interest}
+        - Lead Source: {source}
+        
+        Create 5 follow-up touchpoints with:
+        1. Timing (hours/days after initial contact)
+        2. Channel (email, SMS, social media)
+        3. Message content
+        4. Objective of each touchpoint
+    """, truncatable=("property_interest",), max_tokens=600),
+]}
+
+def property_fields(property_data: Dict[str, Any], max_features: Optional[int] = None) -> Dict[str, Any]:
+    """Listing values shared by the property prompts"""
+    features = property_data.get('features', [])
+    return {
+        "address": property_data.get('address', 'N/A'),
+        "price": property_data.get('price', 0),
+        "bedrooms": property_data.get('bedrooms', 0),
+        "bathrooms": property_data.get('bathrooms', 0),
+        "square_feet": property_data.get('square_feet', 0),
+        "features": features[:max_features] if max_features else features,
+        "description": property_data.get('description', ''),
+    }
+
+SYSTEM_MESSAGES = {role: textwrap.dedent(message).strip() for role, message in {
+    "listing_specialist": """
+        You are a real estate listing specialist with expertise in property analysis and description writing.
+        
+        Your responsibilities:
+        1. Analyze property data and extract key selling points
+        2. Generate compelling, accurate property descriptions
+        3. Ensure compliance with fair housing laws
+        4. Identify target market segments for each property
+        5. Coordinate with marketing team for content creation
+        
+        Always prioritize accuracy and legal compliance in all communications.
+    """,
+    
+    "marketing_coordinator": """
+        You are a real estate marketing coordinator specializing in digital marketing campaigns.
+        
+        Your responsibilities:
+        1. Design comprehensive marketing strategies for property listings
+        2. Create content calendars and campaign timelines
+        3. Coordinate with design and social media teams
+        4. Track campaign performance and ROI
+        5. Optimize marketing efforts based on data insights
+        
+        Focus on creating cohesive, multi-channel marketing campaigns that maximize property exposure.
+    """,
+    
+    "social_media_manager": """
+        You are a social media manager specializing in real estate marketing.
+        
+        Your responsibilities:
+        1. Create platform-specific content for Facebook, Instagram, LinkedIn, and other platforms
+        2. Schedule and publish posts at optimal times
+        3. Monitor engagement and respond to interactions
+        4. Manage hashtag strategies and audience targeting
+        5. Track social media metrics and performance
+        
+        Maintain professional branding while creating engaging, shareable content.
+    """,
+    
+    "content_creator": """
+        You are a content creation specialist for real estate marketing.
+        
+        Your responsibilities:
+        1. Generate visual content including flyers, social media graphics, and marketing materials
+        2. Write compelling copy for various platforms and audiences
+        3. Ensure brand consistency across all materials
+        4. Optimize content for different marketing channels
+        5. Create templates and reusable assets
+        
+        Focus on creating high-quality, professional content that converts prospects into leads.
+    """,
+    
+    "lead_manager": """
+        You are a lead management specialist for real estate.
+        
+        Your responsibilities:
+        1. Monitor and analyze social media engagement for lead signals
+        2. Score and qualify leads based on interaction patterns
+        3. Route qualified leads to appropriate sales agents
+        4. Design and implement lead nurturing sequences
+        5. Track lead conversion rates and optimize processes
+        
+        Prioritize identifying high-quality leads and ensuring they receive timely follow-up.
+    """,
+    
+    "engagement_specialist": """
+        You are a customer engagement specialist for real estate.
+        
+        Your responsibilities:
+        1. Respond to comments and messages across social media platforms
+        2. Provide helpful information to potential clients
+        3. Schedule follow-up activities and appointments
+        4. Escalate complex inquiries to human agents
+        5. Maintain positive brand presence through professional interactions
+        
+        Always be helpful, professional, and responsive while identifying opportunities for deeper engagement.
+    """,
+}.items()}
+
+DEFAULT_SYSTEM_MESSAGE = "You are a helpful real estate assistant."
+
+def build_config_list() -> List[Dict[str, Any]]:
+    """Provider configs in priority order; AG2 fails over to the next entry on errors"""
+    config_list = [{"model": "gpt-4", "api_key": os.getenv("OPENAI_API_KEY", "")}]
+    if os.getenv("ANTHROPIC_API_KEY"):
+        config_list.append({
+            "model": os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20241022"),
+            "api_key": os.getenv("ANTHROPIC_API_KEY"),
+            "api_type": "anthropic",
+        })
+    return config_list
+
+# Platforms generated at once when a campaign falls back to per-platform calls
+CAMPAIGN_MAX_CONCURRENCY = int(os.getenv("CAMPAIGN_MAX_CONCURRENCY", "4"))
+
+# Share of each engagement batch escalated to an LLM lead analysis, and the
+# LLM lead score (1-10) that earns a follow-up sequence
+LEAD_ESCALATION_FRACTION = float(os.getenv("LEAD_ESCALATION_FRACTION", "0.05"))
+LEAD_MIN_TRIAGE_SCORE = float(os.getenv("LEAD_MIN_TRIAGE_SCORE", "0.5"))
+LEAD_FOLLOW_UP_SCORE = int(os.getenv("LEAD_FOLLOW_UP_SCORE", "7"))
+# Upper bound on LLM analyses per batch, and on LLM calls in flight at once
+LEAD_MAX_ESCALATIONS = int(os.getenv("LEAD_MAX_ESCALATIONS", "50"))
+LEAD_MAX_CONCURRENCY = int(os.getenv("LEAD_MAX_CONCURRENCY", "4"))
+
+LLM_CONFIG = {
+    "temperature": 0.3,
+    "timeout": 120,
+    "max_tokens": 2000,
+}
+
 # Base Agent Class
 class RealEstateAgent(ConversableAgent):
     """Base class for all real estate agents"""
     
-    def __init__(self, name: str, role: str, **kwargs):
+    def __init__(self, name: str, role: str, generation_cache=None, llm_backend=None, **kwargs):
         system_message = self.get_system_message(role)
         
         super().__init__(
             name=name,
             system_message=system_message,
-            llm_config={
-                "model": "gpt-4",
-                "temperature": 0.3,
-                "timeout": 120,
-                "max_tokens": 2000,
-            },
+            llm_config={**LLM_CONFIG, "config_list": build_config_list()},
             max_consecutive_auto_reply=3,
             human_input_mode="NEVER",
             **kwargs
@@ -78,90 +608,99 @@ class RealEstateAgent(ConversableAgent):
         
         self.role = role
         self.logger = logging.getLogger(f"{__name__}.{name}")
+        # Optional cache with async get(key) / set(key, value, listing_id=...),
+        # e.g. services.generation_cache.GenerationCache from the agents package
+        self.generation_cache = generation_cache
+        # Optional backend with async complete(messages, temperature, max_tokens)
+        # used instead of AG2's own client, e.g. the record/replay providers in
+        # services.llm_cassette for offline benchmarks
+        self.llm_backend = llm_backend
+    
+    async def _generate(
+        self,
+        template_name: str,
+        listing_id: Optional[str] = None,
+        on_chunk: Optional[Callable[[str], None]] = None,
+        **values
+    ) -> str:
+        """Render a registered prompt and generate a reply, reusing a cached generation for an identical request
+        
+        `on_chunk` receives the reply as it streams in (in one piece when the
+        backend cannot stream or the reply is cached).
+        """
+        template = PROMPTS[template_name]
+        prompt = template.render(**values)
+        
+        if self.generation_cache is None:
+            return await self._complete(prompt, on_chunk)
+        
+        key_payload = json.dumps({
+            "role": self.role,
+            "template": template.key,
+            "llm_config": LLM_CONFIG,
+            "models": [config["model"] for config in build_config_list()],
+            "prompt": prompt
+        }, sort_keys=True)
+        cache_key = f"sample:{hashlib.sha256(key_payload.encode()).hexdigest()}"
+        
+        cached = await self.generation_cache.get(cache_key)
+        if cached is not None:
+            if on_chunk is not None:
+                on_chunk(cached["reply"])
+            return cached["reply"]
+        
+        reply = await self._complete(prompt, on_chunk)
+        await self.generation_cache.set(cache_key, {"reply": reply}, listing_id=listing_id)
+        return reply
+    
+    async def _complete(self, prompt: str, on_chunk: Optional[Callable[[str], None]] = None) -> str:
+        """Send one prompt to the configured backend"""
+        if self.llm_backend is None:
+            reply = await self.a_generate_reply(
+                messages=[{"role": "user", "content": prompt}],
+                sender=None
+            )
+        else:
+            messages = [{"role": "system", "content": self.system_message}, {"role": "user", "content": prompt}]
+            if on_chunk is not None and hasattr(self.llm_backend, "stream"):
+                chunks = []
+                async for delta in self.llm_backend.stream(messages, LLM_CONFIG["temperature"], LLM_CONFIG["max_tokens"]):
+                    on_chunk(delta)
+                    chunks.append(delta)
+                return "".join(chunks)
+            reply = await self.llm_backend.complete(messages, LLM_CONFIG["temperature"], LLM_CONFIG["max_tokens"])
+        
+        if on_chunk is not None:
+            on_chunk(reply)
+        return reply
+    
+    async def _generate_structured(
+        self,
+        template_name: str,
+        listing_id: Optional[str] = None,
+        **values
+    ) -> Tuple[Optional[BaseModel], str]:
+        """Generate a reply for a template with an output model and parse it
+        
+        Returns (structured result, raw reply). Invalid or truncated fields are
+        dropped rather than re-prompting; the result is None only when the
+        reply holds no JSON object at all.
+        """
+        model = PROMPTS[template_name].output_model
+        parser = IncrementalJSONParser(model)
+        reply = await self._generate(template_name, listing_id=listing_id, on_chunk=parser.feed, **values)
+        
+        if not parser.started:
+            return None, reply
+        if parser.field_errors:
+            self.logger.warning(f"{template_name} reply has invalid fields: {', '.join(parser.field_errors)}")
+        if not parser.complete:
+            self.logger.warning(f"{template_name} reply was truncated; keeping the complete fields")
+        return build_structured(model, parser.value()), reply
     
     def get_system_message(self, role: str) -> str:
         """Get role-specific system message"""
-        messages = {
-            "listing_specialist": """
-            You are a real estate listing specialist with expertise in property analysis and description writing.
-            
-            Your responsibilities:
-            1. Analyze property data and extract key selling points
-            2. Generate compelling, accurate property descriptions
-            3. Ensure compliance with fair housing laws
-            4. Identify target market segments for each property
-            5. Coordinate with marketing team for content creation
-            
-            Always prioritize accuracy and legal compliance in all communications.
-            """,
-            
-            "marketing_coordinator": """
-            You are a real estate marketing coordinator specializing in digital marketing campaigns.
-            
-            Your responsibilities:
-            1. Design comprehensive marketing strategies for property listings
-            2. Create content calendars and campaign timelines
-            3. Coordinate with design and social media teams
-            4. Track campaign performance and ROI
-            5. Optimize marketing efforts based on data insights
-            
-            Focus on creating cohesive, multi-channel marketing campaigns that maximize property exposure.
-            """,
-            
-            "social_media_manager": """
-            You are a social media manager specializing in real estate marketing.
-            
-            Your responsibilities:
-            1. Create platform-specific content for Facebook, Instagram, LinkedIn, and other platforms
-            2. Schedule and publish posts at optimal times
-            3. Monitor engagement and respond to interactions
-            4. Manage hashtag strategies and audience targeting
-            5. Track social media metrics and performance
-            
-            Maintain professional branding while creating engaging, shareable content.
-            """,
-            
-            "content_creator": """
-            You are a content creation specialist for real estate marketing.
-            
-            Your responsibilities:
-            1. Generate visual content including flyers, social media graphics, and marketing materials
-            2. Write compelling copy for various platforms and audiences
-            3. Ensure brand consistency across all materials
-            4. Optimize content for different marketing channels
-            5. Create templates and reusable assets
-            
-            Focus on creating high-quality, professional content that converts prospects into leads.
-            """,
-            
-            "lead_manager": """
-            You are a lead management specialist for real estate.
-            
-            Your responsibilities:
-            1. Monitor and analyze social media engagement for lead signals
-            2. Score and qualify leads based on interaction patterns
-            3. Route qualified leads to appropriate sales agents
-            4. Design and implement lead nurturing sequences
-            5. Track lead conversion rates and optimize processes
-            
-            Prioritize identifying high-quality leads and ensuring they receive timely follow-up.
-            """,
-            
-            "engagement_specialist": """
-            You are a customer engagement specialist for real estate.
-            
-            Your responsibilities:
-            1. Respond to comments and messages across social media platforms
-            2. Provide helpful information to potential clients
-            3. Schedule follow-up activities and appointments
-            4. Escalate complex inquiries to human agents
-            5. Maintain positive brand presence through professional interactions
-            
-            Always be helpful, professional, and responsive while identifying opportunities for deeper engagement.
-            """
-        }
-        
-        return messages.get(role, "You are a helpful real estate assistant.")
+        return SYSTEM_MESSAGES.get(role, DEFAULT_SYSTEM_MESSAGE)
 
 # Specialized Agent Implementations
 class ListingSpecialistAgent(RealEstateAgent):
@@ -173,66 +712,27 @@ class ListingSpecialistAgent(RealEstateAgent):
     async def analyze_property(self, property_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze property data and extract marketing insights"""
         
-        analysis_prompt = f"""
-        Analyze this property listing and provide marketing insights:
-        
-        Property Details:
-        - Address: {property_data.get('address', 'N/A')}
-        - Price: ${property_data.get('price', 0):,}
-        - Bedrooms: {property_data.get('bedrooms', 0)}
-        - Bathrooms: {property_data.get('bathrooms', 0)}
-        - Square Feet: {property_data.get('square_feet', 0):,}
-        - Features: {', '.join(property_data.get('features', []))}
-        
-        Provide:
-        1. Key selling points (top 5)
-        2. Target buyer personas
-        3. Competitive price analysis context
-        4. Suggested marketing angles
-        5. Potential concerns to address
-        
-        Format as JSON with clear sections.
-        """
-        
-        response = await self.a_generate_reply(
-            messages=[{"role": "user", "content": analysis_prompt}],
-            sender=None
+        analysis, _ = await self._generate_structured(
+            "property_analysis",
+            listing_id=property_data.get('id'),
+            **property_fields(property_data)
         )
         
-        try:
-            # Parse the JSON response
-            analysis = json.loads(response)
-            self.logger.info(f"Property analysis completed for {property_data.get('address')}")
-            return analysis
-        except json.JSONDecodeError:
+        if analysis is None:
             self.logger.error("Failed to parse property analysis response")
             return {"error": "Failed to analyze property"}
+        
+        self.logger.info(f"Property analysis completed for {property_data.get('address')}")
+        return analysis.model_dump()
     
     async def generate_description(self, property_data: Dict[str, Any], target_audience: str = "general") -> str:
         """Generate compelling property description"""
         
-        description_prompt = f"""
-        Create a compelling property description for {target_audience} buyers:
-        
-        Property: {property_data.get('address')}
-        Price: ${property_data.get('price', 0):,}
-        Bedrooms: {property_data.get('bedrooms', 0)}
-        Bathrooms: {property_data.get('bathrooms', 0)}
-        Square Feet: {property_data.get('square_feet', 0):,}
-        Features: {', '.join(property_data.get('features', []))}
-        
-        Requirements:
-        - 150-200 words
-        - Highlight unique features
-        - Create emotional connection
-        - Include call to action
-        - Ensure fair housing compliance
-        - Professional yet engaging tone
-        """
-        
-        description = await self.a_generate_reply(
-            messages=[{"role": "user", "content": description_prompt}],
-            sender=None
+        description = await self._generate(
+            "property_description",
+            listing_id=property_data.get('id'),
+            target_audience=target_audience,
+            **property_fields(property_data)
         )
         
         self.logger.info(f"Description generated for {property_data.get('address')}")
@@ -250,47 +750,40 @@ class SocialMediaManagerAgent(RealEstateAgent):
             "twitter": {"max_chars": 280, "image_count": 4, "video_length": 140}
         }
     
-    async def create_platform_content(self, property_data: Dict[str, Any], platform: str) -> SocialMediaPost:
-        """Create optimized content for specific platform"""
+    async def create_platform_content(
+        self,
+        property_data: Dict[str, Any],
+        platform: str,
+        fields: Optional[Dict[str, Any]] = None
+    ) -> SocialMediaPost:
+        """Create optimized content for specific platform
+        
+        `fields` are precomputed prompt fields shared across a campaign.
+        """
         
         config = self.platform_configs.get(platform, {})
         max_chars = config.get("max_chars", 1000)
         
-        content_prompt = f"""
-        Create {platform} post content for this property listing:
-        
-        Property: {property_data.get('address')}
-        Price: ${property_data.get('price', 0):,}
-        Key Features: {', '.join(property_data.get('features', [])[:3])}
-        
-        Platform Requirements:
-        - Maximum {max_chars} characters
-        - Platform: {platform}
-        - Include relevant hashtags
-        - Engaging and professional tone
-        - Include call to action
-        
-        Provide:
-        1. Post text
-        2. Suggested hashtags (5-10)
-        3. Best posting time recommendation
-        """
-        
-        response = await self.a_generate_reply(
-            messages=[{"role": "user", "content": content_prompt}],
-            sender=None
+        content, response = await self._generate_structured(
+            "platform_post",
+            listing_id=property_data.get('id'),
+            platform=platform,
+            max_chars=max_chars,
+            **(fields or property_fields(property_data, max_features=3))
         )
         
-        # Parse response and create post object
-        lines = response.split('\n')
-        post_text = ""
-        hashtags = []
-        
-        for line in lines:
-            if line.startswith('Post text:') or line.startswith('Content:'):
-                post_text = line.split(':', 1)[1].strip()
-            elif 'hashtag' in line.lower() and '#' in line:
-                hashtags.extend([tag.strip() for tag in line.split() if tag.startswith('#')])
+        if content is not None:
+            post_text = content.post_text
+            hashtags = [tag.strip() for tag in content.hashtags if tag.strip().startswith('#')]
+        else:
+            # Free-text reply: fall back to scraping labelled lines
+            post_text = ""
+            hashtags = []
+            for line in response.split('\n'):
+                if line.startswith('Post text:') or line.startswith('Content:'):
+                    post_text = line.split(':', 1)[1].strip()
+                elif 'hashtag' in line.lower() and '#' in line:
+                    hashtags.extend([tag.strip() for tag in line.split() if tag.startswith('#')])
         
         return SocialMediaPost(
             content=post_text,
@@ -299,15 +792,92 @@ class SocialMediaManagerAgent(RealEstateAgent):
             hashtags=hashtags[:10]  # Limit hashtags
         )
     
-    async def schedule_campaign(self, property_data: Dict[str, Any], platforms: List[str]) -> List[SocialMediaPost]:
-        """Schedule a multi-platform social media campaign"""
+    async def create_multi_platform_content(
+        self,
+        property_data: Dict[str, Any],
+        platforms: List[str],
+        fields: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, SocialMediaPost]:
+        """Create content for several platforms in a single LLM call
+        
+        Returns posts keyed by platform; platforms missing from the reply are left out.
+        """
+        
+        requirements = "\n".join(
+            f'- "{platform}": maximum {self.platform_configs.get(platform, {}).get("max_chars", 1000)} characters'
+            for platform in platforms
+        )
         
-        posts = []
+        # A truncated reply still yields every platform that was completed
+        parser = IncrementalJSONParser()
+        await self._generate(
+            "multi_platform_post",
+            listing_id=property_data.get('id'),
+            on_chunk=parser.feed,
+            requirements=requirements,
+            **(fields or property_fields(property_data, max_features=3))
+        )
+        if not parser.complete:
+            self.logger.warning("Multi-platform content reply was incomplete")
+        variants = parser.value()
+        
+        posts = {}
         for platform in platforms:
-            post = await self.create_platform_content(property_data, platform)
-            posts.append(post)
+            variant = variants.get(platform)
+            if not isinstance(variant, dict):
+                continue
+            content = build_structured(PlatformPostContent, variant)
+            if not content.post_text:
+                continue
+            posts[platform] = SocialMediaPost(
+                content=content.post_text,
+                platform=platform,
+                scheduled_time=datetime.now() + timedelta(hours=1),
+                hashtags=[tag for tag in content.hashtags if tag.startswith('#')][:10]
+            )
+        
+        return posts
+    
+    async def schedule_campaign(
+        self,
+        property_data: Dict[str, Any],
+        platforms: List[str],
+        max_concurrency: int = CAMPAIGN_MAX_CONCURRENCY
+    ) -> List[SocialMediaPost]:
+        """Schedule a multi-platform social media campaign
+        
+        Returns the posts that were created, in platform order; a platform
+        whose generation fails is logged and left out.
+        """
+        
+        # Listing fields are prepared once and shared by every platform prompt
+        fields = property_fields(property_data, max_features=3)
+        
+        # One call for every platform; anything the model left out is generated individually
+        generated = {}
+        if len(platforms) > 1:
+            try:
+                generated = await self.create_multi_platform_content(property_data, platforms, fields=fields)
+            except Exception as e:
+                self.logger.warning(f"Multi-platform generation failed, generating per platform: {e}")
+        
+        missing = [platform for platform in platforms if platform not in generated]
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def create(platform: str) -> SocialMediaPost:
+            async with semaphore:
+                return await self.create_platform_content(property_data, platform, fields=fields)
+        
+        # Concurrent, so the fallback costs the slowest platform rather than the sum
+        results = await asyncio.gather(*(create(platform) for platform in missing), return_exceptions=True)
+        for platform, result in zip(missing, results):
+            if isinstance(result, BaseException):
+                self.logger.error(f"Failed to create {platform} content: {result}")
+            else:
+                generated[platform] = result
         
-        self.logger.info(f"Campaign scheduled for {len(platforms)} platforms")
+        posts = [generated[platform] for platform in platforms if platform in generated]
+        self.logger.info(f"Campaign scheduled for {len(posts)}/{len(platforms)} platforms")
         return posts
 
 class MarketingCoordinatorAgent(RealEstateAgent):
@@ -319,27 +889,13 @@ class MarketingCoordinatorAgent(RealEstateAgent):
     async def create_marketing_strategy(self, property_data: Dict[str, Any]) -> MarketingCampaign:
         """Create comprehensive marketing strategy"""
         
-        strategy_prompt = f"""
-        Create a comprehensive marketing strategy for this property:
-        
-        Property: {property_data.get('address')}
-        Price Range: ${property_data.get('price', 0):,}
-        Property Type: {property_data.get('property_type', 'Residential')}
-        Target Market: {property_data.get('target_market', 'General')}
-        
-        Provide:
-        1. Platform recommendations (social media, websites, etc.)
-        2. Content types (photos, videos, virtual tours, etc.)
-        3. Timeline (posting frequency and duration)
-        4. Budget allocation suggestions
-        5. Success metrics to track
-        
-        Format as a structured marketing plan.
-        """
-        
-        strategy = await self.a_generate_reply(
-            messages=[{"role": "user", "content": strategy_prompt}],
-            sender=None
+        strategy = await self._generate(
+            "marketing_strategy",
+            listing_id=property_data.get('id'),
+            address=property_data.get('address'),
+            price=property_data.get('price', 0),
+            property_type=property_data.get('property_type', 'Residential'),
+            target_market=property_data.get('target_market', 'General')
         )
         
         # Create campaign object
@@ -358,60 +914,75 @@ class MarketingCoordinatorAgent(RealEstateAgent):
 class LeadManagerAgent(RealEstateAgent):
     """Agent specialized in lead identification and management"""
     
-    def __init__(self, **kwargs):
+    def __init__(self, scorer: Optional[EngagementScorer] = None, **kwargs):
         super().__init__(name="lead_manager", role="lead_manager", **kwargs)
+        self.scorer = scorer or EngagementScorer()
     
     async def analyze_engagement(self, engagement_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze social media engagement for lead potential"""
         
-        analysis_prompt = f"""
-        Analyze this social media engagement for lead potential:
+        analysis, reply = await self._generate_structured(
+            "engagement_analysis",
+            platform=engagement_data.get('platform'),
+            engagement_type=engagement_data.get('type'),  # like, comment, share, save
+            user_profile=json.dumps(engagement_data.get('user_profile', {}), default=str),
+            content_type=engagement_data.get('content_type'),
+            history=engagement_data.get('history', []),
+            text=engagement_data.get('text') or engagement_data.get('comment') or ''
+        )
         
-        Engagement Data:
-        - Platform: {engagement_data.get('platform')}
-        - Type: {engagement_data.get('type')}  # like, comment, share, save
-        - User Profile: {engagement_data.get('user_profile', {})}
-        - Content Engaged With: {engagement_data.get('content_type')}
-        - Engagement History: {engagement_data.get('history', [])}
+        self.logger.info(f"Engagement analysis completed for {engagement_data.get('platform')} user")
+        return {
+            "analysis": reply,
+            "lead_score": analysis.lead_score if analysis else 0,
+            "interest_level": analysis.interest_level if analysis else "",
+            "timestamp": datetime.now()
+        }
+    
+    async def triage_engagements(
+        self,
+        events: List[Dict[str, Any]],
+        fraction: float = LEAD_ESCALATION_FRACTION,
+        max_escalations: int = LEAD_MAX_ESCALATIONS,
+        max_concurrency: int = LEAD_MAX_CONCURRENCY
+    ) -> List[Dict[str, Any]]:
+        """Score a batch of engagement events and run the LLM analysis only for the top fraction
         
-        Provide:
-        1. Lead score (1-10)
-        2. Interest level assessment
-        3. Recommended follow-up actions
-        4. Best contact method
-        5. Timing recommendations
+        Returns one result per event, in input order.
         """
         
-        analysis = await self.a_generate_reply(
-            messages=[{"role": "user", "content": analysis_prompt}],
-            sender=None
-        )
+        scores = self.scorer.score(events)
+        escalate = self.scorer.select(scores, fraction, LEAD_MIN_TRIAGE_SCORE, max_escalations)
         
-        self.logger.info(f"Engagement analysis completed for {engagement_data.get('platform')} user")
-        return {"analysis": analysis, "timestamp": datetime.now()}
-    
-    async def create_follow_up_sequence(self, lead_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Create personalized follow-up sequence for leads"""
+        results = [
+            {"triage_score": round(float(score), 4), "escalated": False, "timestamp": datetime.now()}
+            for score in scores
+        ]
+        semaphore = asyncio.Semaphore(max_concurrency)
         
-        sequence_prompt = f"""
-        Create a follow-up sequence for this lead:
+        async def analyze(index: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.analyze_engagement(events[index])
         
-        Lead Profile:
-        - Interest Level: {lead_data.get('interest_level')}
-        - Preferred Contact: {lead_data.get('preferred_contact')}
-        - Property Interest: {lead_data.get('property_interest')}
-        - Lead Source: {lead_data.get('source')}
+        analyses = await asyncio.gather(*(analyze(i) for i in escalate), return_exceptions=True)
+        for index, analysis in zip(escalate, analyses):
+            if isinstance(analysis, BaseException):
+                self.logger.error(f"Engagement analysis failed: {analysis}")
+                continue
+            results[index] = {**analysis, "triage_score": results[index]["triage_score"], "escalated": True}
         
-        Create 5 follow-up touchpoints with:
-        1. Timing (hours/days after initial contact)
-        2. Channel (email, SMS, social media)
-        3. Message content
-        4. Objective of each touchpoint
-        """
+        self.logger.info(f"Triaged {len(events)} engagement events, escalated {len(escalate)}")
+        return results
+    
+    async def create_follow_up_sequence(self, lead_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Create personalized follow-up sequence for leads"""
         
-        sequence = await self.a_generate_reply(
-            messages=[{"role": "user", "content": sequence_prompt}],
-            sender=None
+        sequence = await self._generate(
+            "follow_up_sequence",
+            interest_level=lead_data.get('interest_level'),
+            preferred_contact=lead_data.get('preferred_contact'),
+            property_interest=lead_data.get('property_interest'),
+            source=lead_data.get('source')
         )
         
         # Parse and structure the sequence
@@ -425,12 +996,13 @@ class LeadManagerAgent(RealEstateAgent):
 class RealEstateAgentOrchestrator:
     """Orchestrates multiple agents for comprehensive real estate marketing"""
     
-    def __init__(self):
+    def __init__(self, generation_cache=None, llm_backend=None):
+        shared = {"generation_cache": generation_cache, "llm_backend": llm_backend}
         self.agents = {
-            "listing_specialist": ListingSpecialistAgent(),
-            "marketing_coordinator": MarketingCoordinatorAgent(),
-            "social_media_manager": SocialMediaManagerAgent(),
-            "lead_manager": LeadManagerAgent()
+            "listing_specialist": ListingSpecialistAgent(**shared),
+            "marketing_coordinator": MarketingCoordinatorAgent(**shared),
+            "social_media_manager": SocialMediaManagerAgent(**shared),
+            "lead_manager": LeadManagerAgent(**shared)
         }
         
         self.user_proxy = UserProxyAgent(
@@ -449,7 +1021,7 @@ class RealEstateAgentOrchestrator:
         
         self.manager = GroupChatManager(
             groupchat=self.group_chat,
-            llm_config={"model": "gpt-4", "temperature": 0.3}
+            llm_config={"config_list": build_config_list(), "temperature": 0.3}
         )
         
         self.logger = logging.getLogger(__name__)
@@ -469,10 +1041,12 @@ class RealEstateAgentOrchestrator:
         
         # Step 3: Create social media content
         social_agent = self.agents["social_media_manager"]
+        platforms = ["facebook", "instagram", "linkedin"]
         social_posts = await social_agent.schedule_campaign(
             property_data, 
-            ["facebook", "instagram", "linkedin"]
+            platforms
         )
+        created_platforms = {post.platform for post in social_posts}
         
         # Compile results
         results = {
@@ -480,6 +1054,7 @@ class RealEstateAgentOrchestrator:
             "analysis": property_analysis,
             "marketing_campaign": marketing_campaign.dict(),
             "social_media_posts": [post.dict() for post in social_posts],
+            "failed_platforms": [platform for platform in platforms if platform not in created_platforms],
             "status": "processed",
             "timestamp": datetime.now()
         }
@@ -490,17 +1065,32 @@ class RealEstateAgentOrchestrator:
     async def handle_social_engagement(self, engagement_data: Dict[str, Any]) -> Dict[str, Any]:
         """Handle social media engagement and lead processing"""
         
+        return (await self.handle_social_engagements([engagement_data]))[0]
+    
+    async def handle_social_engagements(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Handle a batch of engagement events: triage, analyze the promising ones, follow up on strong leads"""
+        
         lead_agent = self.agents["lead_manager"]
         
-        # Analyze engagement for lead potential
-        lead_analysis = await lead_agent.analyze_engagement(engagement_data)
+        # Analyze engagement for lead potential (LLM only for the top-scoring events)
+        results = await lead_agent.triage_engagements(events)
         
         # If high-potential lead, create follow-up sequence
-        if "high" in lead_analysis.get("analysis", "").lower():
-            follow_up_sequence = await lead_agent.create_follow_up_sequence(engagement_data)
-            lead_analysis["follow_up_sequence"] = follow_up_sequence
+        strong = [index for index, result in enumerate(results) if result.get("lead_score", 0) >= LEAD_FOLLOW_UP_SCORE]
+        semaphore = asyncio.Semaphore(LEAD_MAX_CONCURRENCY)
+        
+        async def follow_up(index: int) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await lead_agent.create_follow_up_sequence(events[index])
         
-        return lead_analysis
+        sequences = await asyncio.gather(*(follow_up(index) for index in strong), return_exceptions=True)
+        for index, follow_up_sequence in zip(strong, sequences):
+            if isinstance(follow_up_sequence, BaseException):
+                self.logger.error(f"Follow-up sequence failed: {follow_up_sequence}")
+                continue
+            results[index]["follow_up_sequence"] = follow_up_sequence
+        
+        return results
 
 # Example Usage and Testing
 async def main():
@@ -0,0 +1,226 @@
+"""
+Tests for the AG2 sample agents
+"""
+
+import asyncio
+import json
+import os
+import sys
+import numpy as np
+import pytest
+
+pytest.importorskip("ag2")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sample_ag2_agents as sample
+from sample_ag2_agents import (
+    PromptTemplate, PROMPTS, count_tokens, property_fields,
+    IncrementalJSONParser, PlatformPostContent, EngagementAnalysis
+)
+
+LISTING = {
+    "id": "listing-1",
+    "address": "12 Elm St",
+    "price": 525000,
+    "bedrooms": 3,
+    "bathrooms": 2,
+    "square_feet": 1850,
+    "features": ["pool", "solar", "garage", "patio"],
+    "description": "Sunny craftsman on a quiet street"
+}
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+def test_template_fields_and_key():
+    template = PromptTemplate("example", "v1", """
+        Listing {address} at ${price:,}
+    """)
+    
+    assert template.fields == {"address", "price"}
+    assert template.key == "example@v1"
+    assert template.render(address="12 Elm St", price=525000) == "Listing 12 Elm St at $525,000"
+
+def test_missing_fields_are_reported():
+    with pytest.raises(KeyError, match="price"):
+        PromptTemplate("example", "v1", "{address} {price}").render(address="12 Elm St")
+
+def test_truncatable_fields_fit_the_budget():
+    template = PromptTemplate("example", "v1", "{address}: {description} [{features}]",
+                              truncatable=("description", "features"), max_tokens=40)
+                              
+    prompt = template.render(
+        address="12 Elm St",
+        description="word " * 500,
+        features=[f"feature {i}" for i in range(100)]
+    )
+    
+    assert count_tokens(prompt) <= 40
+    assert prompt.startswith("12 Elm St: word") and "feature 0" in prompt
+
+def test_short_fields_are_left_alone():
+    template = PROMPTS["property_description"]
+    
+    prompt = template.render(target_audience="family", **property_fields(LISTING))
+    
+    assert "Sunny craftsman on a quiet street" in prompt
+    assert "Features: pool, solar, garage, patio" in prompt
+
+def test_output_model_schema_is_appended():
+    prompt = PROMPTS["property_analysis"].render(**property_fields(LISTING))
+    
+    assert prompt.endswith(sample.schema_instructions(sample.PropertyAnalysis))
+
+class ScriptedBackend:
+    """LLM backend answering each prompt from the first matching script entry"""
+    
+    def __init__(self, script, latency: float = 0.01):
+        self.script = script
+        self.latency = latency
+        self.prompts = []
+        self.in_flight = 0
+        self.peak = 0
+        
+    async def complete(self, messages, temperature, max_tokens):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            for fragment, reply in self.script:
+                if fragment in prompt:
+                    if isinstance(reply, Exception):
+                        raise reply
+                    return reply
+            raise AssertionError(f"Unscripted prompt: {prompt[:60]}")
+        finally:
+            self.in_flight -= 1
+
+def post(text: str) -> str:
+    return json.dumps({"post_text": text, "hashtags": ["#home", "nohash"], "best_posting_time": "9am"})
+
+@pytest.mark.asyncio
+async def test_campaign_generates_every_platform_in_one_call():
+    backend = ScriptedBackend([
+        ("on each platform below", json.dumps({"facebook": json.loads(post("fb")), "instagram": json.loads(post("ig"))}))
+    ])
+    agent = sample.SocialMediaManagerAgent(llm_backend=backend)
+    
+    posts = await agent.schedule_campaign(LISTING, ["facebook", "instagram"])
+    
+    assert [(p.platform, p.content, p.hashtags) for p in posts] == [("facebook", "fb", ["#home"]), ("instagram", "ig", ["#home"])]
+    assert len(backend.prompts) == 1
+
+@pytest.mark.asyncio
+async def test_campaign_falls_back_per_platform_concurrently():
+    backend = ScriptedBackend([
+        ("on each platform below", json.dumps({"facebook": json.loads(post("fb"))})),
+        ("Create instagram post", post("ig")),
+        ("Create linkedin post", post("li")),
+        ("Create twitter post", ConnectionError("provider down"))
+    ], latency=0.05)
+    agent = sample.SocialMediaManagerAgent(llm_backend=backend)
+    
+    posts = await agent.schedule_campaign(LISTING, ["twitter", "linkedin", "facebook", "instagram"], max_concurrency=2)
+    
+    # The failed platform is left out and the rest keep the requested order
+    assert [p.platform for p in posts] == ["linkedin", "facebook", "instagram"]
+    assert backend.peak == 2
+
+@pytest.mark.asyncio
+async def test_single_platform_campaign_skips_the_combined_call():
+    backend = ScriptedBackend([("Create twitter post", post("tw"))])
+    agent = sample.SocialMediaManagerAgent(llm_backend=backend)
+    
+    posts = await agent.schedule_campaign(LISTING, ["twitter"])
+    
+    assert [p.content for p in posts] == ["tw"] and len(backend.prompts) == 1
+def feed(parser, text: str, chunk: int = 3):
+    for start in range(0, len(text), chunk):
+        parser.feed(text[start:start + chunk])
+    return parser
+
+def test_parser_ignores_surrounding_prose():
+    reply = 'Sure! ```json\n{"post_text": "Open house {Sat}", "hashtags": ["#a", "#b"]}\n``` Enjoy'
+    
+    parser = feed(IncrementalJSONParser(PlatformPostContent), reply)
+    
+    assert parser.complete and not parser.field_errors
+    assert parser.value() == {"post_text": "Open house {Sat}", "hashtags": ["#a", "#b"]}
+
+def test_fields_are_available_as_they_complete():
+    parser = feed(IncrementalJSONParser(), '{"post_text": "Hi, \\"there\\"", "hashtags": ["#a", "#b"')
+    
+    assert parser.fields == {"post_text": 'Hi, "there"'}
+    assert parser.value() == {"post_text": 'Hi, "there"', "hashtags": ["#a", "#b"]}
+
+def test_truncated_reply_keeps_complete_values():
+    parser = feed(IncrementalJSONParser(), '{"post_text": "Done", "best_posting_time": "9a')
+    
+    assert not parser.complete
+    assert parser.value() == {"post_text": "Done"}
+    assert parser.value(close_strings=True) == {"post_text": "Done", "best_posting_time": "9a"}
+
+def test_truncated_number_is_dropped():
+    parser = feed(IncrementalJSONParser(), '{"lead_score": 7, "timing": 12')
+    
+    assert parser.value() == {"lead_score": 7}
+
+def test_invalid_fields_are_reported_and_defaulted():
+    parser = feed(IncrementalJSONParser(EngagementAnalysis), '{"lead_score": 42, "interest_level": "high"}')
+    
+    assert set(parser.field_errors) == {"lead_score"}
+    analysis = sample.build_structured(EngagementAnalysis, parser.value())
+    assert (analysis.lead_score, analysis.interest_level) == (0, "high")
+
+def test_reply_without_an_object():
+    parser = feed(IncrementalJSONParser(), "I cannot help with that.")
+    
+    assert not parser.started and parser.value() == {}
+
+@pytest.mark.asyncio
+async def test_truncated_analysis_keeps_the_complete_fields():
+    backend = ScriptedBackend([
+        ("Analyze this property", '{"key_selling_points": ["pool"], "marketing_angles": ["fam')
+    ])
+    agent = sample.ListingSpecialistAgent(llm_backend=backend)
+    
+    analysis = await agent.analyze_property(LISTING)
+    
+    assert analysis["key_selling_points"] == ["pool"] and analysis["marketing_angles"] == []
+class FixedScorer(sample.EngagementScorer):
+    def __init__(self, scores):
+        super().__init__()
+        self.fixed = np.array(scores, dtype=np.float32)
+        
+    def score(self, events):
+        return self.fixed
+
+@pytest.mark.asyncio
+async def test_triage_escalates_only_the_top_fraction():
+    events = [{"platform": name, "type": "comment"} for name in ("facebook", "quiet", "broken", "instagram")]
+    backend = ScriptedBackend([
+        ("Platform: broken", ConnectionError("provider down")),
+        ("Platform: ", '{"lead_score": 8, "interest_level": "high"}')
+    ])
+    agent = sample.LeadManagerAgent(scorer=FixedScorer([0.9, 0.2, 0.8, 0.6]), llm_backend=backend)
+    
+    results = await agent.triage_engagements(events, fraction=0.75, max_escalations=10, max_concurrency=2)
+    
+    assert [result["escalated"] for result in results] == [True, False, False, True]
+    assert results[0]["lead_score"] == 8 and results[0]["triage_score"] == pytest.approx(0.9)
+    # A failed analysis keeps its triage result
+    assert "lead_score" not in results[2]
+    assert len(backend.prompts) == 3 and backend.peak <= 2
+
+@pytest.mark.asyncio
+async def test_triage_caps_escalations():
+    events = [{"platform": "facebook", "type": "comment"}] * 4
+    backend = ScriptedBackend([("Platform: ", '{"lead_score": 3}')])
+    agent = sample.LeadManagerAgent(scorer=FixedScorer([0.9, 0.95, 0.8, 0.7]), llm_backend=backend)
+    
+    results = await agent.triage_engagements(events, fraction=1.0, max_escalations=1)
+    
+    assert [result["escalated"] for result in results] == [False, True, False, False]
\ No newline at end of file